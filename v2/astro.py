@@ -4,7 +4,7 @@ import sys
 import math
 import os
 from pyscad import (Cube, Cylinder, Sphere, Point, Union, CustomObject, EPS,
-                    TCone, Vector, PySCADObject)
+                    TCone, Vector, PySCADObject, set_lod)
 from pyscad.shapes import DonutSlice
 from pyscad.lib.misc import TeflonGlide, RoundHole, Washer
 from pyscad.lib.bearing import Bearing
@@ -15,7 +15,6 @@ from pyscad.util import in2mm
 from pyscad import autorender
 
 VITAMINS = True
-FAST_RENDERING = False
 
 IRON = [0.36, 0.33, 0.33]
 BRASS = [0.88, 0.78, 0.5]
@@ -38,7 +37,7 @@ class BallHead(CustomObject):
         self -= screw_hole.move_to(center=bcyl.center, bottom=bcyl.bottom-EPS*2)
         # handles
         h3 = Cylinder(d=22.40, h=18, axis='x')
-        h9 = Cylinder(d=22.40, h=18, axis='x')
+        h9 = h3.clone()
         h6 = Cylinder(d=19.40, h=18.60, axis='y')
         self.h3 = h3.move_to(center=self.cyl.center, left=self.cyl.right)
         self.h6 = h6.move_to(back=self.cyl.front, bottom=bcyl.bottom+7)
@@ -181,8 +180,8 @@ class RotatingPlate(CustomObject):
     GROOVE_H = 1
 
     def init_custom(self, bolt):
-        self.spur = WormFactory.spur(teeth=70, h=7, bore_d=bolt.D+0.1, optimized=False,
-                                     fast_rendering=FAST_RENDERING).color('violet')#.mod()
+        self.spur = WormFactory.spur(teeth=70, h=7, bore_d=bolt.D+0.1,
+                                     optimized=False).color('violet')#.mod()
         #
         glides = []
         for angle in (0, 120, 240):
@@ -221,8 +220,7 @@ class MyWorm(CustomObject):
     def init_custom(self, *, h, axis):
         self.h = h
         self.axis = axis
-        worm = WormFactory.worm(h=h, bore_d=0, axis=axis,
-                                fast_rendering=FAST_RENDERING)
+        worm = WormFactory.worm(h=h, bore_d=0, axis=axis)
         self.worm = worm.mod('%')
         self.anchors.set_bounding_box(worm.pmin, worm.pmax)
 
@@ -279,8 +277,7 @@ class WormShaft(CustomObject):
         self.l_trunk = l_trunk.move_to(right=worm.left)
         self.r_trunk = r_trunk.move_to(left=worm.right)
         #
-        spur = SmallWormFactory.spur(teeth=20, h=h_spur, axis=axis, optimized=False,
-                                     fast_rendering=FAST_RENDERING)
+        spur = SmallWormFactory.spur(teeth=20, h=h_spur, axis=axis, optimized=False)
         spur = spur.move_to(center=worm.center, right=l_trunk.left)
         self.spur = spur.color(self.color)
         #
@@ -325,8 +322,7 @@ class StepperSpur(CustomObject):
     SHAFT_H = 5.68
 
     def init_custom(self, myworm):
-        spur = SmallWormFactory.spur(teeth=10, h=3, axis='x',
-                                     fast_rendering=FAST_RENDERING)
+        spur = SmallWormFactory.spur(teeth=10, h=3, axis='x')
         d = Stepper_28BYJ48._SBD - 2
         shaft = Cylinder(d=d, h=self.SHAFT_H, axis='x').move_to(right=spur.left)
         self.spur = spur.color(self.color)
@@ -340,8 +336,7 @@ class StepperSpur(CustomObject):
         """
         hack hack hack. I keep it around only in case I need it again in the
         future, it's a way to print a slightly smaller spur, useful to add
-        some play between two gears. It needs to comment out the
-        "invalidate_anchors()" inside PySCADObject.scale
+        some play between two gears.
         """
         #pmin = spur.pmin
         #pmax = spur.pmax
@@ -502,11 +497,19 @@ def compute_ratio(obj):
 
 
 def main(build_fn):
-    global FAST_RENDERING
     global VITAMINS
     parts = None
+    export_dir = None
+    if '--export' in sys.argv:
+        # export the parts to STL instead of showing them, e.g.:
+        #   ./astro.py --export /tmp/stl baseplate rplate
+        #   ./astro.py --export /tmp/stl -bolt -nut
+        i = sys.argv.index('--export')
+        export_dir = sys.argv[i+1]
+        del sys.argv[i:i+2]
     if '--fast' in sys.argv:
-        FAST_RENDERING = True
+        # cheap proxies for the library parts and coarse circles
+        set_lod('draft')
     if '--no-vitamins' in sys.argv:
         VITAMINS = False
 
@@ -519,6 +522,15 @@ def main(build_fn):
     #
     obj = build_fn()
     #obj = build_worm_bracket()
+    if export_dir:
+        if parts and parts[0].startswith('-'):
+            # export everything APART the parts which are given
+            hidden_parts = [p[1:] for p in parts]
+            parts = [name for name in obj.parts() if name not in hidden_parts]
+        for part_name, path in obj.export_parts(export_dir, parts=parts).items():
+            print(f'{part_name}: {path}')
+        return
+
     if parts and parts[0].startswith('-'):
         # show everything APART the parts which are given
         hidden_parts = [p[1:] for p in parts] # remove the '-' from everywhere
@@ -541,8 +553,9 @@ def main(build_fn):
                 setattr(new_obj, part_name, part_obj)
         obj = new_obj
 
-    # fn=100 is needed to make sure that cura makes fully circular top/bottom patterns
-    obj.autorender(fn=100)
+    # no global $fn: the circles get enough segments for cura to make fully
+    # circular top/bottom patterns, see pyscad.scad.segments_for()
+    obj.autorender()
 
 if __name__ == '__main__':
     main(build)
@@ -3,7 +3,7 @@
 import math
 from pyscad import (Cube, Cylinder, Sphere, Point, Union, CustomObject, EPS,
                     TCone, Vector, PySCADObject)
-from pyscad.shapes import DonutSlice
+from pyscad.shapes import DonutSlice, PolarArray
 from pyscad.lib.misc import RoundHole, Washer
 from pyscad.lib.bearing import Bearing
 from pyscad.lib.gears import WormFactory
@@ -38,25 +38,18 @@ class MyWormFactory(WormFactory):
 class FourHoles(CustomObject):
 
     def init_custom(self, dist, *, d, h=100, angle=0, countersink=False):
-        holes = []
-        points = []
-        bbox = []
-        for i in range(4):
-            a = math.radians(angle + i*90)
-            x = dist * math.cos(a)
-            y = dist * math.sin(a)
-            p = Point(x, y, 0)
-            if countersink:
-                assert d == M5, 'countersink holes supported only for M5'
-                hole = M5_countersink_hole(h=h).move_to(center=p)
-            else:
-                hole = Cylinder(d=d, h=h).move_to(center=p)
-            holes.append(hole)
-            points.append(p)
-            bbox += [hole.pmin, hole.pmax]
-        self.holes = holes
-        self.points = points
-        self.anchors.set_bounding_box(*bbox)
+        if countersink:
+            assert d == M5, 'countersink holes supported only for M5'
+            hole = M5_countersink_hole(h=h)
+        else:
+            hole = Cylinder(d=d, h=h)
+        a = math.radians(angle)
+        hole.move_to(center=Point(dist * math.cos(a), dist * math.sin(a), 0))
+        # the other holes are rotated by multiples of 90 degrees, so the
+        # bounding box of the array is exact
+        self.holes = PolarArray(hole, 4)
+        self.points = [getattr(self.holes, f'item{i}') for i in range(4)]
+        self.anchors.set_bounding_box(self.holes.pmin, self.holes.pmax)
 
 
 class Turntable(CustomObject):
@@ -91,8 +84,7 @@ class SpurPlate(CustomObject):
 
     def init_custom(self, turntable):
         self.body = Cylinder(d=turntable.d2-1, h=2).color('pink')
-        spur = WormFactory.spur(teeth=70, h=18, optimized=False,
-                                fast_rendering=FAST_RENDERING)
+        spur = WormFactory.spur(teeth=70, h=18, optimized=False)
         self.spur = spur.move_to(top=self.body.bottom).color('pink')
         self.sub(holes = FourHoles(turntable.ihd, d=M5))
 
@@ -213,8 +205,7 @@ class WormShaft(CustomObject):
         self.r_trunk = r_trunk.move_to(left=worm.right)
         #
         spur = WormFactory.spur(teeth=self.SPUR_TEETH, h=h_spur, axis=axis,
-                                optimized=False,
-                                fast_rendering=FAST_RENDERING)
+                                optimized=False)
         spur = spur.move_to(center=worm.center, right=l_trunk.left)
         self.spur = spur.color(self.color)
         #
@@ -263,8 +254,7 @@ class StepperSpur(CustomObject):
     TEETH = 7
 
     def init_custom(self, myworm):
-        spur = WormFactory.spur(teeth=self.TEETH, h=3, axis='x',
-                                fast_rendering=FAST_RENDERING)
+        spur = WormFactory.spur(teeth=self.TEETH, h=3, axis='x')
         d = Stepper_28BYJ48._SBD - 2
         shaft = Cylinder(d=d, h=self.SHAFT_H, axis='x').move_to(right=spur.left)
         self.spur = spur.color(self.color)
@@ -278,8 +268,7 @@ class StepperSpur(CustomObject):
         """
         hack hack hack. I keep it around only in case I need it again in the
         future, it's a way to print a slightly smaller spur, useful to add
-        some play between two gears. It needs to comment out the
-        "invalidate_anchors()" inside PySCADObject.scale
+        some play between two gears.
         """
         #pmin = spur.pmin
         #pmax = spur.pmax
@@ -374,8 +363,7 @@ class MotorBracket(CustomObject):
 
 
 def build():
-    global FAST_RENDERING, VITAMINS
-    FAST_RENDERING = astro.FAST_RENDERING
+    global VITAMINS
     VITAMINS = astro.VITAMINS
     obj = CustomObject()
 
@@ -389,7 +377,7 @@ def build():
     obj.spur_plate = spur_plate.move_to(top=turntable.bottom)
     bottom_plate = bottom_plate.move_to(top=turntable.bottom)
 
-    worm = WormFactory.worm(h=25, bore_d=0, axis='x', fast_rendering=FAST_RENDERING)
+    worm = WormFactory.worm(h=25, bore_d=0, axis='x')
     worm.mod('%')
     obj.worm = worm.move_to(bottom=spur_plate.spur.bottom, back=spur_plate.spur.front)
     if worm.top.z+1 >= turntable.bottom.z:
@@ -0,0 +1,35 @@
+#!/usr/bin/python3
+"""
+Measure how long it takes to build objects, without rendering them:
+
+  - astro.build() builds the whole assembly
+  - rotate() builds and rotates many cylinders: each rotation by an
+    arbitrary angle invalidates the anchors (see InvalidAnchorPoints)
+
+Usage: ./bench_build.py [N]
+"""
+
+import sys
+import io
+import timeit
+import contextlib
+from pyscad import Cylinder
+
+def rotate():
+    for i in range(1000):
+        Cylinder(d=10, h=5).rotate(z=30)
+
+def bench(name, fn, n):
+    # astro.build() prints some info about the assembly, we don't want to see it
+    with contextlib.redirect_stdout(io.StringIO()):
+        t = min(timeit.repeat(fn, number=1, repeat=n))
+    print(f'{name:15s} {t*1000:8.2f} ms')
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    bench('rotate', rotate, n)
+    import astro
+    bench('astro.build', astro.build, n)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+"""
+Measure the startup time of pyscad, i.e. how long it takes to import it in a
+fresh interpreter:
+
+  - "import pyscad" alone
+  - "from pyscad import Cube", which loads solid and numpy
+  - importing one of the pyscad.lib modules
+  - the slowest modules imported by "from pyscad import Cube", according to
+    python -X importtime
+
+Usage: ./bench_startup.py [N]
+"""
+
+import sys
+import os
+import subprocess
+
+SNIPPETS = [
+    ('import', 'import pyscad'),
+    ('Cube', 'from pyscad import Cube'),
+    ('lib.gears', 'import pyscad.lib.gears'),
+]
+
+def run(code, *args):
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    res = subprocess.run([sys.executable, *args, '-c', code], env=env,
+                         capture_output=True, text=True, check=True)
+    return res.stderr
+
+def wallclock(code):
+    # time.perf_counter() is not available before the interpreter starts, so
+    # we measure the time spent in the snippet, excluding the interpreter
+    # startup
+    out = run(f'import time, sys; t = time.perf_counter(); {code}; '
+              f'print(time.perf_counter() - t, file=sys.stderr)')
+    return float(out.split()[-1])
+
+def importtime(code, top=10):
+    """
+    Return the modules which took the longest to import (self time, in ms)
+    """
+    modules = []
+    for line in run(code, '-X', 'importtime').splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(self_us) / 1000, name.strip()))
+    modules.sort(reverse=True)
+    return modules[:top]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, code in SNIPPETS:
+        t = min(wallclock(code) for i in range(n))
+        print(f'{name:15s} {t*1000:8.2f} ms')
+    print()
+    print('slowest modules for "from pyscad import Cube":')
+    for ms, mod in importtime('from pyscad import Cube'):
+        print(f'    {mod:45s} {ms:8.2f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -85,8 +85,7 @@ def board():
     return res
 
 def build():
-    global FAST_RENDERING, VITAMINS
-    FAST_RENDERING = astro.FAST_RENDERING
+    global VITAMINS
     VITAMINS = astro.VITAMINS
     obj = CustomObject()
 
@@ -2,4 +2,40 @@
 PyScad: a pythonic wrapper around solidpython
 """
 
-from .scad import *
+import sys
+import importlib
+
+# pyscad.scad (and thus solid and numpy) is imported on first access to one
+# of its names, e.g. "from pyscad import Cube", so that "import pyscad" and
+# the tools which only need a submodule (e.g. pyscad.cache) start quickly
+
+# the public names of pyscad.scad: "from pyscad import *" accesses each of
+# them, and thus imports pyscad.scad
+__all__ = [
+    'AXIS_ROT_VECTOR', 'Affine', 'AnchorPoints', 'Camera', 'Cube', 'CustomObject',
+    'Cylinder', 'Difference', 'EPS', 'GenericSCADWrapper', 'ImportSTL',
+    'ImportScad', 'InvalidAnchorPoints', 'LODS', 'LOD_CHORD_ERROR',
+    'LOD_RESOLUTION', 'MAX_SEGMENTS', 'MIN_SEGMENTS', 'Neg', 'Path', 'Point',
+    'Preview', 'PySCADObject', 'Sphere', 'TCone', 'Text', 'Transform', 'Union',
+    'Vector', 'autorender', 'bolt_hole', 'open_if_changed', 'render_to_collage',
+    'render_to_collage_async', 'scad_render_dedup', 'scad_render_stream',
+    'segments_for', 'set_lod',
+]
+
+def __getattr__(name):
+    if name.startswith('__') or (f'{__name__}.scad' in sys.modules and
+                                 'scad' not in globals()):
+        # pyscad.scad is being imported: "from . import openscad" & co. look
+        # for the attribute first, and then import the submodule
+        raise AttributeError(name)
+    scad = importlib.import_module(f'{__name__}.scad')
+    names = [name for name in vars(scad) if not name.startswith('_')]
+    globals().update({name: getattr(scad, name) for name in names})
+    try:
+        return globals()[name]
+    except KeyError:
+        raise AttributeError(f"module 'pyscad' has no attribute '{name}'") from None
+
+def __dir__():
+    __getattr__('scad')
+    return sorted(globals())
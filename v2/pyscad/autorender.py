@@ -2,34 +2,329 @@
 
 import sys
 import os
-import psutil
-import inotify.adapters
-import inotify.constants as IN
+import ast
+import time
+import runpy
+import importlib
+import importlib.util
+import traceback
+import subprocess
+from pathlib import Path
+
+# the script might modify sys.argv before calling autorender() (e.g. astro.py
+# removes its own options): save the original one, so that we can re-run it
+# with the same arguments
+ORIG_ARGV = list(sys.argv)
+
+PYSCAD_DIR = Path(__file__).parent.resolve()
+PYSCAD_LIB = PYSCAD_DIR / 'lib'
+
+def _pidfile(scadfile):
+    scadfile = Path(scadfile)
+    return scadfile.with_name(f'.{scadfile.name}.openscad.pid')
+
+def _read_proc(pid, name):
+    try:
+        with open(f'/proc/{pid}/{name}', 'rb') as f:
+            return f.read()
+    except OSError:
+        return b''
+
+def _is_viewer(pid, scadfile):
+    """
+    Check whether pid is an openscad process showing scadfile
+    """
+    if _read_proc(pid, 'comm').strip() != b'openscad':
+        return False
+    cmdline = _read_proc(pid, 'cmdline').decode('utf-8', 'replace').split('\0')
+    return str(scadfile) in cmdline
+
+def find_viewer(scadfile):
+    """
+    Return the PID of the openscad process which is showing scadfile, or
+    None.
+
+    The PID of the viewers started by run_openscad_maybe is stored in a
+    pidfile next to the .scad. If there is none (e.g. because openscad was
+    started by hand), we scan /proc, looking only at the openscad processes.
+    """
+    pidfile = _pidfile(scadfile)
+    try:
+        pid = int(pidfile.read_text())
+    except (OSError, ValueError):
+        pid = None
+    if pid is not None and _is_viewer(pid, scadfile):
+        return pid
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.isdigit() and _is_viewer(entry, scadfile):
+            pidfile.write_text(entry)
+            return int(entry)
+    return None
 
 def run_openscad_maybe(scadfile):
-    # first, try to see whether there is already an openscad process for this
-    # file (this is imprecise, but good enough for my use case)
-    for proc in psutil.process_iter():
-        if proc.name() == 'openscad' and str(scadfile) in proc.cmdline():
-            #print(f'Found existing openscad process for file {scadfile}, PID {proc.pid}')
-            return
+    # first, check whether there is already an openscad process for this file
+    if find_viewer(scadfile) is not None:
+        return
     print('Running openscad...')
-    os.system(f'openscad "{scadfile}" &')
+    proc = subprocess.Popen(['openscad', str(scadfile)])
+    _pidfile(scadfile).write_text(str(proc.pid))
+
+
+class HotReloader:
+    """
+    Rebuild the object inside the running interpreter, instead of restarting
+    it.
+
+    When a file changes, we reload only the user modules which have been
+    modified and the ones which import them; then we re-run the main
+    script. The call to autorender() done by the script is intercepted, so
+    that we get the new object. All the other modules (solid, PIL, and in
+    particular the pyscad.lib modules, which parse the vendored .scad files
+    with ImportScad) are kept as they are.
+    """
+
+    # set while we are re-running the main script
+    capturing = None
+
+    def __init__(self, main_file):
+        self.main_file = Path(main_file).resolve()
+        self.mtimes = {}
+        for mod in self.user_modules():
+            self.mtimes[mod.__name__] = self._mtime(mod.__file__)
+
+    @staticmethod
+    def _mtime(filename):
+        try:
+            return os.stat(filename).st_mtime_ns
+        except OSError:
+            return None
+
+    def user_modules(self):
+        """
+        The modules which live in the same directory tree as the main script
+        or in pyscad.lib, apart the rest of pyscad
+        """
+        root = self.main_file.parent
+        for name, mod in list(sys.modules.items()):
+            f = getattr(mod, '__file__', None)
+            if name == '__main__' or f is None:
+                continue
+            path = Path(f).resolve()
+            if path.suffix != '.py' or 'site-packages' in path.parts:
+                continue
+            in_tree = path.is_relative_to(root) or path.is_relative_to(PYSCAD_LIB)
+            if in_tree and self.can_reload(path):
+                yield mod
+
+    def can_reload(self, path):
+        """
+        Changes to pyscad itself cannot be hot-reloaded, because the objects
+        kept alive by the library would still refer to the old classes. Also
+        .scad files are parsed by ImportScad only once.
+        """
+        path = Path(path).resolve()
+        if path.suffix != '.py':
+            return False
+        return not path.is_relative_to(PYSCAD_DIR) or path.is_relative_to(PYSCAD_LIB)
+
+    def changed_modules(self):
+        changed = []
+        for mod in self.user_modules():
+            mtime = self._mtime(mod.__file__)
+            if mtime != self.mtimes.get(mod.__name__):
+                changed.append(mod)
+        return changed
+
+    @staticmethod
+    def imports(mod):
+        """
+        Return the names of the modules imported by mod
+        """
+        tree = ast.parse(Path(mod.__file__).read_text())
+        result = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                result.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module
+                if node.level:
+                    relname = '.' * node.level + (node.module or '')
+                    base = importlib.util.resolve_name(relname, mod.__package__)
+                result.add(base)
+                # "from pkg import submodule"
+                result.update(f'{base}.{alias.name}' for alias in node.names)
+        return result
+
+    def dependents(self, changed):
+        """
+        Return the user modules which (transitively) import the changed ones
+        """
+        names = {mod.__name__ for mod in changed}
+        result = []
+        todo = True
+        while todo:
+            todo = False
+            for mod in self.user_modules():
+                if mod.__name__ not in names and self.imports(mod) & names:
+                    names.add(mod.__name__)
+                    result.append(mod)
+                    todo = True
+        return result
+
+    def reload(self):
+        """
+        Reload the changed modules and re-run the main script. Return the
+        (obj, filename, kwargs) passed to autorender(), or None if the script
+        did not call it.
+        """
+        changed = self.changed_modules()
+        if changed:
+            changed += self.dependents(changed)
+        for mod in changed:
+            importlib.reload(mod)
+            self.mtimes[mod.__name__] = self._mtime(mod.__file__)
+        #
+        captured = []
+        HotReloader.capturing = captured
+        saved_argv = sys.argv
+        sys.argv = list(ORIG_ARGV)
+        try:
+            runpy.run_path(str(self.main_file), run_name='__main__')
+        except SystemExit:
+            pass
+        finally:
+            sys.argv = saved_argv
+            HotReloader.capturing = None
+        if captured:
+            return captured[-1]
+        return None
+
+
+# how long to wait for more events before reloading, in seconds
+DEBOUNCE = 0.2
+
+def watched_files(main_file):
+    """
+    Return the files whose change should trigger a reload: the main script,
+    the modules which it imported from its own tree or from pyscad, and the
+    .scad files loaded by ImportScad
+    """
+    from .scad import ImportScad
+    files = set()
+    root = Path.cwd()
+    if main_file is not None:
+        root = Path(main_file).resolve().parent
+        files.add(Path(main_file).resolve())
+    for mod in list(sys.modules.values()):
+        f = getattr(mod, '__file__', None)
+        if f is None:
+            continue
+        path = Path(f).resolve()
+        if path.suffix != '.py' or 'site-packages' in path.parts:
+            continue
+        if path.is_relative_to(root) or path.is_relative_to(PYSCAD_DIR):
+            files.add(path)
+    files.update(ImportScad.files)
+    return files
+
+
+class Watcher:
+    """
+    Watch a set of files, and yield the set of the ones which changed.
+
+    Bursts of events (e.g. an editor which writes a backup and then the file
+    itself, or a "save all") are coalesced: we wait until no event arrives
+    for `debounce` seconds.
+
+    inotify watches are put on the directories which contain the files,
+    because many editors save by writing a new file and renaming it.
+    """
+
+    def __init__(self, debounce=DEBOUNCE):
+        # inotify is needed only by autorender(), don't import it together
+        # with pyscad
+        import inotify.adapters
+        import inotify.constants as IN
+        self.mask = IN.IN_CLOSE_WRITE | IN.IN_MOVED_TO | IN.IN_CREATE | IN.IN_DELETE
+        self.debounce = debounce
+        self.inotify = inotify.adapters.Inotify(block_duration_s=0.05)
+        self.dirs = set()
+        self.files = set()
+
+    def watch(self, files):
+        """
+        Add the given files to the watched ones
+        """
+        for f in files:
+            f = Path(f).resolve()
+            self.files.add(f)
+            if f.parent not in self.dirs:
+                self.dirs.add(f.parent)
+                self.inotify.add_watch(str(f.parent), self.mask)
+
+    def changes(self):
+        pending = set()
+        last_event = None
+        for event in self.inotify.event_gen(yield_nones=True):
+            if event is not None:
+                (header, type_names, watch_path, filename) = event
+                path = Path(watch_path, filename)
+                if path in self.files:
+                    pending.add(path)
+                    last_event = time.monotonic()
+            elif pending and time.monotonic() - last_event >= self.debounce:
+                yield pending
+                pending = set()
+
+
+def autorender(obj, filename, *, hot_reload=True, debounce=DEBOUNCE, **kwargs):
+    if HotReloader.capturing is not None:
+        # the main script is being re-run by HotReloader.reload()
+        HotReloader.capturing.append((obj, filename, kwargs))
+        return
 
-def autorender(obj, filename, **kwargs):
     obj.render_to_file(filename, **kwargs)
     run_openscad_maybe(filename)
 
-    # reload as soon as any *.py file is created/modified/deleted
-    MASK = IN.IN_CLOSE_WRITE | IN.IN_CREATE | IN.IN_DELETE
-    i = inotify.adapters.InotifyTree('.', mask=MASK)
+    main_file = getattr(sys.modules['__main__'], '__file__', None)
+    reloader = None
+    if hot_reload and main_file is not None:
+        reloader = HotReloader(main_file)
+
+    # reload as soon as any of the files used to build the object changes
+    watcher = Watcher(debounce)
+    watcher.watch(watched_files(main_file))
     try:
-        for event in i.event_gen():
-            if event is None:
+        for changed in watcher.changes():
+            names = ', '.join(sorted(path.name for path in changed))
+            if reloader is None or not all(reloader.can_reload(p) for p in changed):
+                print(f'change detected, restarting: {names}')
+                os.execl(sys.executable, 'python3', *ORIG_ARGV)
+            print(f'change detected, reloading: {names}')
+            a = time.perf_counter()
+            try:
+                res = reloader.reload()
+            except Exception:
+                # keep watching: the user will fix the error and save again
+                traceback.print_exc()
+                continue
+            finally:
+                # the new code might import new modules
+                watcher.watch(watched_files(main_file))
+            if res is None:
+                print('The script did not call autorender()')
                 continue
-            (header, type_names, watch_path, filename) = event
-            if filename.endswith('.py') and not filename.startswith('.#'):
-                print(f'change detected, reloading: {filename}')
-                os.execl(sys.executable, 'python3', *sys.argv)
+            new_obj, filename, kwargs = res
+            old_mtime = HotReloader._mtime(filename)
+            new_obj.render_to_file(filename, **kwargs)
+            b = time.perf_counter()
+            if HotReloader._mtime(filename) == old_mtime:
+                print(f'reloaded in {(b-a)*1000:.0f} ms, geometry unchanged')
+            else:
+                print(f'reloaded in {(b-a)*1000:.0f} ms')
     except KeyboardInterrupt:
         pass
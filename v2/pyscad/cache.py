@@ -0,0 +1,105 @@
+"""
+Simple on-disk cache for the artifacts produced by openscad (png, stl, ...).
+
+Entries are indexed by a hash of everything which can influence the output,
+see e.g. openscad.render_key(). When the total size of the cache exceeds
+max_size, the least recently used entries are evicted.
+"""
+
+import os
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get('PYSCAD_CACHE_DIR',
+                                Path.home() / '.cache' / 'pyscad'))
+
+def hash_key(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        elif not isinstance(part, bytes):
+            part = repr(part).encode('utf-8')
+        # include the length, so that ('ab', 'c') and ('a', 'bc') hash
+        # differently
+        h.update(str(len(part)).encode('ascii'))
+        h.update(b':')
+        h.update(part)
+    return h.hexdigest()
+
+
+class FileCache:
+
+    def __init__(self, directory, *, max_size):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.enabled = not os.environ.get('PYSCAD_NO_CACHE')
+
+    def _path(self, key, suffix):
+        return self.directory / key[:2] / f'{key}{suffix}'
+
+    def get(self, key, dest):
+        """
+        Copy the entry to dest and return True, or return False if it is not
+        in the cache.
+        """
+        if not self.enabled:
+            return False
+        src = self._path(key, Path(dest).suffix)
+        try:
+            shutil.copyfile(src, dest)
+        except FileNotFoundError:
+            return False
+        os.utime(src) # mark it as recently used
+        return True
+
+    def put(self, key, src):
+        if not self.enabled:
+            return
+        dst = self._path(key, Path(src).suffix)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        # copy+rename, so that concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=dst.parent, suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+        self.evict()
+
+    def _entries(self):
+        if not self.directory.exists():
+            return []
+        entries = []
+        for f in self.directory.glob('*/*'):
+            if f.suffix == '.tmp':
+                continue
+            try:
+                st = f.stat()
+            except FileNotFoundError:
+                continue # evicted by someone else in the meantime
+            entries.append((st.st_mtime, st.st_size, f))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        entries.sort() # least recently used first
+        for _, size, f in entries:
+            if total <= self.max_size:
+                break
+            try:
+                f.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+render_cache = FileCache(CACHE_DIR / 'render', max_size=256 * 1024**2)
+export_cache = FileCache(CACHE_DIR / 'export', max_size=1024**3)
@@ -0,0 +1,190 @@
+"""
+Structural hashing of solid trees, and a renderer which emits identical
+subtrees only once.
+
+Assemblies often contain many copies of the same part (e.g. four identical
+holes). solid.scad_render emits each copy in full; scad_render_dedup emits
+each repeated subtree once as an OpenSCAD module and replaces all the copies
+with a call to it.
+"""
+
+import copy
+import hashlib
+from collections import Counter
+from solid.solidpython import (OpenSCADObject, py2openscad, non_rendered_classes,
+                               indent, _find_include_strings)
+
+
+def _params_key(params):
+    items = []
+    for k, v in params.items():
+        if k == 'segments':
+            k = '$fn' # this is how solid renders it
+        if v is None:
+            continue # None params are not rendered
+        items.append((str(k), py2openscad(v)))
+    items.sort()
+    return items
+
+
+class SolidInfo:
+    """
+    Hash and eligibility of all the nodes of a solid tree, indexed by
+    id(node).
+
+    A node is eligible to become a module if it has children and it does not
+    contain any hole or part root, because solid handles those specially at
+    rendering time.
+    """
+
+    def __init__(self, root):
+        self.hashes = {}
+        self.clean = {}
+        self.eligible = {}
+        self._compute(root)
+
+    def _compute(self, root):
+        # post-order visit with an explicit stack, so that deep trees don't
+        # hit the recursion limit
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if id(node) in self.hashes:
+                continue
+            children = self._children(node)
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((c, False) for c in children)
+                continue
+            h = hashlib.sha1()
+            if isinstance(node, OpenSCADObject):
+                include = getattr(node, 'include_string', None)
+                h.update(repr((node.name, _params_key(node.params), node.modifier,
+                               node.is_hole, node.is_part_root,
+                               include)).encode('utf-8'))
+                clean = (not node.is_hole and
+                         not node.is_part_root and
+                         node.name not in non_rendered_classes)
+            else:
+                # opaque node which knows how to render itself (e.g. _PreviewSolid)
+                h.update(node._render().encode('utf-8'))
+                clean = True
+            for child in children:
+                h.update(self.hashes[id(child)].encode('ascii'))
+                clean = clean and self.clean[id(child)]
+            self.hashes[id(node)] = h.hexdigest()
+            self.clean[id(node)] = clean
+            self.eligible[id(node)] = (clean and bool(children) and
+                                       isinstance(node, OpenSCADObject))
+
+    @staticmethod
+    def _children(node):
+        if isinstance(node, OpenSCADObject):
+            return node.children
+        return []
+
+
+def solid_hash(node):
+    """
+    Return a hash which depends only on the structure of the tree, i.e. two
+    independently constructed but identical trees have the same hash.
+    """
+    return SolidInfo(node).hashes[id(node)]
+
+
+def scad_render_dedup(root, file_header=''):
+    info = SolidInfo(root)
+    modules = _find_modules(root, info)
+    renderer = _DedupRenderer(info, modules)
+    body = renderer.render(root)
+    #
+    if file_header and not file_header.endswith('\n'):
+        file_header += '\n'
+    # sorted, so that the output does not depend on the order of the set
+    includes = ''.join(sorted(_find_include_strings(root))) + '\n'
+    return file_header + includes + ''.join(renderer.definitions) + body
+
+
+def _find_modules(root, info):
+    """
+    Return the set of hashes of the subtrees which must be turned into a
+    module.
+
+    We count only the occurrences which are actually going to be rendered:
+    if a subtree is used only inside another repeated subtree, it is
+    rendered only once (inside the module body) and it's not worth to turn
+    it into a module on its own.
+    """
+    total = Counter()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        total[info.hashes[id(node)]] += 1
+        stack.extend(info._children(node))
+    #
+    rendered = Counter()
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if info.eligible[id(node)]:
+            h = info.hashes[id(node)]
+            rendered[h] += 1
+            if total[h] >= 2:
+                if h in seen:
+                    continue # this will be a module call
+                seen.add(h)
+        stack.extend(info._children(node))
+    return {h for h, n in rendered.items() if n >= 2}
+
+
+class _DedupRenderer:
+
+    def __init__(self, info, modules):
+        self.info = info
+        self.modules = modules
+        self.names = {}
+        self.definitions = []
+
+    def render(self, root):
+        return self._rebuild(root)._render()
+
+    def _module_name(self, h):
+        return f'_pyscad_{h[:12]}'
+
+    def _rebuild(self, node):
+        """
+        Return a copy of the tree in which all the repeated subtrees are
+        replaced by calls to their module
+        """
+        if not isinstance(node, OpenSCADObject):
+            return node
+        h = self.info.hashes[id(node)]
+        if h in self.modules:
+            if h not in self.names:
+                self._define_module(h, node)
+            call = OpenSCADObject(self.names[h], {})
+            call.set_modifier(node.modifier)
+            return call
+        return self._copy(node)
+
+    def _copy(self, node):
+        new = copy.copy(node)
+        new.children = []
+        new.parent = None
+        for child in node.children:
+            new_child = self._rebuild(child)
+            if isinstance(new_child, OpenSCADObject):
+                new_child.parent = new
+            new.children.append(new_child)
+        return new
+
+    def _define_module(self, h, node):
+        name = self._module_name(h)
+        self.names[h] = name
+        body = self._copy(node)
+        body.modifier = '' # the modifier is applied to the call
+        # the body can contain calls to other modules, so we render it only
+        # after all of them have been defined
+        text = body._render()
+        self.definitions.append(f'module {name}() {{{indent(text)}\n}}\n')
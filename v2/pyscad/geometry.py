@@ -1,3 +1,5 @@
+import math
+import numpy as np
 from dataclasses import dataclass
 
 def is_scalar(x):
@@ -5,6 +7,7 @@ def is_scalar(x):
 
 @dataclass
 class Point:
+    __slots__ = ('x', 'y', 'z')
     x: float
     y: float
     z: float
@@ -40,6 +43,7 @@ Point.O = Point(0, 0, 0) # origin
 
 @dataclass
 class Vector:
+    __slots__ = ('x', 'y', 'z')
     x: float
     y: float
     z: float
@@ -56,22 +60,400 @@ class Vector:
             return Vector(self.x*k, self.y*k, self.z*k)
         return NotImplemented
 
+    def __sub__(self, v):
+        if not isinstance(v, Vector):
+            return NotImplemented
+        return Vector(x=self.x-v.x,
+                      y=self.y-v.y,
+                      z=self.z-v.z)
+
+    def __neg__(self):
+        return Vector(-self.x, -self.y, -self.z)
+
     def __truediv__(self, k):
         if is_scalar(k):
             return Vector(self.x/k, self.y/k, self.z/k)
         return NotImplemented
 
+Vector.ZERO = Vector(0, 0, 0)
+
+
+class InvalidAnchorError(Exception):
+    pass
+
+
+def _cos_sin(angle):
+    """
+    cos and sin of the given angle in degrees. They are exact for multiples of
+    90, so that e.g. rotating an anchor by 90 degrees does not introduce
+    rounding errors.
+    """
+    if angle % 90 == 0:
+        return [(1, 0), (0, 1), (-1, 0), (0, -1)][int(angle // 90) % 4]
+    a = math.radians(angle)
+    return math.cos(a), math.sin(a)
+
+
+class Affine:
+    """
+    3x4 affine matrix. The first three columns are the linear part, the last
+    one is the translation.
+    """
+
+    def __init__(self, rows):
+        self.rows = tuple(tuple(row) for row in rows)
+        self._np = None # cached numpy version, see _arrays()
+
+    def __repr__(self):
+        return f'Affine({self.rows})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Affine):
+            return NotImplemented
+        return self.rows == other.rows
+
+    @classmethod
+    def translation(cls, v):
+        return cls([(1, 0, 0, v.x),
+                    (0, 1, 0, v.y),
+                    (0, 0, 1, v.z)])
+
+    @classmethod
+    def scaling(cls, x, y, z):
+        return cls([(x, 0, 0, 0),
+                    (0, y, 0, 0),
+                    (0, 0, z, 0)])
+
+    @classmethod
+    def rotation(cls, x, y, z):
+        """
+        Same semantics as OpenSCAD's rotate([x, y, z]): rotate around X, then
+        Y, then Z
+        """
+        cx, sx = _cos_sin(x)
+        cy, sy = _cos_sin(y)
+        cz, sz = _cos_sin(z)
+        rx = cls([(1,  0,   0, 0),
+                  (0, cx, -sx, 0),
+                  (0, sx,  cx, 0)])
+        ry = cls([( cy, 0, sy, 0),
+                  (  0, 1,  0, 0),
+                  (-sy, 0, cy, 0)])
+        rz = cls([(cz, -sz, 0, 0),
+                  (sz,  cz, 0, 0),
+                  ( 0,   0, 1, 0)])
+        return rz @ ry @ rx
+
+    def __matmul__(self, other):
+        """
+        (a @ b) is the transformation which applies b first, then a
+        """
+        a = self.rows
+        b = other.rows
+        rows = []
+        for i in range(3):
+            row = [a[i][0]*b[0][j] + a[i][1]*b[1][j] + a[i][2]*b[2][j]
+                   for j in range(4)]
+            row[3] += a[i][3]
+            rows.append(row)
+        return Affine(rows)
+
+    def is_translation(self):
+        (a, b, c, _), (d, e, f, _), (g, h, i, _) = self.rows
+        return (a, b, c, d, e, f, g, h, i) == (1, 0, 0, 0, 1, 0, 0, 0, 1)
+
+    def translation_vector(self):
+        return Vector(self.rows[0][3], self.rows[1][3], self.rows[2][3])
+
+    def is_singular(self):
+        (a, b, c, _), (d, e, f, _), (g, h, i, _) = self.rows
+        return a*(e*i - f*h) - b*(d*i - f*g) + c*(d*h - e*g) == 0
+
+    def inverse(self):
+        if self.is_translation():
+            return Affine.translation(-self.translation_vector())
+        (a, b, c, tx), (d, e, f, ty), (g, h, i, tz) = self.rows
+        det = a*(e*i - f*h) - b*(d*i - f*g) + c*(d*h - e*g)
+        if det == 0:
+            raise ValueError('Singular matrix')
+        inv = [((e*i - f*h)/det, (c*h - b*i)/det, (b*f - c*e)/det),
+               ((f*g - d*i)/det, (a*i - c*g)/det, (c*d - a*f)/det),
+               ((d*h - e*g)/det, (b*g - a*h)/det, (a*e - b*d)/det)]
+        t = (tx, ty, tz)
+        rows = [row + (-sum(row[j]*t[j] for j in range(3)),) for row in inv]
+        return Affine(rows)
+
+    def _arrays(self):
+        if self._np is None:
+            m = np.array(self.rows, dtype=float)
+            self._np = m[:, :3], m[:, 3]
+        return self._np
+
+    def apply_array(self, coords):
+        """
+        Transform a (n, 3) array of points, where NaN is used for None
+        components. Same semantics as apply().
+        """
+        if self == Affine.IDENTITY:
+            return coords
+        linear, t = self._arrays()
+        if self.is_translation():
+            return coords + t
+        unknown = np.isnan(coords)
+        out = np.where(unknown, 0, coords) @ linear.T + t
+        # a component is unknown if it depends on an unknown component
+        out_unknown = (unknown.astype(float) @ (linear.T != 0)) > 0
+        if (out_unknown.sum(axis=1) > unknown.sum(axis=1)).any():
+            raise InvalidAnchorError('Cannot transform a partial point')
+        out[out_unknown] = np.nan
+        return out
+
+    def apply(self, p):
+        """
+        Transform the given Point.
+
+        None components are allowed (e.g. Point(10, None, None) is the plane
+        x=10), but only if the transformation keeps them independent from the
+        known components, e.g. a rotation by a multiple of 90 degrees. If
+        this is not the case, raise InvalidAnchorError.
+        """
+        if self.is_translation():
+            return p + self.translation_vector()
+        coords = (p.x, p.y, p.z)
+        out = []
+        for row in self.rows:
+            val = row[3]
+            for k, c in zip(row, coords):
+                if k == 0:
+                    continue
+                if c is None:
+                    val = None
+                    break
+                val += k*c
+            out.append(val)
+        n_in = sum(c is not None for c in coords)
+        n_out = sum(c is not None for c in out)
+        if n_out < n_in:
+            raise InvalidAnchorError(f'Cannot transform the partial point {p}')
+        return Point(*out)
+
+Affine.IDENTITY = Affine.translation(Vector.ZERO)
+
+
+class Transform:
+    """
+    Accumulated transformation of a PySCADObject.
+
+    Transforming an object must also move the anchors of all its
+    descendants. Instead of eagerly rewriting all of them, translate() and
+    friends only update the matrix of the object, and anchors are resolved
+    when they are accessed: the absolute transformation of an object is its
+    own matrix, followed by the transformations which each of its parents
+    received AFTER the object was attached to it.
+    """
+
+    def __init__(self):
+        self.matrix = Affine.IDENTITY
+        self.parents = [] # [(parent_transform, parent_matrix_when_attached)]
+
+    def apply(self, m):
+        self.matrix = m @ self.matrix
+
+    def translate(self, v):
+        self.apply(Affine.translation(v))
+
+    def attach(self, parent):
+        self.parents.append((parent, parent.total()))
+
+    def total(self):
+        m = self.matrix
+        for parent, baseline in self.parents:
+            current = parent.total()
+            if current != baseline:
+                if baseline.is_singular():
+                    raise InvalidAnchorError(
+                        'Cannot follow the transformations of a parent which '
+                        'was attached when flattened, e.g. by scale() with a '
+                        'zero factor')
+                m = current @ baseline.inverse() @ m
+        return m
+
+    def _clone(self, memo):
+        """
+        Copy of self for a cloned object. memo maps the id of the
+        already-cloned transforms to their copy: parents which have not been
+        cloned are dropped, i.e. the copy is detached from the rest of the
+        world.
+        """
+        new = memo.get(id(self))
+        if new is None:
+            new = memo[id(self)] = Transform()
+            new.matrix = self.matrix
+            new.parents = [(memo[id(parent)], baseline)
+                           for parent, baseline in self.parents
+                           if id(parent) in memo]
+        return new
+
+
+# anchors which are computed from the bounding box: if the object is e.g.
+# rotated, we need to recompute them from the transformed box (e.g., the old
+# pmin might no longer be the minimum). This is done only for the anchors
+# set by set_bounding_box(): the ones set explicitly are transformed as
+# plain points
+BBOX_ANCHORS = ('pmin', 'pmax', 'left', 'right', 'front', 'back', 'bottom', 'top')
+
+def _to_array(points):
+    """
+    Convert a list of Points into a (n, 3) array. None components are
+    represented as NaN.
+    """
+    return np.array([(p.x, p.y, p.z) for p in points], dtype=float)
+
+def _to_point(row):
+    x, y, z = [None if math.isnan(c) else c for c in row.tolist()]
+    return Point(x, y, z)
+
 
 class AnchorPoints:
+    """
+    Named points of an object.
+
+    All the points are stored in a single (n, 3) numpy array, so that they
+    can be transformed at once. None components (e.g. the plane
+    Point(10, None, None)) are stored as NaN.
+
+    If a Transform is given, points are stored relative to it: reading a
+    point returns its current absolute position, and setting a point
+    expects an absolute position.
+    """
 
-    def __init__(self, **kwargs):
+    def __init__(self, transform=None, **kwargs):
+        object.__setattr__(self, '_index', {}) # name -> row in _coords
+        object.__setattr__(self, '_coords', _NO_COORDS)
+        object.__setattr__(self, '_transform', transform)
+        object.__setattr__(self, '_shared', False) # see _clone() and PySCADObject.clone()
+        object.__setattr__(self, '_derived', set()) # see BBOX_ANCHORS
         for key, value in kwargs.items():
             if not isinstance(value, Point):
                 raise TypeError(f'{key}: a Point is required')
-            setattr(self, key, value)
+        self._set_many(list(kwargs), list(kwargs.values()))
+
+    def _matrix(self):
+        if self._transform is None:
+            return Affine.IDENTITY
+        return self._transform.total()
+
+    def _set_many(self, names, points, derived=()):
+        if names:
+            self._set_array(names, _to_array(points), derived)
+
+    def _clone(self, transform):
+        """
+        Return an AnchorPoints with the same points, relative to the given
+        transform. The points are shared, and copied by the first of the two
+        which is modified.
+        """
+        new = AnchorPoints(transform)
+        object.__setattr__(new, '_index', self._index)
+        object.__setattr__(new, '_coords', self._coords)
+        object.__setattr__(new, '_derived', self._derived)
+        object.__setattr__(new, '_shared', True)
+        object.__setattr__(self, '_shared', True)
+        return new
+
+    def _unshare(self):
+        if self._shared:
+            object.__setattr__(self, '_index', dict(self._index))
+            object.__setattr__(self, '_coords', self._coords.copy())
+            object.__setattr__(self, '_derived', set(self._derived))
+            object.__setattr__(self, '_shared', False)
+
+    def _set_array(self, names, coords, derived=()):
+        """
+        Set the given points. The names in derived are bounding box anchors
+        which must be recomputed from pmin and pmax, see BBOX_ANCHORS: all the
+        others are set explicitly.
+        """
+        m = self._matrix()
+        if m != Affine.IDENTITY and m.is_singular():
+            raise InvalidAnchorError(
+                f'Cannot set {", ".join(names)}: the object is flattened by '
+                f'its transformation, e.g. by scale() with a zero factor')
+        self._unshare()
+        self._derived.difference_update(names)
+        self._derived.update(derived)
+        if m != Affine.IDENTITY:
+            coords = m.inverse().apply_array(coords)
+        if not self._index:
+            # fast path: this is the first time we set points
+            self._index.update((name, i) for i, name in enumerate(names))
+            object.__setattr__(self, '_coords', coords.copy())
+            return
+        new_names = [name for name in names if name not in self._index]
+        if new_names:
+            n = len(self._index)
+            for i, name in enumerate(new_names):
+                self._index[name] = n + i
+            object.__setattr__(self, '_coords', np.concatenate(
+                [self._coords, np.empty((len(new_names), 3))]))
+        rows = [self._index[name] for name in names]
+        self._coords[rows] = coords
+
+    def __setattr__(self, name, value):
+        if isinstance(value, Point):
+            self._set_many([name], [value])
+        else:
+            object.__setattr__(self, name, value)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            # avoid infinite recursion if _index is not set yet (e.g. when
+            # copying)
+            raise AttributeError(name)
+        if name not in self._index:
+            raise AttributeError(name)
+        m = self._matrix()
+        if name in self._derived and not m.is_translation():
+            return self._resolve_bbox(m)[name]
+        row = self._coords[self._index[name]]
+        return _to_point(m.apply_array(row[np.newaxis])[0])
+
+    def _resolve_bbox(self, m):
+        p1 = self._coords[self._index['pmin']]
+        p2 = self._coords[self._index['pmax']]
+        corners = np.array([(x, y, z)
+                            for x in (p1[0], p2[0])
+                            for y in (p1[1], p2[1])
+                            for z in (p1[2], p2[2])])
+        corners = m.apply_array(corners)
+        xmin, ymin, zmin = corners.min(axis=0).tolist()
+        xmax, ymax, zmax = corners.max(axis=0).tolist()
+        return {
+            'pmin':   Point(xmin, ymin, zmin),
+            'pmax':   Point(xmax, ymax, zmax),
+            'left':   Point(xmin, None, None),
+            'right':  Point(xmax, None, None),
+            'front':  Point(None, ymin, None),
+            'back':   Point(None, ymax, None),
+            'bottom': Point(None, None, zmin),
+            'top':    Point(None, None, zmax),
+        }
 
     def has_point(self, name):
-        return name in self.__dict__
+        return name in self._index
+
+    def items(self):
+        m = self._matrix()
+        # transform all the points at once
+        coords = m.apply_array(self._coords)
+        bbox = None
+        if self._derived and not m.is_translation():
+            bbox = self._resolve_bbox(m)
+        for key, i in self._index.items():
+            if bbox and key in self._derived:
+                yield key, bbox[key]
+            else:
+                yield key, _to_point(coords[i])
 
     def set_bounding_box(self, *points, set_center=True):
         """
@@ -86,38 +468,44 @@ class AnchorPoints:
         If set_center == True, it also set a 'center' anchor point which is in
         the middle of the diagonal connecting pmin and pmax.
         """
-        xs = [p.x for p in points]
-        ys = [p.y for p in points]
-        zs = [p.z for p in points]
-        xmin, xmax = min(xs), max(xs)
-        ymin, ymax = min(ys), max(ys)
-        zmin, zmax = min(zs), max(zs)
-        self.pmin   = Point(xmin, ymin, zmin)
-        self.pmax   = Point(xmax, ymax, zmax)
-        self.left   = Point(xmin, None, None)
-        self.right  = Point(xmax, None, None)
-        self.front  = Point(None, ymin, None)
-        self.back   = Point(None, ymax, None)
-        self.bottom = Point(None, None, zmin)
-        self.top    = Point(None, None, zmax)
+        coords = _to_array(points)
+        (xmin, ymin, zmin) = coords.min(axis=0)
+        (xmax, ymax, zmax) = coords.max(axis=0)
+        nan = np.nan
+        names = list(BBOX_ANCHORS)
+        rows = [
+            (xmin, ymin, zmin), # pmin
+            (xmax, ymax, zmax), # pmax
+            (xmin, nan, nan),   # left
+            (xmax, nan, nan),   # right
+            (nan, ymin, nan),   # front
+            (nan, ymax, nan),   # back
+            (nan, nan, zmin),   # bottom
+            (nan, nan, zmax),   # top
+        ]
         if set_center:
-            self.center = self.pmin + (self.pmax - self.pmin)/2
+            names.append('center')
+            rows.append(((xmin+xmax)/2, (ymin+ymax)/2, (zmin+zmax)/2))
+        self._set_array(names, np.array(rows), derived=BBOX_ANCHORS)
 
     def __iter__(self):
-        for value in self.__dict__.values():
-            if isinstance(value, Point):
-                yield value
+        for key, p in self.items():
+            yield p
 
     def translate(self, v):
-        for key, p in self.__dict__.items():
-            if not isinstance(p, Point):
-                continue
-            newp = p + v
-            setattr(self, key, newp)
+        # NaN + x == NaN, so the None components are preserved
+        self._unshare()
+        self._coords += (v.x, v.y, v.z)
 
     def copy_from(self, src):
         if not isinstance(src, AnchorPoints):
             raise TypeError
-        for key, p in src.__dict__.items():
-            if isinstance(p, Point):
-                setattr(self, key, p)
+        names = []
+        points = []
+        for key, p in src.items():
+            names.append(key)
+            points.append(p)
+        # the bounding box is still derived from pmin and pmax
+        self._set_many(names, points, derived=src._derived)
+
+_NO_COORDS = np.empty((0, 3))
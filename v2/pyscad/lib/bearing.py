@@ -1,5 +1,6 @@
 from ..scad import CustomObject, Cylinder
 from ..calibration import CalibrationData
+from ..memo import Memoized
 from .misc import ring, RoundHole
 
 STEEL = [0.65, 0.67, 0.72]
@@ -54,7 +55,7 @@ DIMENSIONS = {
     '699': [9, 20,  6],
 }
 
-class Bearing(CustomObject):
+class Bearing(CustomObject, metaclass=Memoized):
 
     def init_custom(self, model, *, axis='z'):
         self.model = model
@@ -65,9 +66,13 @@ class Bearing(CustomObject):
         self.h = h
         self.axis = axis
         self.inner_rim_d = hole_d + rim
-        self._outer = ring(d, d-rim, h, axis=axis).color(STEEL)
-        self._seal = ring(d-rim, hole_d+rim, h*0.8, axis=axis).color('dodgerblue')
-        self._inner = ring(self.inner_rim_d, hole_d, h, axis=axis).color(STEEL)
+        if self.lod == 'draft':
+            # proxy: a plain ring
+            self._outer = ring(d, hole_d, h, axis=axis).color(STEEL)
+        else:
+            self._outer = ring(d, d-rim, h, axis=axis).color(STEEL)
+            self._seal = ring(d-rim, hole_d+rim, h*0.8, axis=axis).color('dodgerblue')
+            self._inner = ring(self.inner_rim_d, hole_d, h, axis=axis).color(STEEL)
         self.anchors.copy_from(self._outer.anchors)
 
     def hole(self, h, *, clearance=None, extra_walls=0, axis=None):
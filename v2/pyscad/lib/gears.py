@@ -1,9 +1,35 @@
+import os
 import math
-from ..scad import ImportScad, PySCADObject, Cylinder
+import solid
+from ..scad import ImportScad, PySCADObject, AXIS_ROT_VECTOR
 from ..geometry import Point, Vector, AnchorPoints
+from ..memo import Memoized
+from . import involute
 
 _gears = ImportScad('vendored/gears/gears.scad')
 
+# default implementation of the gears: 'scad' uses the vendored gears.scad,
+# 'native' computes the profiles in python (see pyscad.lib.involute), so that
+# openscad renders them faster. Can be overridden by the engine argument.
+ENGINE = os.environ.get('PYSCAD_GEARS_ENGINE', 'scad')
+
+def _gears_lib(engine):
+    engine = engine or ENGINE
+    if engine == 'scad':
+        return _gears
+    elif engine == 'native':
+        return involute
+    raise ValueError(f'Unknown gears engine: {engine}')
+
+class _GearMemoized(Memoized):
+    """
+    Resolve the default engine before looking in the cache, so that changing
+    ENGINE at runtime does not return gears built with the old one
+    """
+
+    def __call__(cls, *args, engine=None, **kwargs):
+        return super().__call__(*args, engine=engine or ENGINE, **kwargs)
+
 
 def sin(x):
     """
@@ -17,6 +43,14 @@ def cos(x):
     """
     return math.cos(math.radians(x))
 
+def _init_equivalent_cylinder(obj, d, h):
+    """
+    Set the anchors of a z-axis cylinder centered in the origin
+    """
+    r = d/2
+    obj.anchors.set_bounding_box(Point(-r, -r, -h/2), Point(r, r, h/2))
+
+
 class WormFactory:
     module = 1
     thread_starts = 2
@@ -24,7 +58,8 @@ class WormFactory:
     lead_angle = 10
 
     @classmethod
-    def spur(cls, teeth, h, bore_d=0, optimized=True, *, axis='z', fast_rendering=False):
+    def spur(cls, teeth, h, bore_d=0, optimized=True, *, axis='z', fast_rendering=None,
+             engine=None):
         return SpurGear(cls.module,
                         teeth,
                         h,
@@ -33,10 +68,11 @@ class WormFactory:
                         -cls.lead_angle,
                         optimized,
                         axis=axis,
-                        fast_rendering=fast_rendering)
+                        fast_rendering=fast_rendering,
+                        engine=engine)
 
     @classmethod
-    def worm(cls, *, h, bore_d, axis='z', fast_rendering=False):
+    def worm(cls, *, h, bore_d, axis='z', fast_rendering=None, engine=None):
         return WormGear(cls.module,
                         cls.thread_starts,
                         h,
@@ -44,18 +80,22 @@ class WormFactory:
                         cls.pressure_angle,
                         cls.lead_angle,
                         axis=axis,
-                        fast_rendering=fast_rendering)
+                        fast_rendering=fast_rendering,
+                        engine=engine)
 
 
-class SpurGear(PySCADObject):
+class SpurGear(PySCADObject, metaclass=_GearMemoized):
     """
     Spur gear centered in the origin.
 
-    Same anchor points and properties of a cylinder.
+    Same anchor points and properties of a cylinder. If fast_rendering is
+    True, the gear is replaced by that cylinder: by default, this happens at
+    the 'draft' level of detail (see pyscad.scad.set_lod()).
     """
 
     def init_solid(self, module, teeth, h, bore_d, pressure_angle,
-                   lead_angle, optimized, *, axis='z', fast_rendering=False):
+                   lead_angle, optimized, *, axis='z', fast_rendering=None,
+                   engine=None):
         self.teeth = teeth
         self.h = h
         self.d = module * teeth
@@ -67,125 +107,114 @@ class SpurGear(PySCADObject):
         self.ar = self.r + addendum
         self.ad = self.d + addendum
         #
-        #
-        # to compute the anchors, we create a thrown-away Cylinder which is
-        # "equivalent" to the spur
-        cyl = Cylinder(d=self.d, h=h, axis=axis)
-        self.anchors.center = Point.O
-        self.anchors.set_bounding_box(cyl.pmin, cyl.pmax)
+        # the spur is built along the z axis, with the same anchors of the
+        # "equivalent" cylinder. At the end, we rotate it as needed by the
+        # 'axis': the anchors are rotated as well.
+        _init_equivalent_cylinder(self, self.d, h)
+        if fast_rendering is None:
+            fast_rendering = self.lod == 'draft'
         if fast_rendering:
-            self.solid = cyl.solid
-            return
-        #
-        # create the spur and place it at center
-        width = h # gears.scad naming convention
-        _spur = _gears.spur_gear(module, teeth, width, bore_d, pressure_angle,
-                                 lead_angle, optimized)
-        _spur.translate(0, 0, -width/2)
-        #
-        # spur rotation angle, copied from gears.scad:worm_gear()
-        # This is computed to match the corresponding rotation angle of the worm
-        gamma = -90 * width * sin(-lead_angle) / (math.pi * r)
-        _spur.rotate(0, 0, gamma)
-        #
-        # rotate as needed by the 'axis', by re-using the rot_vector provided
-        # by the equivalent cylinder
-        _spur.rotate(*cyl.rot_vector)
-        #
-        # _spur is a GenericSCADWrapper, manually unwrap it
-        self.solid = _spur.solid
-
-class WormGear(PySCADObject):
+            self.solid = solid.cylinder(d=self.d, h=h, center=True)
+        else:
+            # create the spur and place it at center
+            width = h # gears.scad naming convention
+            _spur = _gears_lib(engine).spur_gear(module, teeth, width, bore_d,
+                                                 pressure_angle, lead_angle, optimized)
+            _spur.translate(0, 0, -width/2)
+            #
+            # spur rotation angle, copied from gears.scad:worm_gear()
+            # This is computed to match the corresponding rotation angle of the worm
+            gamma = -90 * width * sin(-lead_angle) / (math.pi * r)
+            _spur.rotate(0, 0, gamma)
+            #
+            # _spur is a GenericSCADWrapper, manually unwrap it
+            self.solid = _spur.solid
+        self.rotate(*AXIS_ROT_VECTOR[axis])
+
+class WormGear(PySCADObject, metaclass=_GearMemoized):
 
     def init_solid(self, module, thread_starts, h, bore_d,
-                   pressure_angle, lead_angle, *, axis='z', fast_rendering=False):
+                   pressure_angle, lead_angle, *, axis='z', fast_rendering=None,
+                   engine=None):
         self.thread_starts = thread_starts
         self.r = r = module * thread_starts / (2 * sin(lead_angle))
         self.d = r*2
         self.h = h
-        # to compute the anchors, we create a thrown-away Cylinder which is
-        # "equivalent" to the worm
-        cyl = Cylinder(d=self.d, h=h, axis=axis)
-        self.anchors.center = Point.O
-        self.anchors.set_bounding_box(cyl.pmin, cyl.pmax)
+        # same anchors as the "equivalent" cylinder
+        _init_equivalent_cylinder(self, self.d, h)
+        if fast_rendering is None:
+            fast_rendering = self.lod == 'draft'
         if fast_rendering:
-            self.solid = cyl.solid
-            return
-
-        # 1) create the worm
-        width = h # gears.scad naming convention
-        _worm = _gears.worm(module, thread_starts, width, bore_d, pressure_angle,
-                            lead_angle, together_built=True)
+            self.solid = solid.cylinder(d=self.d, h=h, center=True)
+        else:
+            # 1) create the worm
+            width = h # gears.scad naming convention
+            _worm = _gears_lib(engine).worm(module, thread_starts, width, bore_d,
+                                            pressure_angle, lead_angle, together_built=True)
 
-        # 2) center on the Z axis
-        _worm.translate(z=-h/2)
+            # 2) center on the Z axis
+            _worm.translate(z=-h/2)
 
-        # 3) rotate around the Z axis to match the correponding rotation of
-        #    SpurGear, copied&adapted from gears.scad
-        _worm.rotate(z=180/thread_starts)
+            # 3) rotate around the Z axis to match the correponding rotation of
+            #    SpurGear, copied&adapted from gears.scad
+            _worm.rotate(z=180/thread_starts)
 
-        # 4) rotate to match the equivalent cylinder
-        _worm.rotate(*cyl.rot_vector)
+            # _worm is a GenericSCADWrapper, manually unwrap it
+            self.solid = _worm.solid
 
-        # _worm is a GenericSCADWrapper, manually unwrap it
-        self.solid = _worm.solid
+        # 4) rotate as needed by the 'axis', together with the anchors
+        self.rotate(*AXIS_ROT_VECTOR[axis])
 
 
-class HerringboneGear(PySCADObject):
+class HerringboneGear(PySCADObject, metaclass=_GearMemoized):
 
     def init_solid(self, *, module, teeth, h, bore_d, pressure_angle, helix_angle,
-                   optimized, axis='z', fast_rendering=False):
+                   optimized, axis='z', fast_rendering=None, engine=None):
 
         self.d = module * teeth
         self.r = r = self.d / 2
 
-        # to compute the anchors, we create a thrown-away Cylinder which is
-        # "equivalent" to the gear
-        cyl = Cylinder(d=self.d, h=h, axis=axis)
-        self.anchors.center = Point.O
-        self.anchors.set_bounding_box(cyl.pmin, cyl.pmax)
+        # same anchors as the "equivalent" cylinder
+        _init_equivalent_cylinder(self, self.d, h)
+        if fast_rendering is None:
+            fast_rendering = self.lod == 'draft'
         if fast_rendering:
-            self.solid = cyl.solid
-            return
+            self.solid = solid.cylinder(d=self.d, h=h, center=True)
+        else:
+            # create the gear and center on the Z axis
+            _gear = _gears_lib(engine).spur_gear(module, teeth, h, bore_d, pressure_angle,
+                                                 helix_angle, optimized)
+            _gear.translate(0, 0, -h/2)
+            #
+            # _gear is a GenericSCADWrapper, manually unwrap it
+            self.solid = _gear.solid
 
-        # create the gear and center on the Z axis
-        _gear = _gears.spur_gear(module, teeth, h, bore_d, pressure_angle,
-                                        helix_angle, optimized)
-        _gear.translate(0, 0, -h/2)
-
-        # rotate as needed by the 'axis', by re-using the rot_vector provided
-        # by the equivalent cylinder
-        _gear.rotate(*cyl.rot_vector)
-        #
-        # _gear is a GenericSCADWrapper, manually unwrap it
-        self.solid = _gear.solid
+        # rotate as needed by the 'axis', together with the anchors
+        self.rotate(*AXIS_ROT_VECTOR[axis])
 
 
 
-class HerringboneRingGear(PySCADObject):
+class HerringboneRingGear(PySCADObject, metaclass=_GearMemoized):
 
     def init_solid(self, *, module, teeth, h, rim_width, pressure_angle, helix_angle,
-                   axis='z', fast_rendering=False):
+                   axis='z', fast_rendering=None, engine=None):
         self.d = module * teeth  # XXX + rim_width?
         self.r = r = self.d / 2
 
-        # to compute the anchors, we create a thrown-away Cylinder which is
-        # "equivalent" to the gear
-        cyl = Cylinder(d=self.d, h=h, axis=axis)
-        self.anchors.center = Point.O
-        self.anchors.set_bounding_box(cyl.pmin, cyl.pmax)
+        # same anchors as the "equivalent" cylinder
+        _init_equivalent_cylinder(self, self.d, h)
+        if fast_rendering is None:
+            fast_rendering = self.lod == 'draft'
         if fast_rendering:
-            self.solid = cyl.solid
-            return
-
-        # create the gear and center on the Z axis
-        _ring = _gears.ring_gear(module, teeth, h, rim_width,
-                                             pressure_angle, helix_angle)
-        _ring.translate(0, 0, -h/2)
-
-        # rotate as needed by the 'axis', by re-using the rot_vector provided
-        # by the equivalent cylinder
-        _ring.rotate(*cyl.rot_vector)
-        #
-        # _gear is a GenericSCADWrapper, manually unwrap it
-        self.solid = _ring.solid
+            self.solid = solid.cylinder(d=self.d, h=h, center=True)
+        else:
+            # create the gear and center on the Z axis
+            _ring = _gears_lib(engine).ring_gear(module, teeth, h, rim_width,
+                                                 pressure_angle, helix_angle)
+            _ring.translate(0, 0, -h/2)
+            #
+            # _gear is a GenericSCADWrapper, manually unwrap it
+            self.solid = _ring.solid
+
+        # rotate as needed by the 'axis', together with the anchors
+        self.rotate(*AXIS_ROT_VECTOR[axis])
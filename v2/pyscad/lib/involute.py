@@ -0,0 +1,241 @@
+"""
+Native implementation of the gears of vendored/gears/gears.scad.
+
+gears.scad computes the involute profile of the teeth point by point inside
+the openscad interpreter, and then builds the gear as the union of one
+polygon per tooth plus the root circle. Here we compute the outline of the
+whole profile with numpy, and emit it as a single polygon: openscad only has
+to extrude it and to do the booleans with the hub.
+
+The functions have the same signature of the corresponding gears.scad
+modules and return a GenericSCADWrapper, so that they can be used as a drop-in
+replacement of ImportScad('vendored/gears/gears.scad'), see
+pyscad.lib.gears. The profiles are cached, since the same gear is usually
+built many times.
+"""
+
+import math
+import functools
+import numpy as np
+import solid
+from ..scad import GenericSCADWrapper
+
+# same constants of gears.scad
+CLEARANCE = 0.05  # clearance between teeth
+FLANK_STEPS = 16  # the involute is divided into 16 pieces
+
+# max angle (in degrees) between two consecutive points of the arcs of the
+# root circle
+ARC_STEP = 2
+
+# max number of cached profiles of each kind. A design uses only a handful of
+# different gears, while a profile of a big gear holds thousands of points:
+# a small bound is enough, and it keeps a long-running process (e.g.
+# autorender) from accumulating the profiles of all the variants tried
+PROFILE_CACHE_SIZE = 32
+
+
+def _scad_range(start, step, stop):
+    # same as the openscad range [start:step:stop]
+    n = math.floor((stop - start) / step + 1e-9) + 1
+    return start + step * np.arange(max(n, 0))
+
+def _involute(rb, rho):
+    """
+    Polar coordinates (r, phi) of the involute of the base circle of radius
+    rb, for the rolling angles rho (in degrees). Same as ev() in gears.scad.
+    """
+    rho = np.radians(rho)
+    return rb / np.cos(rho), np.degrees(np.tan(rho) - rho)
+
+def _arc(r, start, stop):
+    # points of the arc between the two angles, excluding the extremes
+    n = math.ceil((stop - start) / ARC_STEP)
+    phi = np.linspace(start, stop, max(n, 1) + 1)[1:-1]
+    return np.full_like(phi, r), phi
+
+def _to_xy(r, phi):
+    phi = np.radians(phi)
+    return np.stack([r * np.cos(phi), r * np.sin(phi)], axis=1)
+
+def _circle(r):
+    n = 360 // ARC_STEP
+    return _to_xy(np.full(n, r), np.arange(n) * (360 / n))
+
+def _teeth_outline(teeth, rb, rf, ra, tooth_width, rotation):
+    """
+    Outline of the union of the root circle and the teeth, as built by
+    spur_gear() and ring_gear() in gears.scad: each tooth is bounded by two
+    involutes, which start on the base circle (or on the root circle, if it's
+    bigger) and end on the tip circle.
+    """
+    rho_ra = math.degrees(math.acos(rb / ra))
+    rho = _scad_range(0, rho_ra / FLANK_STEPS, rho_ra)
+    if rho[-1] < rho_ra:
+        rho = np.append(rho, rho_ra)
+    r, phi = _involute(rb, rho)
+    if rb < rf:
+        # the flank starts where it crosses the root circle
+        r_start, phi_start = _involute(rb, math.degrees(math.acos(rb / rf)))
+        keep = r > rf
+        r = np.concatenate([[r_start], r[keep]])
+        phi = np.concatenate([[phi_start], phi[keep]])
+    else:
+        # the tooth is connected to the root circle by a radial segment
+        r = np.concatenate([[rf], r])
+        phi = np.concatenate([[0], phi])
+    # the second flank is symmetric to the first one
+    tooth_r = np.concatenate([r, r[::-1]])
+    tooth_phi = np.concatenate([phi, tooth_width - phi[::-1]])
+    tau = 360 / teeth
+    arc_r, arc_phi = _arc(rf, tooth_width - phi[0], tau + phi[0])
+    one_r = np.concatenate([tooth_r, arc_r])
+    one_phi = np.concatenate([tooth_phi, arc_phi])
+    all_r = np.tile(one_r, teeth)
+    all_phi = (one_phi + tau * np.arange(teeth)[:, None]).ravel() + rotation
+    return _to_xy(all_r, all_phi)
+
+
+@functools.lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def spur_profile(module, teeth, pressure_angle, helix_angle):
+    """
+    Return (points, twist_per_mm, rf) for spur_gear(): points is the outline
+    of the teeth, rf the radius of the root circle.
+    """
+    d = module * teeth
+    r = d / 2
+    alpha_spur = math.degrees(math.atan(math.tan(math.radians(pressure_angle)) /
+                                        math.cos(math.radians(helix_angle))))
+    rb = r * math.cos(math.radians(alpha_spur))
+    da = d + module * 2.2 if module < 1 else d + module * 2
+    ra = da / 2
+    c = 0 if teeth < 3 else module / 6
+    rf = (d - 2 * (module + c)) / 2
+    rho_r = math.degrees(math.acos(rb / r))
+    phi_r = float(_involute(rb, rho_r)[1])
+    tooth_width = 180 * (1 - CLEARANCE) / teeth + 2 * phi_r
+    rotation = -phi_r - 90 * (1 - CLEARANCE) / teeth
+    points = _teeth_outline(teeth, rb, rf, ra, tooth_width, rotation)
+    twist = math.degrees(1 / (r * math.tan(math.radians(90 - helix_angle))))
+    return points.tolist(), twist, rf
+
+@functools.lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def ring_profile(module, teeth, pressure_angle, helix_angle):
+    """
+    Return (points, twist_per_mm, ra) for ring_gear(): points is the outline
+    of the inner side of the ring, ra the radius of the tip circle.
+    """
+    if teeth >= 20:
+        ha = 0.02 * math.degrees(math.atan((teeth / 15) / math.pi))
+    else:
+        ha = 0.6
+    d = module * teeth
+    r = d / 2
+    alpha_spur = math.degrees(math.atan(math.tan(math.radians(pressure_angle)) /
+                                        math.cos(math.radians(helix_angle))))
+    rb = r * math.cos(math.radians(alpha_spur))
+    c = module / 6
+    da = d + (module + c) * 2.2 if module < 1 else d + (module + c) * 2
+    ra = da / 2
+    rf = (d - 2 * module * ha) / 2
+    rho_r = math.degrees(math.acos(rb / r))
+    phi_r = float(_involute(rb, rho_r)[1])
+    tooth_width = 180 * (1 + CLEARANCE) / teeth + 2 * phi_r
+    rotation = -phi_r - 90 * (1 + CLEARANCE) / teeth
+    points = _teeth_outline(teeth, rb, rf, ra, tooth_width, rotation)
+    twist = math.degrees(1 / (r * math.tan(math.radians(90 - helix_angle))))
+    return points.tolist(), twist, ra
+
+@functools.lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def worm_profile(module, thread_starts, pressure_angle, lead_angle):
+    """
+    Return (points, twist_per_mm) for worm(): points is the outline of the
+    threads, i.e. the section of the worm bounded by two Archimedean spirals.
+    """
+    c = module / 6
+    r = module * thread_starts / (2 * math.sin(math.radians(lead_angle)))
+    rf = r - module - c
+    a = module * thread_starts / (90 * math.tan(math.radians(pressure_angle)))
+    tau_max = 180 / thread_starts * math.tan(math.radians(pressure_angle))
+    step = tau_max / FLANK_STEPS
+    half = 180 / thread_starts
+    rising = _scad_range(0, step, tau_max)
+    tip = _scad_range(tau_max, step, half)[1:]
+    descending = _scad_range(half, step, half + tau_max)
+    arc_r, arc_phi = _arc(rf, descending[-1], 2 * half)
+    one_r = np.concatenate([a * rising + rf,
+                            np.full_like(tip, a * tau_max + rf),
+                            a * (half + tau_max - descending) + rf,
+                            arc_r])
+    one_phi = np.concatenate([rising, tip, descending, arc_phi])
+    all_r = np.tile(one_r, thread_starts)
+    all_phi = (one_phi + 2 * half * np.arange(thread_starts)[:, None]).ravel() + tau_max
+    twist = -math.degrees(1 / ((rf + module + c) * math.tan(math.radians(lead_angle))))
+    return _to_xy(all_r, all_phi).tolist(), twist
+
+
+def _polygon_with_hole(points, hole):
+    # polygon with an optional hole, without 2D booleans
+    if hole is None:
+        return solid.polygon(points)
+    hole = hole.tolist()
+    n = len(points)
+    return solid.polygon(points + hole,
+                         paths=[list(range(n)), list(range(n, n + len(hole)))])
+
+def spur_gear(module, teeth, width, bore, pressure_angle=20, helix_angle=0,
+              optimized=True):
+    points, twist, rf = spur_profile(module, teeth, pressure_angle, helix_angle)
+    r = module * teeth / 2
+    d = r * 2
+    r_hole = (2 * rf - bore) / 8
+    rm = bore / 2 + 2 * r_hole
+    z_hole = math.floor(2 * math.pi * rm / (3 * r_hole))
+    optimized = optimized and r >= width * 1.5 and d > 2 * bore
+    #
+    teeth_solid = solid.linear_extrude(height=width, twist=twist * width)(
+        _polygon_with_hole(points, _circle(rm + r_hole * 1.49)[::-1]))
+    if optimized:
+        holes = [solid.translate([rm * math.cos(math.radians(i * 360 / z_hole)),
+                                  rm * math.sin(math.radians(i * 360 / z_hole)), 0])(
+                                      solid.circle(r=r_hole))
+                 for i in range(z_hole)]
+        h_hub = width * 2 / 3 if width - r_hole / 2 < width * 2 / 3 else width - r_hole / 2
+        hub = solid.union()(
+            solid.linear_extrude(height=width)(
+                solid.circle(r=(bore + r_hole) / 2) - solid.circle(r=bore / 2)),
+            solid.linear_extrude(height=h_hub)(
+                solid.circle(r=rm + r_hole * 1.51) -
+                solid.union()(solid.circle(r=(bore + r_hole) / 2), *holes)))
+    else:
+        hub = solid.linear_extrude(height=width)(
+            solid.circle(r=rm + r_hole * 1.51) - solid.circle(r=bore / 2))
+    return GenericSCADWrapper(solid.union()(teeth_solid, hub))
+
+def ring_gear(module, teeth, width, rim_width, pressure_angle=20, helix_angle=0):
+    points, twist, ra = ring_profile(module, teeth, pressure_angle, helix_angle)
+    # the outer circle is the outline, the teeth are the hole
+    outer = _circle(ra + rim_width).tolist()
+    ring = _polygon_with_hole(outer, np.array(points)[::-1])
+    return GenericSCADWrapper(
+        solid.linear_extrude(height=width, twist=twist * width)(ring))
+
+def worm(module, thread_starts, length, bore, pressure_angle=20, lead_angle=10,
+         together_built=True):
+    if not together_built:
+        # two halves of the worm, lying on the print bed, as in gears.scad
+        r = module * thread_starts / (2 * math.sin(math.radians(lead_angle)))
+        half = worm(module, thread_starts, length, bore, pressure_angle,
+                    lead_angle).solid
+        halves = solid.union()(
+            solid.translate([1, r * 1.5, 0])(solid.rotate([90, 0, 90])(half)),
+            solid.translate([length + 1, -r * 1.5, 0])(solid.rotate([90, 0, -90])(half)))
+        h_bed = r + module + 1
+        bed = solid.translate([length / 2 + 1, 0, -h_bed / 2])(
+            solid.cube([length + 2, 3 * r + 2 * h_bed, h_bed], center=True))
+        return GenericSCADWrapper(halves - bed)
+    points, twist = worm_profile(module, thread_starts, pressure_angle, lead_angle)
+    hole = _circle(bore / 2)[::-1] if bore else None
+    return GenericSCADWrapper(
+        solid.linear_extrude(height=length, convexity=10, twist=twist * length)(
+            _polygon_with_hole(points, hole)))
@@ -2,6 +2,7 @@ from ..geometry import Point
 from ..scad import Cylinder, EPS, CustomObject
 from ..shapes import DonutSlice
 from ..calibration import CalibrationData
+from ..memo import Memoized
 
 def ring(outer_d, inner_d, h, *, axis='z'):
     result = Cylinder(d=outer_d, h=h, axis=axis)
@@ -9,7 +10,7 @@ def ring(outer_d, inner_d, h, *, axis='z'):
     return result
 
 
-class TeflonGlide(CustomObject):
+class TeflonGlide(CustomObject, metaclass=Memoized):
     # https://www.amazon.com/dp/B07FH82D8J
     # measures took manually
 
@@ -20,15 +21,23 @@ class TeflonGlide(CustomObject):
         self.base_h = 3.5
         self.upper_h = 1.9
         self.h = self.base_h + self.upper_h
-        self._teflon = ring(self.d, self.inner_d, self.upper_h)\
-            .move_to(bottom=Point.O)\
-            .color('LightSteelBlue')
-        self._base = ring(self.d, self.hole_d, self.base_h)\
-            .color([0.3, 0.3, 0.3])\
-            .move_to(bottom=self._teflon.top)
+        if self.lod == 'draft':
+            # proxy: a plain cylinder
+            self._base = Cylinder(d=self.d, h=self.h)\
+                .color([0.3, 0.3, 0.3])\
+                .move_to(bottom=Point.O)
+            lower = upper = self._base
+        else:
+            self._teflon = ring(self.d, self.inner_d, self.upper_h)\
+                .move_to(bottom=Point.O)\
+                .color('LightSteelBlue')
+            self._base = ring(self.d, self.hole_d, self.base_h)\
+                .color([0.3, 0.3, 0.3])\
+                .move_to(bottom=self._teflon.top)
+            lower, upper = self._teflon, self._base
         #
         self.translate(z = -self.h/2)
-        self.anchors.set_bounding_box(self._teflon.pmin, self._base.pmax)
+        self.anchors.set_bounding_box(lower.pmin, upper.pmax)
         self.anchors.center = Point.O
 
     def make_groove(self, h):
@@ -69,6 +78,9 @@ class RoundHole(CustomObject):
         # bounding box. They exists solely for the sake of the slicer, but
         # they should not have any other structural behavior
         self.anchors.set_bounding_box(self.hole.pmin, self.hole.pmax)
+        if self.lod != 'final':
+            # the extra walls matter only to the slicer
+            extra_walls = 0
         for i in range(extra_walls):
             self._add_ring(i)
 
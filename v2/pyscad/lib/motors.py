@@ -1,11 +1,13 @@
 import math
+import solid
 from ..scad import ImportScad, PySCADObject, Cylinder, Union, Cube
 from ..geometry import Point, Vector, AnchorPoints
+from ..memo import Memoized
 
 _step_motor = ImportScad('vendored/motors/StepMotor_28BYJ-48.scad')
 
 
-class Stepper_28BYJ48(PySCADObject):
+class Stepper_28BYJ48(PySCADObject, metaclass=Memoized):
     """
     28-BYJ48 5V Stepper motor:
     https://components101.com/motors/28byj-48-stepper-motor
@@ -46,22 +48,30 @@ class Stepper_28BYJ48(PySCADObject):
 
 
     def init_solid(self):
-        # to compute the anchors, we create a thrown-away Cylinder which is
-        # "equivalent" to the motor body
-        cyl = Cylinder(d=self._MBD, h=self._MBH, axis='x')
-        self.anchors.center = Point.O
-        self.anchors.set_bounding_box(cyl.pmin, cyl.pmax)
+        # the anchors are the same as the "equivalent" cylinder along the x
+        # axis
+        h = self._MBH/2
+        r = self._MBD/2
+        self.anchors.set_bounding_box(Point(-h, -r, -r), Point(h, r, r))
         # add a anchor for the shaft
         self.anchors.shaft = Point(0, 0, self._SBO)
         self.anchors.mh1 = Point(0, -self._MHCC/2, 0)  # mounting hole 1
         self.anchors.mh2 = Point(0,  self._MHCC/2, 0)  # mounting hole 2
         #
-        # create the motor and rotate so that the shaft is parallel to the 'x' axis
-        _stepper = _step_motor.StepMotor28BYJ()
-        _stepper.rotate(0, -90, 0)
-        #
-        # _stepper is a GenericSCADWrapper, manually unwrap it
-        self.solid = _stepper.solid
+        if self.lod == 'draft':
+            # proxy: the body and the shaft
+            body = Cylinder(d=self._MBD, h=self._MBH, axis='x').color('gray')
+            shaft = Cylinder(d=self._SHD, h=self._SHH, axis='x').color('gold')
+            shaft.move_to(center=self.shaft, left=body.right)
+            self.solid = solid.union()(body.solid, shaft.solid)
+        else:
+            # create the motor and rotate so that the shaft is parallel to the
+            # 'x' axis
+            _stepper = _step_motor.StepMotor28BYJ()
+            _stepper.rotate(0, -90, 0)
+            #
+            # _stepper is a GenericSCADWrapper, manually unwrap it
+            self.solid = _stepper.solid
 
     def make_mounting_holes(self, *, h, clearance=0.5, d=None, central_hole=True):
         # mounting holes for the motor. This is supposed to be used in a
@@ -2,6 +2,7 @@ import math
 from ..scad import ImportScad, CustomObject, Cylinder, Union, Cube
 from ..geometry import Point, Vector, AnchorPoints
 from ..calibration import CalibrationData
+from ..shapes import PolarArray
 
 _manfrotto = ImportScad('vendored/photo/manfrotto-200PL-003.scad')
 
@@ -45,7 +46,11 @@ class Manfrotto_200PL(CustomObject):
     sz = _bpz # size z
 
     def init_custom(self, with_holes=False):
-        self._obj = _manfrotto.plate()
+        if self.lod == 'draft':
+            # proxy: the bounding box
+            self._obj = Cube(self.sx, self.sy, self.sz).move_to(pmin=Point.O)
+        else:
+            self._obj = _manfrotto.plate()
         pmin = Point(0, 0, 0)
         pmax = Point(self.sx, self.sy, self.sz)
         # the center is computed later
@@ -77,10 +82,10 @@ class Manfrotto_200PL(CustomObject):
         #
         if with_holes:
             self -= Cylinder(d=9.9, h=20).move_to(center=self.center)
-            #self -= Cylinder(d=4.9, h=20).move_to(center=self.hole3)
-            self -= Cylinder(d=4.9, h=20).move_to(center=self.hole6)
-            self -= Cylinder(d=4.9, h=20).move_to(center=self.hole9)
-            self -= Cylinder(d=4.9, h=20).move_to(center=self.hole12)
+            # the holes at 12, 9 and 6 are the one at 3, rotated around the
+            # center
+            hole = Cylinder(d=4.9, h=20).move_to(center=self.hole3)
+            self -= PolarArray(hole, 3, start=90, step=90)
 
     def make_rubber_pad_groove(self):
         # a groove for the rubber pad on top
@@ -0,0 +1,43 @@
+"""
+Memoization of parametric parts.
+
+Parts like Bearing('608') or the gears build the very same solid tree every
+time they are instantiated with the same arguments. The classes which use the
+Memoized metaclass build it only once: the first instance is kept as a
+prototype, and each call returns a clone of it (see PySCADObject.clone()),
+which shares most of the solid tree but has its own transform, anchors and
+parts. Thus, transforming the returned object or calling mod() on its parts
+never affects the prototype.
+
+The parts build cheaper solids at lower levels of detail (see
+pyscad.scad.set_lod()), so the level of detail is part of the key.
+"""
+
+_cache = {} # (cls, lod, args, kwargs) -> prototype
+
+def _key(cls, args, kwargs):
+    # include the types, so that e.g. 1 and 1.0 and True are different keys
+    key = (cls, getattr(cls, 'lod', None),
+           tuple((type(arg), arg) for arg in args),
+           tuple(sorted((name, type(arg), arg) for name, arg in kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def clear():
+    _cache.clear()
+
+
+class Memoized(type):
+
+    def __call__(cls, *args, **kwargs):
+        key = _key(cls, args, kwargs)
+        if key is None:
+            # unhashable arguments, e.g. a list or a Point
+            return super().__call__(*args, **kwargs)
+        proto = _cache.get(key)
+        if proto is None:
+            proto = _cache[key] = super().__call__(*args, **kwargs)
+        return proto.clone()
@@ -0,0 +1,123 @@
+"""
+Compute the real geometry of an object (bounding box, volume, surface area)
+by exporting it with openscad and parsing the resulting mesh.
+
+This is useful for objects which don't have any anchor, e.g. the ones coming
+from ImportScad or ImportSTL. Exporting requires a full CGAL render, so the
+results are cached by the structural hash of the solid, see pyscad.dedup.
+"""
+
+import tempfile
+from pathlib import Path
+import numpy as np
+from .geometry import Point
+from .dedup import solid_hash
+from . import openscad
+
+
+class MeshInfo:
+
+    def __init__(self, pmin, pmax, volume, area):
+        self.pmin = pmin
+        self.pmax = pmax
+        self.volume = volume
+        self.area = area
+
+    def __repr__(self):
+        return (f'<MeshInfo pmin={self.pmin} pmax={self.pmax} '
+                f'volume={self.volume} area={self.area}>')
+
+    @classmethod
+    def from_triangles(cls, tris):
+        """
+        tris is a (n, 3, 3) array: for each triangle, its 3 vertices
+        """
+        if len(tris) == 0:
+            raise ValueError('Empty mesh')
+        points = tris.reshape(-1, 3)
+        pmin = Point(*points.min(axis=0).tolist())
+        pmax = Point(*points.max(axis=0).tolist())
+        a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+        cross = np.cross(b - a, c - a)
+        area = np.linalg.norm(cross, axis=1).sum() / 2
+        # divergence theorem: sum the signed volumes of the tetrahedra formed
+        # by each triangle and the origin
+        volume = np.einsum('ij,ij->', a, np.cross(b, c)) / 6
+        return cls(pmin, pmax, abs(float(volume)), float(area))
+
+
+def read_off(path):
+    """
+    Read an OFF file and return a (n, 3, 3) array of triangles. Polygonal
+    faces are triangulated as fans. Anything after the vertex indices of a
+    face (e.g. the colors written by newer openscad) is ignored.
+    """
+    lines = []
+    for line in Path(path).read_text().splitlines():
+        line = line.split('#', 1)[0].split()
+        if line:
+            lines.append(line)
+    if not lines or not lines[0][0].endswith('OFF'):
+        raise ValueError(f'Not an OFF file: {path}')
+    # the counts are either on the same line of the keyword or on the next one
+    header = lines[0][1:] or lines[1]
+    body = 1 if lines[0][1:] else 2
+    nv, nf = int(header[0]), int(header[1])
+    vertices = np.array([line[:3] for line in lines[body:body+nv]],
+                        dtype=float).reshape(nv, 3)
+    faces = []
+    for line in lines[body+nv:body+nv+nf]:
+        n = int(line[0])
+        idx = [int(t) for t in line[1:n+1]]
+        for j in range(1, n-1):
+            faces.append((idx[0], idx[j], idx[j+1]))
+    return vertices[np.array(faces, dtype=int).reshape(-1, 3)]
+
+def read_stl(path):
+    """
+    Read an ASCII or binary STL file and return a (n, 3, 3) array of
+    triangles.
+    """
+    data = Path(path).read_bytes()
+    if data.lstrip().startswith(b'solid') and b'facet' in data[:1024]:
+        vertices = [line.split()[1:4] for line in data.decode('ascii').splitlines()
+                    if line.lstrip().startswith('vertex')]
+        return np.array(vertices, dtype=float).reshape(-1, 3, 3)
+    n = int(np.frombuffer(data, dtype='<u4', count=1, offset=80)[0])
+    record = np.dtype([('normal', '<f4', 3), ('vertices', '<f4', (3, 3)),
+                       ('attr', '<u2')])
+    tris = np.frombuffer(data, dtype=record, count=n, offset=84)
+    return tris['vertices'].astype(float)
+
+def read_mesh(path):
+    path = Path(path)
+    if path.suffix.lower() == '.off':
+        return read_off(path)
+    elif path.suffix.lower() == '.stl':
+        return read_stl(path)
+    raise ValueError(f'Unsupported mesh format: {path}')
+
+
+# max number of entries of _cache: the oldest ones are dropped first
+CACHE_SIZE = 256
+_cache = {} # (solid hash, lod, render kwargs) -> MeshInfo
+
+def measure(obj, **kwargs):
+    """
+    Return the MeshInfo of obj. kwargs are passed to render_to_file, e.g. to
+    change $fn. The default $fn/$fa/$fs depend on the level of detail of obj,
+    so it's part of the key.
+    """
+    key = (solid_hash(obj.solid), obj.lod, tuple(sorted(kwargs.items())))
+    info = _cache.get(key)
+    if info is None:
+        with tempfile.TemporaryDirectory(prefix='pyscad-mesh-') as d:
+            scad = Path(d, 'mesh.scad')
+            off = Path(d, 'mesh.off')
+            obj.render_to_file(scad, **kwargs)
+            openscad.export(scad, off)
+            info = MeshInfo.from_triangles(read_off(off))
+        while len(_cache) >= CACHE_SIZE:
+            del _cache[next(iter(_cache))]
+        _cache[key] = info
+    return info
@@ -0,0 +1,286 @@
+"""
+Thin wrappers around the openscad executable
+"""
+
+import os
+import re
+import weakref
+import subprocess
+import threading
+import functools
+from pathlib import Path
+from .cache import hash_key, render_cache, export_cache
+
+# timeout in seconds for a single openscad job: by default, no timeout
+TIMEOUT = float(os.environ.get('PYSCAD_OPENSCAD_TIMEOUT', 0)) or None
+
+class OpenSCADError(Exception):
+    """
+    openscad failed or timed out. The captured stderr is in self.stderr.
+    """
+
+    def __init__(self, args, returncode, stderr):
+        self.args_ = args
+        self.returncode = returncode
+        self.stderr = stderr
+        cmd = ' '.join(args)
+        if returncode is None:
+            msg = f'openscad timed out: {cmd}'
+        else:
+            msg = f'openscad exited with code {returncode}: {cmd}'
+        if stderr:
+            msg += '\n' + stderr.rstrip()
+        super().__init__(msg)
+
+@functools.lru_cache()
+def version():
+    try:
+        res = subprocess.run(['openscad', '--version'], capture_output=True,
+                             text=True)
+    except FileNotFoundError:
+        return ''
+    # openscad prints the version on stderr
+    return (res.stdout + res.stderr).strip()
+
+def library_paths():
+    paths = os.environ.get('OPENSCADPATH', '')
+    return [Path(p) for p in re.split(r'[;:]', paths) if p]
+
+_USE_INCLUDE = re.compile(r'^\s*(?:use|include)\s*<([^>]+)>', re.MULTILINE)
+
+def find_dependencies(text, basedir):
+    """
+    Return the sorted list of all the files which are transitively use<>d or
+    include<>d by the given scad source.
+    """
+    result = set()
+    todo = [(text, Path(basedir))]
+    while todo:
+        text, basedir = todo.pop()
+        for name in _USE_INCLUDE.findall(text):
+            path = _resolve(name, basedir)
+            if path is None or path in result:
+                continue
+            result.add(path)
+            todo.append((path.read_text(errors='replace'), path.parent))
+    return sorted(result)
+
+def _resolve(name, basedir):
+    candidates = [basedir / name] + [d / name for d in library_paths()]
+    for path in candidates:
+        if path.is_file():
+            return path.resolve()
+    return None
+
+class Pool:
+    """
+    Queue of openscad jobs, executed by a fixed number of worker threads.
+
+    Each job runs in its own openscad process, so a crash or a timeout only
+    affects that job: the exception is stored in its Future. Identical jobs
+    which are submitted while the first one is still running share the same
+    Future, so that the same file is not rendered twice in parallel. Jobs
+    are identical if they have the same arguments and the input file has the
+    same content: if the file was rewritten in the meantime, the new job
+    runs after the old one, so that the stale output never overwrites the
+    new one.
+    """
+
+    def __init__(self, max_workers=None, timeout=TIMEOUT):
+        from concurrent.futures import ThreadPoolExecutor
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                           thread_name_prefix='openscad')
+        self.lock = threading.Lock()
+        self.running = {} # args -> (content key, Future)
+
+    def submit(self, args, *, timeout=None, key=None):
+        """
+        Schedule "openscad *args" and return a Future which resolves to its
+        stderr. key identifies the content of the input file: by default it's
+        a hash of the file and of its dependencies.
+        """
+        args = tuple(str(arg) for arg in args)
+        timeout = timeout or self.timeout
+        key = key or _content_key(args)
+        with self.lock:
+            running = self.running.get(args)
+            if running is None:
+                fut = self.executor.submit(run, args, timeout=timeout)
+            elif running[0] == key:
+                return running[1]
+            else:
+                # the executor runs the jobs in order, so the old one has
+                # already started when this one waits for it
+                fut = self.executor.submit(_run_after, running[1], args,
+                                           timeout=timeout)
+            self.running[args] = (key, fut)
+            fut.add_done_callback(lambda f: self._done(args, f))
+            return fut
+
+    def _done(self, args, fut):
+        with self.lock:
+            running = self.running.get(args)
+            if running is not None and running[1] is fut:
+                del self.running[args]
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+def _content_key(args):
+    # like render_key(), but without the version of openscad: it's the same
+    # for all the jobs of the process
+    try:
+        return hash_key(*_input_parts(args[0]), *args[1:])
+    except OSError:
+        # e.g. the input file does not exist: openscad will report the error
+        return None
+
+def _run_after(prev, args, *, timeout):
+    from concurrent.futures import wait
+    wait([prev])
+    return run(args, timeout=timeout)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def pool():
+    """
+    Return the global Pool, creating it if needed
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = Pool()
+        return _pool
+
+def run(args, *, timeout=TIMEOUT):
+    """
+    Run "openscad *args" and return its stderr. Raise OpenSCADError in case
+    of failure.
+    """
+    args = ['openscad'] + [str(arg) for arg in args]
+    try:
+        res = subprocess.run(args, capture_output=True, text=True,
+                             timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        stderr = e.stderr or ''
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode('utf-8', errors='replace')
+        raise OpenSCADError(args, None, stderr)
+    if res.returncode != 0:
+        raise OpenSCADError(args, res.returncode, res.stderr)
+    return res.stderr
+
+def render_key(scad, *args):
+    """
+    Compute a key which identifies the output of openscad on the given file
+    and the given extra arguments
+    """
+    return hash_key(version(), *_input_parts(scad), *args)
+
+def _input_parts(scad):
+    # the content of scad and of all its dependencies
+    scad = Path(scad)
+    text = scad.read_text()
+    parts = [text]
+    for dep in find_dependencies(text, scad.parent):
+        parts += [str(dep), dep.read_bytes()]
+    return parts
+
+def _png_args(scad, png, camera, size, view):
+    sx, sy = size
+    return [scad, '-o', png,
+            '--camera', camera.as_cmdline(),
+            '--imgsize', f'{sx},{sy}',
+            '--view', view]
+
+def _cache_key(cache, args):
+    # the key must not depend on the output filename, only on its suffix
+    if not cache.enabled:
+        return None
+    scad, _, out, *rest = args
+    return render_key(scad, Path(out).suffix, *rest)
+
+def _run_cached(cache, args):
+    out = args[2]
+    key = _cache_key(cache, args)
+    if key and cache.get(key, out):
+        return
+    pool().submit(args, key=key).result()
+    if key:
+        cache.put(key, out)
+
+def render_png(scad, png, *, camera, size=(512, 512), view='axes'):
+    _run_cached(render_cache, _png_args(scad, png, camera, size, view))
+
+def export(scad, out):
+    """
+    Export the given .scad file to STL/3MF/OFF/etc., depending on the suffix
+    of out. This does a full CGAL render, so the result is cached.
+    """
+    _run_cached(export_cache, [scad, '-o', out])
+
+
+# ======================================================================
+# asyncio API
+# ======================================================================
+
+# asyncio is imported inside the functions: it's expensive to import, and
+# it's not needed by scripts which don't use the async API
+
+# max number of openscad processes started by the async API which can run at
+# the same time, see set_concurrency()
+CONCURRENCY = os.cpu_count()
+_semaphores = weakref.WeakKeyDictionary() # loop -> Semaphore
+
+def set_concurrency(n):
+    global CONCURRENCY
+    CONCURRENCY = n
+    _semaphores.clear()
+
+def _semaphore():
+    # asyncio.Semaphore can be used only inside one event loop
+    import asyncio
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = _semaphores[loop] = asyncio.Semaphore(CONCURRENCY)
+    return sem
+
+async def run_async(args, *, timeout=TIMEOUT):
+    """
+    Like run(), but using asyncio
+    """
+    import asyncio
+    args = ['openscad'] + [str(arg) for arg in args]
+    async with _semaphore():
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE)
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise OpenSCADError(args, None, '')
+    stderr = stderr.decode('utf-8', errors='replace')
+    if proc.returncode != 0:
+        raise OpenSCADError(args, proc.returncode, stderr)
+    return stderr
+
+async def _run_cached_async(cache, args):
+    out = args[2]
+    key = _cache_key(cache, args)
+    if key and cache.get(key, out):
+        return
+    await run_async(args)
+    if key:
+        cache.put(key, out)
+
+async def render_png_async(scad, png, *, camera, size=(512, 512), view='axes'):
+    await _run_cached_async(render_cache, _png_args(scad, png, camera, size, view))
+
+async def export_async(scad, out):
+    await _run_cached_async(export_cache, [scad, '-o', out])
@@ -0,0 +1,456 @@
+"""
+A tiny software renderer, to get a preview of simple objects without running
+openscad.
+
+It supports only objects built out of cube, cylinder, sphere, polyhedron,
+union, difference, translate, rotate, scale, mirror, multmatrix and color:
+the primitives are tessellated with numpy, in the same way as openscad does,
+and rasterized with a z-buffer. Differences are not computed: the subtracted
+objects are shown as transparent ghosts, similar to what openscad does with
+the '#' modifier.
+
+The result is an approximation of the openscad preview, good enough for
+quick iterations, but don't use it for reference screenshots.
+"""
+
+import math
+import numpy as np
+from PIL import Image, ImageColor
+from solid.solidpython import OpenSCADObject
+from .camera import Camera
+
+class UnsupportedSolid(Exception):
+    pass
+
+# same colors as the default "Cornfield" color scheme of openscad
+BACKGROUND = (255, 255, 229)
+DEFAULT_COLOR = (249/255, 215/255, 44/255, 1.0)
+SUBTRACTED_COLOR = (157/255, 203/255, 81/255, 0.4)
+HIGHLIGHT_COLOR = (255/255, 81/255, 81/255, 0.5)  # '#' modifier
+BACKGROUND_MODIFIER_COLOR = (180/255, 180/255, 180/255, 0.3) # '%' modifier
+
+FOV = 22.5 # openscad's default field of view, in degrees
+LIGHT = np.array([0.3, -1.0, 0.5]) / np.linalg.norm([0.3, -1.0, 0.5])
+
+
+# ======================================================================
+# tessellation
+# ======================================================================
+
+def get_fragments(r, fn, fs, fa):
+    """
+    Number of fragments of a circle, same formula as openscad
+    """
+    if r < 1e-10:
+        return 3
+    if fn:
+        return max(int(fn), 3)
+    return int(math.ceil(max(min(360.0/fa, r*2*math.pi/fs), 5)))
+
+def _circle(r, n, z):
+    angles = np.arange(n) * (2*math.pi/n)
+    return np.stack([r*np.cos(angles), r*np.sin(angles), np.full(n, z)], axis=1)
+
+def _fan(poly):
+    # triangulate a convex polygon
+    n = len(poly)
+    idx = np.array([(0, i, i+1) for i in range(1, n-1)])
+    return poly[idx]
+
+def _band(ring1, ring2):
+    # triangles between two rings with the same number of points
+    nxt = np.roll(np.arange(len(ring1)), -1)
+    a, b = ring1, ring1[nxt]
+    c, d = ring2, ring2[nxt]
+    return np.concatenate([np.stack([a, b, d], axis=1),
+                           np.stack([a, d, c], axis=1)])
+
+def tessellate_cube(size, center):
+    if not isinstance(size, (list, tuple)):
+        size = [size] * 3
+    sx, sy, sz = size
+    corners = np.array([(x, y, z) for x in (0, sx) for y in (0, sy) for z in (0, sz)],
+                       dtype=float)
+    if center:
+        corners -= np.array([sx, sy, sz]) / 2
+    faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1),
+             (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    return np.concatenate([_fan(corners[list(f)]) for f in faces])
+
+def tessellate_cylinder(h, r1, r2, center, n):
+    z0 = -h/2 if center else 0
+    z1 = z0 + h
+    bottom = _circle(r1, n, z0)
+    top = _circle(r2, n, z1)
+    return np.concatenate([_fan(bottom), _fan(top), _band(bottom, top)])
+
+def tessellate_sphere(r, n):
+    rings = (n + 1) // 2
+    circles = []
+    for i in range(rings):
+        phi = math.pi * (i + 0.5) / rings
+        circles.append(_circle(r*math.sin(phi), n, r*math.cos(phi)))
+    parts = [_fan(circles[0]), _fan(circles[-1])]
+    for c1, c2 in zip(circles, circles[1:]):
+        parts.append(_band(c1, c2))
+    return np.concatenate(parts)
+
+def tessellate_polyhedron(points, faces):
+    points = np.asarray(points, dtype=float)
+    return np.concatenate([_fan(points[list(face)]) for face in faces])
+
+
+# ======================================================================
+# transformations
+# ======================================================================
+
+def _rotation_x(a):
+    c, s = math.cos(math.radians(a)), math.sin(math.radians(a))
+    return np.array([[1, 0, 0], [0, c, -s], [0, s, c]])
+
+def _rotation_y(a):
+    c, s = math.cos(math.radians(a)), math.sin(math.radians(a))
+    return np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]])
+
+def _rotation_z(a):
+    c, s = math.cos(math.radians(a)), math.sin(math.radians(a))
+    return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+
+def _rotation_axis(a, v):
+    v = np.asarray(v, dtype=float)
+    v = v / np.linalg.norm(v)
+    x, y, z = v
+    c, s = math.cos(math.radians(a)), math.sin(math.radians(a))
+    k = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    return c*np.eye(3) + s*k + (1-c)*np.outer(v, v)
+
+def _affine(linear=None, offset=None):
+    m = np.eye(4)
+    if linear is not None:
+        m[:3, :3] = linear
+    if offset is not None:
+        m[:3, 3] = offset
+    return m
+
+def _vec3(v, default=0):
+    if not isinstance(v, (list, tuple)):
+        return [v, v, v]
+    v = list(v) + [default] * (3 - len(v))
+    return v[:3]
+
+def _node_matrix(node):
+    p = node.params
+    if node.name == 'translate':
+        return _affine(offset=_vec3(p['v']))
+    elif node.name == 'rotate':
+        a, v = p['a'], p.get('v')
+        if isinstance(a, (list, tuple)):
+            x, y, z = _vec3(a)
+            return _affine(_rotation_z(z) @ _rotation_y(y) @ _rotation_x(x))
+        if v is None:
+            return _affine(_rotation_z(a))
+        return _affine(_rotation_axis(a, v))
+    elif node.name == 'scale':
+        return _affine(np.diag(_vec3(p['v'], 1)))
+    elif node.name == 'mirror':
+        n = np.asarray(_vec3(p['v']), dtype=float)
+        n = n / np.linalg.norm(n)
+        return _affine(np.eye(3) - 2*np.outer(n, n))
+    elif node.name == 'multmatrix':
+        m = np.eye(4)
+        rows = np.asarray(p['m'], dtype=float)
+        m[:rows.shape[0], :rows.shape[1]] = rows
+        return m
+    return None
+
+def _parse_color(c, alpha):
+    if isinstance(c, str):
+        if c.startswith('#') and len(c) in (5, 9):
+            # openscad supports #rgba and #rrggbbaa
+            rgba = ImageColor.getrgb(c)
+        else:
+            rgba = ImageColor.getrgb(c) + (round(alpha*255),)
+        return tuple(x/255 for x in rgba[:3]) + (rgba[3]/255,)
+    c = list(c)
+    if len(c) == 3:
+        c.append(alpha)
+    return tuple(c)
+
+
+# ======================================================================
+# scene
+# ======================================================================
+
+class Scene:
+    """
+    The list of triangles of a solid tree, in world coordinates
+    """
+
+    def __init__(self, root, *, fn=None, fa=1, fs=0.4):
+        self.fn = fn
+        self.fa = fa
+        self.fs = fs
+        self.meshes = [] # [(tris, rgba, is_ghost)]
+        root = self._find_root_modifier(root) or root
+        self._collect(root)
+
+    @staticmethod
+    def _children(node):
+        if isinstance(node, OpenSCADObject):
+            return node.children
+        if hasattr(node, '_preview_solid'):
+            return [node._preview_solid] # _PreviewSolid
+        return []
+
+    def _find_root_modifier(self, root):
+        # openscad renders only the first subtree marked with '!'
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if getattr(node, 'modifier', '') == '!':
+                return node
+            stack.extend(reversed(self._children(node)))
+        return None
+
+    def _fragments(self, r, node):
+        fn = node.params.get('segments') or node.params.get('$fn') or self.fn
+        fa = node.params.get('$fa') or self.fa
+        fs = node.params.get('$fs') or self.fs
+        return get_fragments(r, fn, fs, fa)
+
+    def _collect(self, root):
+        # for each node we keep track of the transformation matrix, the
+        # color, the color of the ghost to draw (or None) and whether to draw
+        # it as a solid
+        stack = [(root, np.eye(4), DEFAULT_COLOR, None, True)]
+        while stack:
+            node, m, color, ghost, opaque = stack.pop()
+            if not isinstance(node, OpenSCADObject):
+                if hasattr(node, '_preview_solid'):
+                    stack.append((node._preview_solid, m, color, ghost, opaque))
+                    continue
+                raise UnsupportedSolid(type(node).__name__)
+            modifier = node.modifier
+            if modifier == '*':
+                continue
+            elif modifier == '%':
+                ghost = BACKGROUND_MODIFIER_COLOR
+                opaque = False
+            elif modifier == '#':
+                ghost = HIGHLIGHT_COLOR
+            #
+            tris = self._tessellate(node)
+            if tris is not None:
+                tris = tris @ m[:3, :3].T + m[:3, 3]
+                if opaque and color[3] < 1:
+                    # transparent colors are drawn as ghosts
+                    self.meshes.append((tris, color, True))
+                elif opaque:
+                    self.meshes.append((tris, color, False))
+                if ghost:
+                    self.meshes.append((tris, ghost, True))
+                continue
+            #
+            name = node.name
+            children = node.children
+            if name == 'color':
+                color = _parse_color(node.params['c'], node.params.get('alpha', 1.0))
+            elif name == 'difference':
+                stack.extend((child, m, color, ghost or SUBTRACTED_COLOR, False)
+                             for child in reversed(children[1:]))
+                children = children[:1]
+            elif name == 'for':
+                # see pyscad.shapes._ForLoop: one copy of the children for
+                # each iteration
+                for t in reversed(node.transforms):
+                    mt = m @ _affine(*t._arrays())
+                    stack.extend((child, mt, color, ghost, opaque)
+                                 for child in reversed(children))
+                continue
+            elif name not in ('union', 'group', 'render', 'hole', 'part'):
+                nm = _node_matrix(node)
+                if nm is None:
+                    raise UnsupportedSolid(name)
+                m = m @ nm
+            stack.extend((child, m, color, ghost, opaque)
+                         for child in reversed(children))
+
+    def _tessellate(self, node):
+        p = node.params
+        if node.name == 'cube':
+            return tessellate_cube(p.get('size', 1), p.get('center'))
+        elif node.name == 'cylinder':
+            r = p.get('r')
+            d = p.get('d')
+            if d is not None:
+                r = d/2
+            r = 1 if r is None else r
+            r1 = p['d1']/2 if p.get('d1') is not None else p.get('r1')
+            r2 = p['d2']/2 if p.get('d2') is not None else p.get('r2')
+            r1 = r if r1 is None else r1
+            r2 = r if r2 is None else r2
+            n = self._fragments(max(r1, r2), node)
+            return tessellate_cylinder(p.get('h', 1), r1, r2, p.get('center'), n)
+        elif node.name == 'sphere':
+            r = p['d']/2 if p.get('d') is not None else p.get('r') or 1
+            return tessellate_sphere(r, self._fragments(r, node))
+        elif node.name == 'polyhedron':
+            return tessellate_polyhedron(p['points'], p.get('faces') or p['triangles'])
+        return None
+
+
+# ======================================================================
+# rasterization
+# ======================================================================
+
+class Rasterizer:
+
+    def __init__(self, camera, size, projection='perspective'):
+        self.camera = camera
+        self.w, self.h = size
+        self.projection = projection
+        self.zbuf = np.full((self.h, self.w), np.inf)
+        self.color = np.empty((self.h, self.w, 3))
+        self.color[:] = np.array(BACKGROUND) / 255
+        self.ghost_zbuf = np.full((self.h, self.w), np.inf)
+        self.ghost_color = np.zeros((self.h, self.w, 4))
+
+    def view_matrix(self):
+        """
+        World -> camera coordinates: the eye is at (0, -distance, 0), looking
+        towards +y, with +z up (like openscad)
+        """
+        cam = self.camera
+        vpt = np.array([cam.vpt.x, cam.vpt.y, cam.vpt.z], dtype=float)
+        r = _rotation_x(90 - cam.vpr.x) @ _rotation_y(-cam.vpr.y) @ _rotation_z(-cam.vpr.z)
+        return _affine(r) @ _affine(offset=-vpt)
+
+    def project(self, tris):
+        """
+        Return screen coordinates (x, y) and depth of the vertices of the
+        triangles, plus their shading factor
+        """
+        view = self.view_matrix()
+        cam = tris @ view[:3, :3].T + view[:3, 3]
+        depth = cam[..., 1] + self.camera.distance
+        if self.projection == 'perspective':
+            f = 1 / math.tan(math.radians(FOV/2))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sx = f * cam[..., 0] / depth
+                sy = f * cam[..., 2] / depth
+        else:
+            f = 1 / (self.camera.distance * math.tan(math.radians(FOV/2)))
+            sx = f * cam[..., 0]
+            sy = f * cam[..., 2]
+        aspect = self.w / self.h
+        px = (sx / aspect + 1) / 2 * self.w
+        py = (1 - sy) / 2 * self.h
+        #
+        normals = np.cross(cam[:, 1] - cam[:, 0], cam[:, 2] - cam[:, 0])
+        norm = np.linalg.norm(normals, axis=1)
+        norm[norm == 0] = 1
+        light = np.abs(normals @ LIGHT) / norm
+        shade = 0.35 + 0.65*light
+        return np.stack([px, py], axis=-1), depth, shade
+
+    def draw(self, tris, rgba, ghost):
+        if len(tris) == 0:
+            return
+        xy, depth, shade = self.project(tris)
+        if ghost:
+            colors = np.empty((len(tris), 4))
+            colors[:, :3] = np.outer(shade, rgba[:3])
+            colors[:, 3] = rgba[3]
+        else:
+            colors = np.outer(shade, rgba[:3])
+        #
+        # skip the triangles which are (partially) behind the camera, out of
+        # the screen or degenerate
+        (x0, y0), (x1, y1), (x2, y2) = xy[:, 0].T, xy[:, 1].T, xy[:, 2].T
+        area = (x1-x0)*(y2-y0) - (x2-x0)*(y1-y0)
+        xmin = np.floor(xy[..., 0].min(axis=1)).clip(0, self.w - 1)
+        xmax = np.ceil(xy[..., 0].max(axis=1)).clip(0, self.w - 1)
+        ymin = np.floor(xy[..., 1].min(axis=1)).clip(0, self.h - 1)
+        ymax = np.ceil(xy[..., 1].max(axis=1)).clip(0, self.h - 1)
+        ok = ((depth > 1e-3).all(axis=1) & (np.abs(area) > 1e-12) &
+              (xy[..., 0].max(axis=1) >= 0) & (xy[..., 0].min(axis=1) < self.w) &
+              (xy[..., 1].max(axis=1) >= 0) & (xy[..., 1].min(axis=1) < self.h))
+        #
+        # rasterize the triangles in batches of similar size: the
+        # triangles of each batch are evaluated together on a KxK grid of
+        # pixels
+        side = np.maximum(xmax - xmin, ymax - ymin) + 1
+        bucket = np.ceil(np.log2(np.maximum(side, 1))).astype(int)
+        for b in np.unique(bucket[ok]):
+            idx = np.nonzero(ok & (bucket == b))[0]
+            K = 2**b
+            n = max(1, self.BATCH_PIXELS // (K*K))
+            for start in range(0, len(idx), n):
+                sel = idx[start:start+n]
+                self._draw_batch(xy[sel], depth[sel], area[sel], colors[sel],
+                                 xmin[sel].astype(int), xmax[sel].astype(int),
+                                 ymin[sel].astype(int), ymax[sel].astype(int),
+                                 ghost)
+
+    BATCH_PIXELS = 1 << 20
+
+    def _draw_batch(self, xy, z, area, colors, xmin, xmax, ymin, ymax, ghost):
+        kx = (xmax - xmin).max() + 1
+        ky = (ymax - ymin).max() + 1
+        # (n, 1, kx) and (n, ky, 1): all the arrays below are (n, ky, kx)
+        px = xmin[:, None, None] + np.arange(kx)[None, None, :]
+        py = ymin[:, None, None] + np.arange(ky)[None, :, None]
+        # float32 is precise enough for pixel coordinates, and faster
+        X = (px + 0.5).astype(np.float32)
+        Y = (py + 0.5).astype(np.float32)
+        xy = xy.astype(np.float32)
+        z = z.astype(np.float32)
+        area = area.astype(np.float32)
+        x0, y0 = xy[:, 0, 0, None, None], xy[:, 0, 1, None, None]
+        x1, y1 = xy[:, 1, 0, None, None], xy[:, 1, 1, None, None]
+        x2, y2 = xy[:, 2, 0, None, None], xy[:, 2, 1, None, None]
+        area = area[:, None, None]
+        w0 = ((x1-X)*(y2-Y) - (x2-X)*(y1-Y)) / area
+        w1 = ((x2-X)*(y0-Y) - (x0-X)*(y2-Y)) / area
+        w2 = 1 - w0 - w1
+        inside = ((w0 >= 0) & (w1 >= 0) & (w2 >= 0) &
+                  (px <= xmax[:, None, None]) & (py <= ymax[:, None, None]))
+        depth = (w0*z[:, 0, None, None] + w1*z[:, 1, None, None] +
+                 w2*z[:, 2, None, None])
+        #
+        tri, _, _ = np.nonzero(inside)
+        pixels = (np.broadcast_to(py, inside.shape)[inside] * self.w +
+                  np.broadcast_to(px, inside.shape)[inside])
+        depth = depth[inside]
+        if ghost:
+            zbuf = self.ghost_zbuf.reshape(-1)
+            cbuf = self.ghost_color.reshape(-1, 4)
+        else:
+            zbuf = self.zbuf.reshape(-1)
+            cbuf = self.color.reshape(-1, 3)
+        # z-test: many triangles of the batch can cover the same pixel
+        np.minimum.at(zbuf, pixels, depth)
+        win = depth <= zbuf[pixels]
+        cbuf[pixels[win]] = colors[tri[win]]
+
+    def image(self):
+        color = self.color
+        # blend the ghosts which are in front of the solid geometry
+        front = self.ghost_zbuf < self.zbuf
+        alpha = self.ghost_color[..., 3:] * front[..., None]
+        color = color * (1 - alpha) + self.ghost_color[..., :3] * alpha
+        data = (np.clip(color, 0, 1) * 255).round().astype(np.uint8)
+        return Image.fromarray(data, 'RGB')
+
+
+def render_preview(root, camera=Camera.DEFAULT, size=(512, 512), *,
+                   projection='perspective', fn=None, fa=1, fs=0.4):
+    """
+    Render the given solid to a PIL image. Raise UnsupportedSolid if the tree
+    contains something which we cannot render.
+    """
+    scene = Scene(root, fn=fn, fa=fa, fs=fs)
+    raster = Rasterizer(camera, size, projection)
+    for tris, rgba, ghost in scene.meshes:
+        raster.draw(tris, rgba, ghost)
+    return raster.image()
@@ -8,14 +8,28 @@ Naming convention:
 """
 
 import os
+import sys
+import copy
+import math
 from pathlib import Path
 import functools
 
 import solid
-from .geometry import Point, Vector, AnchorPoints
+from .geometry import Point, Vector, AnchorPoints, Transform, Affine
 from .camera import Camera
-from .util import InvalidAnchorPoints, render_to_collage
+from .util import (InvalidAnchorPoints, render_to_collage,
+                   render_to_collage_async, open_if_changed)
 from .autorender import autorender
+from . import openscad
+from . import mesh
+from . import scadlib
+from .dedup import scad_render_dedup
+from .stream import scad_render_stream
+
+# importing the submodule above sets pyscad.autorender to the module: make
+# sure that "from pyscad import autorender" returns the function, also when
+# this is imported before pyscad/__init__ loads it (e.g. by pyscad.lib)
+sys.modules[__package__].autorender = autorender
 
 EPS = 0.001
 
@@ -24,14 +38,80 @@ os.environ['OPENSCADPATH'] = ':'.join([
     str(Path(__file__).parent),
 ])
 
+# levels of detail, from the cheapest to the most accurate, see set_lod()
+LODS = ('draft', 'preview', 'final')
+
+# $fn/$fa/$fs used by render_to_file() at each level of detail
+LOD_RESOLUTION = {
+    'draft':   {'fn': 12, 'fa': 12, 'fs': 2},
+    'preview': {'fn': None, 'fa': 6, 'fs': 1},
+    'final':   {'fn': None, 'fa': 1, 'fs': 0.4},
+}
+
+# max distance (in mm) between a circle and the sides of the polygon which
+# approximates it, at each level of detail, see segments_for(). None means to
+# use $fn/$fa/$fs instead
+LOD_CHORD_ERROR = {
+    'draft':   0.5,
+    'preview': 0.1,
+    'final':   0.02,
+}
+MIN_SEGMENTS = 8
+MAX_SEGMENTS = 360
+
+def set_lod(lod):
+    """
+    Set the level of detail of the objects which are built from now on:
+
+      - 'draft': the library parts are replaced by cheap proxies with the
+        same anchors (e.g. a gear becomes its equivalent cylinder, a
+        bearing a plain ring), and the circles are very coarse
+
+      - 'preview': the real parts, but with coarser circles and without the
+        geometry which is needed only by the slicer (e.g. the extra walls of
+        RoundHole)
+
+      - 'final': everything, at full resolution
+
+    The default is 'final', or $PYSCAD_LOD. It can also be overridden by a
+    single class, e.g. Bearing.lod = 'final'.
+    """
+    if lod not in LODS:
+        raise ValueError(f'Invalid level of detail: {lod}')
+    PySCADObject.lod = lod
+
+def segments_for(r, lod=None):
+    """
+    Number of segments of a circle of radius r, so that the chord error is at
+    most LOD_CHORD_ERROR[lod]: small holes get few segments, big plates many,
+    instead of the same global $fn for everything.
+
+    The result is a multiple of 4, so that the polygon touches its bounding
+    box. Return None if there is no chord error for the lod.
+    """
+    error = LOD_CHORD_ERROR[lod or PySCADObject.lod]
+    if error is None or r <= 0:
+        return None
+    if error >= r:
+        n = MIN_SEGMENTS
+    else:
+        n = math.ceil(math.pi / math.acos(1 - error/r))
+    n = math.ceil(n/4) * 4
+    return max(MIN_SEGMENTS, min(n, MAX_SEGMENTS))
+
+
 class PySCADObject:
     """
     This is a wrapper around solid.OpenSCADObject, so that we can add our own
     functionalities
     """
 
+    # level of detail, see set_lod()
+    lod = os.environ.get('PYSCAD_LOD', 'final')
+
     def __init__(self, *args, **kwargs):
-        self.anchors = AnchorPoints()
+        self._transform = Transform()
+        self.anchors = AnchorPoints(self._transform)
         self.children = []
         self.solid = None
         self.init_solid(*args, **kwargs)
@@ -40,34 +120,149 @@ class PySCADObject:
     def init_solid(self, *args, **kwargs):
         raise NotImplementedError
 
+    def clone(self):
+        """
+        Return a copy of self, which can be transformed independently of the
+        original. This is much cheaper than building the object again:
+
+            h3 = Cylinder(d=22.40, h=18, axis='x')
+            h9 = h3.clone()
+            h3.move_to(left=body.right)
+            h9.move_to(right=body.left)
+
+        The solid tree is mostly shared: the clone gets a copy only of the
+        nodes of its parts and of their ancestors, so that mod() on the
+        clone or on its parts does not touch the original (and vice versa),
+        while translate() & co. wrap them into new nodes anyway. The
+        transforms are copied (they are small) and the anchors are copied on
+        write. The named parts are cloned recursively, and their anchors
+        follow the clone.
+
+        The clone is detached: if self is a part of another object, the
+        anchors of the clone don't follow it.
+        """
+        memo = {}
+        new = self._clone_part(memo)
+        objs = [obj for obj in memo.values() if isinstance(obj, PySCADObject)]
+        copies = {}
+        _copy_spine(self.solid, {id(obj.solid) for obj in objs}, copies)
+        for obj in objs:
+            # the solid of a part might not be in the tree, e.g. if the part
+            # was transformed after being added
+            copy_ = copies.get(id(obj.solid))
+            obj.__dict__['solid'] = copy_ or _copy_node(obj.solid)
+        return new
+    copy = clone
+
+    def _clone_part(self, memo):
+        # memo maps the id of the already-cloned objects and transforms to
+        # their copy
+        new = memo.get(id(self))
+        if new is not None:
+            return new
+        new = memo[id(self)] = object.__new__(type(self))
+        d = dict(self.__dict__)
+        d['_transform'] = self._transform._clone(memo)
+        if isinstance(self.anchors, AnchorPoints):
+            d['anchors'] = self.anchors._clone(self.anchors._transform._clone(memo))
+        d['children'] = [child._clone_part(memo) for child in self.children]
+        for name, value in self.__dict__.items():
+            if name == 'children':
+                continue
+            if isinstance(value, PySCADObject):
+                d[name] = value._clone_part(memo)
+            elif isinstance(value, list) and any(isinstance(x, PySCADObject)
+                                                 for x in value):
+                d[name] = [x._clone_part(memo) if isinstance(x, PySCADObject) else x
+                           for x in value]
+        # bypass CustomObject.__setattr__, which would add the parts again
+        new.__dict__.update(d)
+        return new
+
     def autorender(self, *, filename='/tmp/autorender.scad', **kwargs):
         autorender(self, filename, **kwargs)
 
-    def render_to_file(self, filename, *, fa=1, fs=0.4, fn=None):
+    def render_to_file(self, filename, *, fa=None, fs=None, fn=None, dedup=False):
+        """
+        Write the SCAD code of the object to filename. If the file already
+        contains the same code, it is not touched.
+
+        fa, fs and fn default to the resolution of the level of detail, see
+        set_lod(). Pass 0 to omit them. Note that Cylinder, TCone, Sphere and
+        DonutSlice have their own number of segments, see segments_for(), so
+        they are not affected.
+
+        If dedup==True, repeated subtrees are emitted only once as an
+        OpenSCAD module, see pyscad.dedup.
+        """
+        resolution = LOD_RESOLUTION[self.lod]
+        fn = resolution['fn'] if fn is None else fn
+        fa = resolution['fa'] if fa is None else fa
+        fs = resolution['fs'] if fs is None else fs
         header = []
         if fn: header.append(f'$fn = {fn};')
         if fa: header.append(f'$fa = {fa};')
         if fs: header.append(f'$fs = {fs};')
         header = '\n'.join(header)
-        return solid.scad_render_to_file(self.solid, filename, file_header=header)
+        # we don't use solid.scad_render_to_file because it adds a timestamp,
+        # which would make the output different at every call (and thus
+        # impossible to cache)
+        path = Path(filename)
+        with open_if_changed(path) as f:
+            if dedup:
+                f.write(scad_render_dedup(self.solid, file_header=header))
+            else:
+                scad_render_stream(self.solid, f, file_header=header)
+        return path.absolute().as_posix()
 
     def render_to_image(self, filename, camera=Camera.DEFAULT, size=(512, 512),
-                        **kwargs):
+                        *, engine='openscad', **kwargs):
+        """
+        Render the object to a PNG. If engine=='preview', use the
+        pure-python renderer instead of openscad, see pyscad.preview.
+        """
+        png = Path(filename)
+        if engine == 'preview':
+            from .preview import render_preview
+            render_preview(self.solid, camera, size, **kwargs).save(png)
+            return
+        scad = png.with_suffix('.scad')
+        self.render_to_file(scad, **kwargs)
+        openscad.render_png(scad, png, camera=camera, size=size)
+
+    def render_to_collage(self, filename, distance=None, *, engine='openscad'):
+        render_to_collage(self, filename, distance, engine=engine)
+
+    # async variants of the methods above: they can be used to render many
+    # objects/views at the same time. The max number of concurrent openscad
+    # processes is controlled by openscad.set_concurrency()
+
+    async def render_to_file_async(self, filename, **kwargs):
+        # generating the SCAD code is pure python, run it in a thread so that
+        # we don't block the event loop
+        import asyncio
+        return await asyncio.to_thread(self.render_to_file, filename, **kwargs)
+
+    async def render_to_image_async(self, filename, camera=Camera.DEFAULT,
+                                    size=(512, 512), **kwargs):
         png = Path(filename)
         scad = png.with_suffix('.scad')
+        await self.render_to_file_async(scad, **kwargs)
+        await openscad.render_png_async(scad, png, camera=camera, size=size)
+
+    async def render_to_collage_async(self, filename, distance=None):
+        await render_to_collage_async(self, filename, distance)
+
+    def export(self, filename, **kwargs):
+        """
+        Render the object to STL, 3MF, OFF, etc. depending on the suffix of
+        filename. The .scad file is written next to it.
+        """
+        out = Path(filename)
+        scad = out.with_suffix('.scad')
         self.render_to_file(scad, **kwargs)
-        cam = camera.as_cmdline()
-        sx, sy = size
-        view = 'axes'
-        ret = os.system(f'openscad "{scad}" -o "{png}" '
-                        f'--camera {cam} '
-                        f'--imgsize {sx},{sy} '
-                        f'--view {view}')
-        if ret != 0:
-            raise ValueError(ret)
-
-    def render_to_collage(self, filename, distance=None):
-        render_to_collage(self, filename, distance)
+        openscad.export(scad, out)
+        return out
 
     def __getattr__(self, name):
         if self.anchors.has_point(name):
@@ -77,12 +272,6 @@ class PySCADObject:
     def invalidate_anchors(self):
         self.anchors = InvalidAnchorPoints(self.anchors)
 
-    def _all_anchors(self):
-        yield self.anchors
-        for child in self.children:
-            assert isinstance(child, PySCADObject)
-            yield from child._all_anchors()
-
     def move_to(self, **kwargs):
         for anchor, new_p in kwargs.items():
             current_p = getattr(self.anchors, anchor)
@@ -90,12 +279,47 @@ class PySCADObject:
             self.translate(v.x, v.y, v.z)
         return self
 
-    def get_bounding_box(self):
-        if not self.anchors.has_point('pmin') or not self.anchors.has_point('pmax'):
-            raise ValueError('Cannot find a bounding box')
-        size = self.pmax - self.pmin
+    def measure(self, **kwargs):
+        """
+        Return a MeshInfo with the real bounding box, volume and surface area
+        of the object. This runs a full openscad render, see pyscad.mesh.
+        """
+        return mesh.measure(self, **kwargs)
+
+    def fit_bounding_box(self, **kwargs):
+        """
+        Set the bounding box anchors from the real geometry of the object.
+        Useful e.g. for GenericSCADWrapper and ImportSTL, which don't have any.
+        """
+        info = self.measure(**kwargs)
+        # the measured box is axis-aligned in the current coordinates, which
+        # might not be expressible in the local coordinates of the object
+        # (e.g. if it's rotated). Use a new frame, which starts from here and
+        # follows the future transformations of the object
+        frame = Transform()
+        frame.attach(self._transform)
+        anchors = AnchorPoints(frame)
+        if not isinstance(self.anchors, InvalidAnchorPoints):
+            anchors.copy_from(self.anchors)
+        anchors.set_bounding_box(info.pmin, info.pmax)
+        self.anchors = anchors
+        return self
+
+    def get_bounding_box(self, *, exact=False):
+        """
+        Return a Cube corresponding to the bounding box. If exact==True,
+        compute it from the real geometry, else use the anchors.
+        """
+        if exact:
+            info = self.measure()
+            pmin, pmax = info.pmin, info.pmax
+        elif self.anchors.has_point('pmin') and self.anchors.has_point('pmax'):
+            pmin, pmax = self.pmin, self.pmax
+        else:
+            raise ValueError('Cannot find a bounding box, try exact=True')
+        size = pmax - pmin
         bbox = Cube(size.x, size.y, size.z)
-        bbox.move_to(pmin=self.pmin)
+        bbox.move_to(pmin=pmin)
         return bbox
 
     def show_bounding_box(self):
@@ -105,26 +329,42 @@ class PySCADObject:
         return self
 
     def translate(self, x=0, y=0, z=0):
-        for anchors in self._all_anchors():
-            anchors.translate(Vector(x, y, z))
+        # this automatically moves the anchors of self and all the
+        # descendants, see Transform
+        self._transform.translate(Vector(x, y, z))
         self.solid = solid.translate([x, y, z])(self.solid)
         return self
     tr = translate
 
     def scale(self, x=1, y=1, z=1):
-        self.invalidate_anchors()
+        self._transform.apply(Affine.scaling(x, y, z))
         self.solid = solid.scale([x, y, z])(self.solid)
         return self
     sc = scale
 
     def rotate(self, x=0, y=0, z=0, v=None):
-        self.invalidate_anchors()
+        if v is None:
+            self._transform.apply(Affine.rotation(x, y, z))
+            # anchors like 'left' or 'top' are planes, and they can't be
+            # expressed anymore after an arbitrary rotation
+            if any(angle % 90 != 0 for angle in (x, y, z)):
+                self.invalidate_anchors()
+        else:
+            self.invalidate_anchors()
         self.solid = solid.rotate([x, y, z], v)(self.solid)
         return self
     rot = rotate
 
     def resize(self, x=0, y=0, z=0, auto=None):
-        self.invalidate_anchors()
+        # resize() is just a scale() whose factors are computed from the
+        # bounding box, so we can track it only if we know the bbox
+        if not auto and self.anchors.has_point('pmin') and self.anchors.has_point('pmax'):
+            size = self.pmax - self.pmin
+            factors = [new/old if new else 1
+                       for new, old in zip((x, y, z), (size.x, size.y, size.z))]
+            self._transform.apply(Affine.scaling(*factors))
+        else:
+            self.invalidate_anchors()
         self.solid = solid.resize([x, y, z], auto)(self.solid)
         return self
     rsz = resize
@@ -147,6 +387,10 @@ class PySCADObject:
     def hide(self):
         return self.mod('*')
 
+    def _add_child(self, child):
+        self.children.append(child)
+        child._transform.attach(self._transform)
+
     def __neg__(self):
         return Neg(self)
 
@@ -159,7 +403,7 @@ class PySCADObject:
 
     def __iadd__(self, other):
         if isinstance(other, PySCADObject):
-            self.children.append(other)
+            self._add_child(other)
             self.solid += other.solid
             return self
         elif isinstance(other, Neg):
@@ -175,17 +419,44 @@ class PySCADObject:
     def __isub__(self, other):
         if not isinstance(other, PySCADObject):
             return NotImplemented
-        self.children.append(other)
+        self._add_child(other)
         self.solid -= other.solid
         return self
 
     def __imul__(self, other):
         if not isinstance(other, PySCADObject):
             return NotImplemented
-        self.children.append(other)
+        self._add_child(other)
         self.solid *= other.solid
         return self
 
+def _copy_node(node):
+    """
+    Shallow copy of a solid: the children are shared
+    """
+    new = copy.copy(node)
+    new.children = list(node.children)
+    new.params = dict(node.params)
+    return new
+
+def _copy_spine(node, targets, copies):
+    """
+    Copy the nodes whose id is in targets, and all their ancestors: the other
+    subtrees are shared. copies maps the id of each visited node to its copy,
+    or to the node itself if it was not copied
+    """
+    key = id(node)
+    if key in copies:
+        return copies[key]
+    new = node
+    children = [_copy_spine(child, targets, copies) for child in node.children]
+    if key in targets or any(a is not b for a, b in zip(children, node.children)):
+        new = _copy_node(node)
+        new.children = children
+    copies[key] = new
+    return new
+
+
 class Neg:
 
     def __init__(self, x):
@@ -205,7 +476,7 @@ class Difference(PySCADObject):
     def init_solid(self, *objs):
         self.solid = solid.difference()
         for obj in objs:
-            self.children.append(obj)
+            self._add_child(obj)
             self.solid.add(obj.solid)
 
 
@@ -235,6 +506,14 @@ class Cube(PySCADObject):
         assert self.anchors.center == Point.O
         self.size = Vector(sx, sy, sz)
 
+# rotation needed to turn something which is built along the z axis into
+# something along the given axis
+AXIS_ROT_VECTOR = {
+    'x': [0, 90, 0],
+    'y': [-90, 0, 0],
+    'z': [0, 0, 0],
+}
+
 def _get_r_d(r, d):
     if d is None:
         assert r is not None
@@ -256,7 +535,7 @@ class Sphere(PySCADObject):
         pmax = Point(r, r, r)
         self.anchors.set_bounding_box(pmin, pmax)
         assert self.anchors.center == Point.O
-        self.solid = solid.sphere(d=d)
+        self.solid = solid.sphere(d=d, segments=segments_for(r, self.lod))
 
 class Cylinder(PySCADObject):
     """
@@ -276,7 +555,8 @@ class Cylinder(PySCADObject):
 
     If you specify 'segments' it generates a polygon instead. In that case,
     the radius/diameter measures the distance between two opposing VERTEXES,
-    not sides.
+    not sides. Else, the number of segments depends on the radius, see
+    segments_for().
     """
 
     def init_solid(self, *, h, axis='z', r=None, d=None, segments=None):
@@ -291,26 +571,15 @@ class Cylinder(PySCADObject):
         self.h = h
         self.axis = axis
         R = max(r1, r2)
-        if axis == 'z':
-            pmin = Point(-R, -R, -h/2)
-            pmax = Point( R,  R,  h/2)
-            self.rot_vector = [0, 0, 0]
-        elif axis == 'x':
-            pmin = Point(-h/2, -R, -R)
-            pmax = Point( h/2,  R,  R)
-            self.rot_vector = [0, 90, 0]
-        elif axis == 'y':
-            pmin = Point(-R, -h/2, -R)
-            pmax = Point( R,  h/2,  R)
-            self.rot_vector = [-90, 0, 0]
-        else:
-            assert False
-
-        self.anchors.set_bounding_box(pmin, pmax)
+        if segments is None:
+            segments = segments_for(R, self.lod)
+        self.rot_vector = AXIS_ROT_VECTOR[axis]
+        # build the cylinder along the z axis and rotate it: the anchors are
+        # rotated as well
+        self.solid = solid.cylinder(h=h, r1=r1, r2=r2, center=True, segments=segments)
+        self.anchors.set_bounding_box(Point(-R, -R, -h/2), Point(R, R, h/2))
+        self.rotate(*self.rot_vector)
         assert self.anchors.center == Point.O
-        self.solid = solid.rotate(self.rot_vector)(
-            solid.cylinder(h=h, r1=r1, r2=r2, center=True, segments=segments)
-        )
 
 
 class TCone(Cylinder):
@@ -331,6 +600,9 @@ class Text(PySCADObject):
                    spacing=None, direction=None, language=None, script=None,
                    segments=None):
         assert h is not None
+        if self.lod != 'final':
+            # use the coarser resolution of the level of detail
+            segments = None
         t = solid.text(text, size, font, halign, valign,
                        spacing, direction, language, script, segments)
         self.solid = solid.linear_extrude(h)(t)
@@ -375,6 +647,45 @@ class CustomObject(PySCADObject):
             object.__setattr__(self, name, obj)
             self -= obj
 
+    def parts(self):
+        """
+        Return a dict containing all the named parts of the object, i.e. the
+        public attributes which are PySCADObjects. The PySCADObjects inside a
+        list attribute are included as NAME_0, NAME_1, etc.
+        """
+        parts = {}
+        for name, obj in self.__dict__.items():
+            if name.startswith('_') or name == 'children':
+                continue
+            if isinstance(obj, PySCADObject):
+                parts[name] = obj
+            elif isinstance(obj, list):
+                for i, item in enumerate(obj):
+                    if isinstance(item, PySCADObject):
+                        parts[f'{name}_{i}'] = item
+        return parts
+
+    def export_parts(self, directory, *, format='stl', parts=None,
+                     max_workers=None, **kwargs):
+        """
+        Export each named part to directory/NAME.stl (or .3mf, etc.).
+
+        The parts are rendered in parallel, and the results are cached: only
+        the parts whose SCAD code changed are actually rendered again.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        all_parts = self.parts()
+        if parts is None:
+            parts = list(all_parts)
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            jobs = {}
+            for name in parts:
+                out = directory / f'{name}.{format}'
+                jobs[name] = pool.submit(all_parts[name].export, out, **kwargs)
+            return {name: job.result() for name, job in jobs.items()}
+
 def bolt_hole(*, d, h, clearance=0.2):
     h = h + EPS*2
     cyl = Cylinder(d=d+clearance, h=h)
@@ -409,26 +720,45 @@ class _PreviewSolid:
         self.params.update(self._preview_solid.params)
         self.params.update(self._render_solid.params)
 
-    def _render(self):
-        lines = []
-        w = lines.append
-        w('if ($preview) {')
+    def _render_parts(self):
+        # list of strings and solids, see also pyscad.stream
+        parts = ['if ($preview) {\n']
         if self._preview_solid:
-            w(self._preview_solid._render())
-        w('} else {')
+            parts += [self._preview_solid, '\n']
+        parts.append('} else {\n')
         if self._render_solid:
-            w(self._render_solid._render())
-        w('}')
-        return '\n'.join(lines)
+            parts += [self._render_solid, '\n']
+        parts.append('}')
+        return parts
+
+    def _render(self):
+        return ''.join(part if isinstance(part, str) else part._render()
+                       for part in self._render_parts())
 
 
 
 class ImportScad:
 
+    # all the .scad files read by ImportScad, including the ones which they
+    # use<> or include<>. Used by autorender to know which files to watch
+    files = scadlib.loaded_files
+
     def __init__(self, modname):
-        self.mod = solid.import_scad(modname)
+        self.modname = modname
+        self._mod = None
+
+    @property
+    def mod(self):
+        # the library is loaded on first use, so that e.g. importing
+        # pyscad.lib.gears does not need to read gears.scad. The parsed
+        # signatures are cached on disk, see pyscad.scadlib
+        if self._mod is None:
+            self._mod = scadlib.import_scad(self.modname)
+        return self._mod
 
     def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
         fn = getattr(self.mod, name)
         @functools.wraps(fn)
         def wrapper(*args, **kwargs):
@@ -444,4 +774,7 @@ class GenericSCADWrapper(PySCADObject):
 
 class ImportSTL(PySCADObject):
     def init_solid(self, path):
+        # openscad resolves relative paths w.r.t. the .scad file, which is
+        # usually somewhere else (e.g. /tmp/autorender.scad)
+        path = Path(path).absolute().as_posix()
         self.solid = solid.import_stl(path)
@@ -0,0 +1,197 @@
+"""
+Load OpenSCAD libraries, like solid.import_scad().
+
+solid parses the .scad sources with regexps to find the signatures of the
+modules and functions, every time the library is imported, i.e. at every
+start of the interpreter. Here the parsed signatures are stored in a
+persistent cache, indexed by path. An entry is valid if the mtime and size
+of the file did not change; if they did, the content hash is compared before
+parsing the file again (e.g. after a git checkout which does not modify the
+file).
+
+We also cache the list of the files which are use<>d or include<>d by each
+library, which autorender needs to know which files to watch.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from solid.solidpython import (parse_scad_callables, IncludedOpenSCADObject,
+                               _subbed_keyword)
+from solid.objects import _openscad_library_paths
+from .cache import CACHE_DIR, hash_key
+from .openscad import find_dependencies
+
+CACHE_FILE = CACHE_DIR / 'scadlib.json'
+
+# the cache is invalidated if solid parses the files in a different way
+_VERSION = hash_key(parse_scad_callables.__code__.co_code)
+
+# all the .scad files loaded so far, including the ones which they use<> or
+# include<>
+loaded_files = set()
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class SignatureCache:
+    """
+    path -> {'stat': [mtime_ns, size], 'sha256': ..., 'symbols': [...],
+             'deps': {dep_path: [mtime_ns, size]}}
+    """
+
+    def __init__(self, filename):
+        self.filename = Path(filename)
+        self.enabled = not os.environ.get('PYSCAD_NO_CACHE')
+        self.entries = None
+        self.dirty = False
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        if not self.enabled:
+            return
+        try:
+            data = json.loads(self.filename.read_text())
+        except (OSError, ValueError):
+            return
+        if data.get('version') == _VERSION:
+            self.entries = data['entries']
+
+    def save(self):
+        if not self.enabled or not self.dirty:
+            return
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        # write+rename, so that concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.filename.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': _VERSION, 'entries': self.entries}, f)
+        os.replace(tmp, self.filename)
+        self.dirty = False
+
+    def get(self, path):
+        """
+        Return (symbols, deps) for the given .scad file. symbols is in the
+        format returned by solid's parse_scad_callables, deps is the list
+        of the files transitively used by it.
+        """
+        self._load()
+        key = str(path)
+        entry = self.entries.get(key)
+        stat = _stat(path)
+        if entry is not None and entry['stat'] != stat:
+            # maybe the file was touched but not modified
+            data = path.read_bytes()
+            if _sha256(data) == entry['sha256']:
+                entry['stat'] = stat
+                self.dirty = True
+            else:
+                entry = None
+        if entry is None:
+            data = path.read_bytes()
+            text = data.decode('utf-8', 'replace')
+            entry = {
+                'stat': stat,
+                'sha256': _sha256(data),
+                'symbols': parse_scad_callables(text),
+                'deps': self._deps(text, path),
+            }
+            self.entries[key] = entry
+            self.dirty = True
+        elif any(_stat(dep) != dep_stat for dep, dep_stat in entry['deps'].items()):
+            # one of the dependencies changed, and it might use<> other files
+            entry['deps'] = self._deps(path.read_text(errors='replace'), path)
+            self.dirty = True
+        return entry['symbols'], list(entry['deps'])
+
+    @staticmethod
+    def _deps(text, path):
+        return {str(dep): _stat(dep) for dep in find_dependencies(text, path.parent)}
+
+signature_cache = SignatureCache(CACHE_FILE)
+
+
+def _make_class(name, argnames, include_file_path):
+    """
+    Equivalent to the class generated by solid.new_openscad_class_str(), i.e.
+    the arguments can be passed by position or by name, and they default to
+    None. Compiling the generated source takes most of the time needed to
+    import a library, so we build the class directly.
+    """
+    name = _subbed_keyword(name)
+    argnames = [_subbed_keyword(arg) for arg in argnames]
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(argnames):
+            raise TypeError(f'{name}() takes {len(argnames)} positional arguments '
+                            f'but {len(args)} were given')
+        params = dict(zip(argnames, args))
+        for arg in argnames[:len(args)]:
+            if arg in kwargs:
+                raise TypeError(f"{name}() got multiple values for argument '{arg}'")
+        for arg in argnames[len(args):]:
+            params[arg] = kwargs.pop(arg, None)
+        IncludedOpenSCADObject.__init__(self, name, params,
+                                        include_file_path=include_file_path,
+                                        use_not_include=True, **kwargs)
+
+    return type(name, (IncludedOpenSCADObject,), {'__init__': __init__})
+
+def _use(path, namespace):
+    # same as solid.use(), but with the cached symbols
+    symbols, deps = signature_cache.get(path)
+    loaded_files.add(path.resolve())
+    loaded_files.update(Path(dep) for dep in deps)
+    for sd in symbols:
+        cls = _make_class(sd['name'], sd['args'] + sd['kwargs'], path.as_posix())
+        setattr(namespace, cls.__name__, cls)
+
+def _import(path):
+    # same as solid.objects._import_scad
+    if path.is_file() and path.suffix == '.scad':
+        namespace = SimpleNamespace()
+        _use(path.absolute(), namespace)
+        return namespace
+    elif path.is_dir():
+        namespace = None
+        for f in sorted(path.iterdir()):
+            if f.is_dir() or f.suffix == '.scad':
+                subspace = _import(f)
+                if subspace is not None:
+                    if namespace is None:
+                        namespace = SimpleNamespace()
+                    setattr(namespace, f.stem, subspace)
+        return namespace
+    return None
+
+def import_scad(modname):
+    """
+    Same as solid.import_scad: modname is a .scad file or a directory,
+    relative to the OpenSCAD library paths if it's not absolute
+    """
+    scad = Path(modname)
+    candidates = [scad]
+    if not scad.is_absolute():
+        candidates = [d/scad for d in _openscad_library_paths()]
+    try:
+        for path in candidates:
+            namespace = _import(path)
+            if namespace is not None:
+                return namespace
+    finally:
+        signature_cache.save()
+    raise ValueError(f'Could not find .scad files at or under {scad}. \n'
+                     f'Locations searched were: {candidates}')
@@ -1,9 +1,12 @@
 import math
+import numpy as np
 import solid
-from .scad import PySCADObject, _get_r_d, Cylinder
-from .geometry import Point, Vector, AnchorPoints
+from solid.solidpython import OpenSCADObject, py2openscad
+from .scad import (PySCADObject, _get_r_d, Cylinder, AXIS_ROT_VECTOR, ImportScad,
+                   segments_for)
+from .geometry import Point, Vector, AnchorPoints, Affine, _to_array
 
-_shapes2d = solid.import_scad('MCAD/2Dshapes.scad')
+_shapes2d = ImportScad('MCAD/2Dshapes.scad')
 
 class DonutSlice(PySCADObject):
 
@@ -14,18 +17,19 @@ class DonutSlice(PySCADObject):
         self.h = h
         self.start_angle = start_angle
         self.end_angle = end_angle
-        donut = _shapes2d.donutSlice(self.r1, self.r2, start_angle, end_angle)
-        donut3d = solid.translate([0, 0, -h/2])(
+        # $fn is passed down to the circles of donutSlice()
+        donut = _shapes2d.mod.donutSlice(self.r1, self.r2, start_angle, end_angle,
+                                         segments=segments_for(self.r2, self.lod))
+        self.solid = solid.translate([0, 0, -h/2])(
             solid.linear_extrude(h)(
                 donut
             )
         )
-        # compute the equivalent cylinder
-        cyl = Cylinder(d=self.d2, h=h, axis=axis)
-        donut3d = solid.rotate(cyl.rot_vector)(donut3d)
-        self.anchors.center = Point.O
-        self.anchors.set_bounding_box(cyl.pmin, cyl.pmax)
-        self.solid = donut3d
+        # same anchors as the equivalent cylinder along the z axis, then
+        # rotate everything as needed by the 'axis'
+        r = self.r2
+        self.anchors.set_bounding_box(Point(-r, -r, -h/2), Point(r, r, h/2))
+        self.rotate(*AXIS_ROT_VECTOR[axis])
 
 def CirumscribedHexagon(*, h, axis='z', r=None, d=None):
     """
@@ -43,3 +47,157 @@ def HexKey(*, size, h, axis='z'):
     Hex/allen key of the given size (i.e., the side-to-side diameter).
     """
     return CirumscribedHexagon(d=size, h=h, axis=axis)
+
+
+class _ForLoop(OpenSCADObject):
+    """
+    OpenSCAD for() loop around its children. header is the SCAD code of the
+    loop, e.g. 'for (i = [0:3]) translate(i * [10, 0, 0])', and transforms
+    are the Affine transformations of each iteration, in the same order:
+    pyscad.preview uses them instead of evaluating the SCAD expressions.
+    """
+
+    def __init__(self, header, transforms=()):
+        # header is in params so that it's part of the structural hash, see
+        # pyscad.dedup
+        super().__init__('for', {'header': header})
+        self.header = header
+        self.transforms = transforms
+
+    def _render_str_no_children(self):
+        return '\n' + self.modifier + self.header
+
+
+def _scad_range(n):
+    return f'[0:{n-1}]'
+
+class _Array(PySCADObject):
+    """
+    Base class for LinearArray, PolarArray and GridArray: many copies of the
+    same object, each one with its own transformation.
+
+    The object is emitted only once, inside a for() loop, so the size of the
+    SCAD code does not depend on the number of copies. The anchors are
+    computed from the ones of the object:
+
+      - the bounding box of all the copies (if the object has one)
+      - item0, item1, ...: the center of each copy (or its origin, if the
+        object has no center)
+
+    Use instance() to get all the anchors of a given copy.
+    """
+
+    def _init_array(self, obj, header, transforms, names):
+        assert transforms, 'An array needs at least one item'
+        self._item = obj
+        self.transforms = transforms
+        self.solid = _ForLoop(header, transforms)(obj.solid)
+        #
+        anchors = obj.anchors
+        ref = anchors.center if anchors.has_point('center') else Point.O
+        ref = _to_array([ref])
+        self.anchors._set_array([f'item{name}' for name in names],
+                                np.concatenate([t.apply_array(ref) for t in transforms]))
+        if anchors.has_point('pmin') and anchors.has_point('pmax'):
+            p1, p2 = obj.pmin, obj.pmax
+            corners = _to_array([Point(x, y, z)
+                                 for x in (p1.x, p2.x)
+                                 for y in (p1.y, p2.y)
+                                 for z in (p1.z, p2.z)])
+            corners = np.concatenate([t.apply_array(corners) for t in transforms])
+            self.anchors.set_bounding_box(Point(*corners.min(axis=0).tolist()),
+                                          Point(*corners.max(axis=0).tolist()))
+
+    def instance(self, i):
+        """
+        Return a copy of the i-th item, placed where it is in the array. This
+        is useful mostly for its anchors, e.g. arr.instance(2).top
+        """
+        obj = self._item.clone()
+        m = self._transform.total() @ self.transforms[i]
+        obj._transform.apply(m)
+        rows = [list(row) for row in m.rows] + [[0, 0, 0, 1]]
+        obj.solid = solid.multmatrix(rows)(obj.solid)
+        return obj
+
+
+class LinearArray(_Array):
+    """
+    n copies of obj, each one translated by (x, y, z) from the previous one:
+
+        LinearArray(Cube(5), 4, x=10)
+    """
+
+    def init_solid(self, obj, n, *, x=0, y=0, z=0):
+        self.n = n
+        self.step = step = Vector(x, y, z)
+        transforms = [Affine.translation(step*i) for i in range(n)]
+        header = f'for (i = {_scad_range(n)}) translate(i * {py2openscad([x, y, z])})'
+        self._init_array(obj, header, transforms, range(n))
+
+
+# unit vector of each axis, for rotate(a, v)
+AXIS_VECTOR = {
+    'x': [1, 0, 0],
+    'y': [0, 1, 0],
+    'z': [0, 0, 1],
+}
+
+class PolarArray(_Array):
+    """
+    n copies of obj, rotated around the given axis. The i-th copy is
+    rotated by start + i*step degrees; by default the copies are evenly
+    spaced on the whole circle.
+
+        PolarArray(Cylinder(d=5, h=10).tr(x=20), 4)
+    """
+
+    def init_solid(self, obj, n, *, step=None, start=0, axis='z'):
+        if step is None:
+            step = 360 / n
+        self.n = n
+        self.step = step
+        self.start = start
+        self.axis = axis
+        v = AXIS_VECTOR[axis]
+        transforms = [Affine.rotation(*[(start + i*step)*k for k in v])
+                      for i in range(n)]
+        angle = f'i * {py2openscad(step)}'
+        if start:
+            angle = f'{py2openscad(start)} + {angle}'
+        header = f'for (i = {_scad_range(n)}) rotate(a = {angle}, v = {py2openscad(v)})'
+        self._init_array(obj, header, transforms, range(n))
+
+
+class GridArray(_Array):
+    """
+    nx*ny*nz copies of obj, arranged in a grid with the given spacing. The
+    anchors of the copies are called item{i}_{j} (or item{i}_{j}_{k} if
+    nz > 1).
+
+        GridArray(Cylinder(d=3, h=10), nx=5, ny=3, dx=10, dy=8)
+    """
+
+    def init_solid(self, obj, *, nx, ny, dx, dy, nz=1, dz=0):
+        self.nx = nx
+        self.ny = ny
+        self.nz = nz
+        transforms = []
+        names = []
+        for i in range(nx):
+            for j in range(ny):
+                for k in range(nz):
+                    transforms.append(Affine.translation(Vector(i*dx, j*dy, k*dz)))
+                    names.append(f'{i}_{j}_{k}' if nz > 1 else f'{i}_{j}')
+        dx, dy, dz = [py2openscad(x) for x in (dx, dy, dz)]
+        if nz > 1:
+            header = (f'for (i = {_scad_range(nx)}, j = {_scad_range(ny)}, '
+                      f'k = {_scad_range(nz)}) '
+                      f'translate([i * {dx}, j * {dy}, k * {dz}])')
+        else:
+            header = (f'for (i = {_scad_range(nx)}, j = {_scad_range(ny)}) '
+                      f'translate([i * {dx}, j * {dy}, 0])')
+        self._init_array(obj, header, transforms, names)
+
+    def instance(self, i, j, k=0):
+        return super().instance((i*self.ny + j)*self.nz + k)
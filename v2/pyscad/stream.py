@@ -0,0 +1,101 @@
+"""
+Write the SCAD code of a solid tree to a file object, chunk by chunk.
+
+The output is the same as solid.scad_render(), but the whole program is never
+built in memory, and the tree is walked with an explicit stack, so that very
+deep trees don't hit the recursion limit.
+"""
+
+from solid.solidpython import (OpenSCADObject, IncludedOpenSCADObject,
+                               non_rendered_classes, scad_render)
+
+# flush the buffered chunks to the file every FLUSH_EVERY chunks
+FLUSH_EVERY = 1024
+
+
+def _scan(root):
+    """
+    Return the include strings (see solid.solidpython._find_include_strings)
+    and whether the tree contains holes or parts, without recursion.
+    """
+    includes = set()
+    has_holes = False
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, IncludedOpenSCADObject):
+            includes.add(node.include_string)
+        if getattr(node, 'is_hole', False) or getattr(node, 'is_part_root', False):
+            has_holes = True
+        stack.extend(node.children)
+        # solid also looks for IncludedOpenSCADObjects passed as parameters
+        for param in node.params.values():
+            if isinstance(param, OpenSCADObject):
+                stack.append(param)
+    # sort the strings, so that the output does not depend on the ordering
+    # of a set
+    return sorted(includes), has_holes
+
+
+_NEWLINES = ['\n' + '\t'*i for i in range(64)]
+
+class _Writer:
+
+    def __init__(self, f):
+        self.f = f
+        self.chunks = []
+
+    def write(self, text, depth=0):
+        if depth:
+            text = text.replace('\n', _NEWLINES[depth] if depth < 64 else
+                                '\n' + '\t'*depth)
+        self.chunks.append(text)
+        if len(self.chunks) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        self.f.write(''.join(self.chunks))
+        self.chunks = []
+
+
+def scad_render_stream(root, f, file_header=''):
+    """
+    Like solid.scad_render(root, file_header), but write the result to the
+    file object f.
+    """
+    includes, has_holes = _scan(root)
+    if has_holes:
+        # holes are moved to the end of their part by solid: this is not
+        # supported here (and pyscad does not use them), just fall back to
+        # the non-streaming version
+        f.write(scad_render(root, file_header))
+        return
+    if file_header and not file_header.endswith('\n'):
+        file_header += '\n'
+    out = _Writer(f)
+    out.write(file_header)
+    out.write(''.join(includes) + '\n')
+    #
+    # the stack contains either nodes to render or text to write, and the
+    # indentation level of each
+    stack = [(root, 0)]
+    while stack:
+        item, depth = stack.pop()
+        if isinstance(item, str):
+            out.write(item, depth)
+        elif not isinstance(item, OpenSCADObject):
+            if hasattr(item, '_render_parts'):
+                # opaque node made of strings and solids, e.g. _PreviewSolid
+                stack.extend((part, depth) for part in reversed(item._render_parts()))
+            else:
+                out.write(item._render(), depth)
+        elif item.name in non_rendered_classes:
+            stack.extend((child, depth) for child in reversed(item.children))
+        elif not item.children:
+            out.write(item._render_str_no_children() + ';', depth)
+        else:
+            out.write(item._render_str_no_children() + ' {', depth)
+            stack.append(('\n}', depth))
+            depth += 1
+            stack.extend((child, depth) for child in reversed(item.children))
+    out.flush()
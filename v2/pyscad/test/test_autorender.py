@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import signal
+import subprocess
+import textwrap
+from pathlib import Path
+import pytest
+from pyscad.autorender import (HotReloader, Watcher, watched_files, find_viewer,
+                               run_openscad_maybe)
+from pyscad import Cube
+
+class TestHotReloader:
+
+    def write(self, f, src):
+        f.write(textwrap.dedent(src))
+        # make sure that the mtime changes even on filesystems with a coarse
+        # resolution
+        st = os.stat(f)
+        os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    def test_reload(self, tmpdir, monkeypatch):
+        monkeypatch.syspath_prepend(str(tmpdir))
+        helper = tmpdir.join('myhelper.py')
+        other = tmpdir.join('myother.py')
+        main = tmpdir.join('mymain.py')
+        self.write(helper, """
+            SIZE = 1
+        """)
+        self.write(other, """
+            from myhelper import SIZE
+            def get_size():
+                return SIZE
+        """)
+        self.write(main, """
+            from pyscad import Cube
+            from pyscad.autorender import autorender
+            import myother
+            autorender(Cube(myother.get_size()), 'out.scad', fn=10)
+        """)
+        import myother
+        try:
+            reloader = HotReloader(main)
+            obj, filename, kwargs = reloader.reload()
+            assert obj.pmax.x == 0.5
+            assert filename == 'out.scad'
+            assert kwargs == {'fn': 10}
+            assert reloader.changed_modules() == []
+            #
+            self.write(helper, """
+                SIZE = 2
+            """)
+            assert [m.__name__ for m in reloader.changed_modules()] == ['myhelper']
+            obj, filename, kwargs = reloader.reload()
+            # myother must be reloaded too, because it depends on myhelper
+            assert obj.pmax.x == 1
+        finally:
+            del sys.modules['myhelper']
+            del sys.modules['myother']
+
+    def test_can_reload(self, tmpdir):
+        import pyscad.scad
+        import pyscad.lib.gears
+        reloader = HotReloader(tmpdir.join('main.py'))
+        assert reloader.can_reload(tmpdir.join('foo.py'))
+        assert reloader.can_reload(pyscad.lib.gears.__file__)
+        assert not reloader.can_reload(pyscad.scad.__file__)
+        assert not reloader.can_reload(tmpdir.join('foo.scad'))
+
+
+class TestWatcher:
+
+    def test_changes(self, tmpdir):
+        a = tmpdir.join('a.py')
+        b = tmpdir.join('sub', 'b.scad')
+        a.write('')
+        b.write('', ensure=True)
+        watcher = Watcher(debounce=0.1)
+        watcher.watch([a, b])
+        # a burst of writes is reported as a single change
+        a.write('x = 1')
+        a.write('x = 2')
+        b.write('cube();')
+        tmpdir.join('unrelated.py').write('')
+        tmpdir.join('.#a.py').write('')
+        changes = watcher.changes()
+        assert next(changes) == {Path(a), Path(b)}
+        a.write('x = 3')
+        assert next(changes) == {Path(a)}
+
+    def test_watched_files(self):
+        import pyscad.lib.motors
+        from pyscad.scad import ImportScad
+        files = watched_files(__file__)
+        assert Path(__file__) in files
+        assert Path(pyscad.lib.motors.__file__) in files
+        assert ImportScad.files <= files
+        assert Path(pytest.__file__) not in files
+
+
+class TestViewer:
+
+    @pytest.fixture
+    def viewer(self, tmpdir, monkeypatch):
+        # a fake openscad: python renamed as openscad, which "renders" the
+        # .scad files by executing them. The .scad just sleeps
+        bindir = tmpdir.join('bin').ensure(dir=True)
+        bindir.join('openscad').mksymlinkto(sys.executable)
+        monkeypatch.setenv('PATH', f'{bindir}:{os.environ["PATH"]}')
+        scad = tmpdir.join('a.scad')
+        scad.write('import time; time.sleep(30)')
+        pids = []
+        yield scad, pids
+        for pid in pids:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+
+    def wait_for_exec(self, pid):
+        # /proc/PID/comm is updated slightly after the exec()
+        for i in range(100):
+            with open(f'/proc/{pid}/comm') as f:
+                if f.read().strip() == 'openscad':
+                    return
+            time.sleep(0.01)
+
+    def test_run_openscad_maybe(self, tmpdir, viewer):
+        scad, pids = viewer
+        assert find_viewer(scad) is None
+        run_openscad_maybe(scad)
+        pid = int(tmpdir.join('.a.scad.openscad.pid').read())
+        pids.append(pid)
+        self.wait_for_exec(pid)
+        assert find_viewer(scad) == pid
+        # this does not start a new process
+        run_openscad_maybe(scad)
+        assert int(tmpdir.join('.a.scad.openscad.pid').read()) == pid
+
+    def test_fallback_proc_scan(self, tmpdir, viewer):
+        scad, pids = viewer
+        proc = subprocess.Popen(['openscad', str(scad)])
+        pids.append(proc.pid)
+        self.wait_for_exec(proc.pid)
+        assert find_viewer(tmpdir.join('b.scad')) is None
+        # no pidfile: found by scanning /proc
+        assert find_viewer(scad) == proc.pid
+        assert int(tmpdir.join('.a.scad.openscad.pid').read()) == proc.pid
+
+    def test_stale_pidfile(self, tmpdir):
+        scad = tmpdir.join('a.scad')
+        # the PID of a process which is surely not openscad
+        tmpdir.join('.a.scad.openscad.pid').write(str(os.getpid()))
+        assert find_viewer(scad) is None
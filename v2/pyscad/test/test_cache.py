@@ -0,0 +1,52 @@
+import os
+import time
+from pyscad.cache import FileCache, hash_key
+from pyscad.openscad import find_dependencies
+
+class TestFileCache:
+
+    def test_hash_key(self):
+        assert hash_key('ab', 'c') != hash_key('a', 'bc')
+        assert hash_key('a', (1, 2)) == hash_key('a', (1, 2))
+        assert hash_key('a', (1, 2)) != hash_key('a', (1, 3))
+
+    def test_get_put(self, tmpdir):
+        cache = FileCache(tmpdir.join('cache'), max_size=1000)
+        cache.enabled = True
+        src = tmpdir.join('src.png')
+        src.write('hello')
+        dst = tmpdir.join('dst.png')
+        assert not cache.get('aabbcc', dst)
+        cache.put('aabbcc', src)
+        assert cache.get('aabbcc', dst)
+        assert dst.read() == 'hello'
+
+    def test_evict_lru(self, tmpdir):
+        cache = FileCache(tmpdir.join('cache'), max_size=25)
+        cache.enabled = True
+        src = tmpdir.join('src.png')
+        src.write('x' * 10)
+        dst = tmpdir.join('dst.png')
+        cache.put('aa01', src)
+        cache.put('aa02', src)
+        # make sure that the two entries have different mtimes
+        old = time.time() - 100
+        os.utime(cache._path('aa01', '.png'), (old, old))
+        os.utime(cache._path('aa02', '.png'), (old+1, old+1))
+        assert cache.get('aa01', dst) # aa01 is now the most recently used
+        cache.put('aa03', src)
+        assert cache.size() == 20
+        assert cache.get('aa01', dst)
+        assert not cache.get('aa02', dst)
+        assert cache.get('aa03', dst)
+
+
+class TestDependencies:
+
+    def test_find_dependencies(self, tmpdir):
+        tmpdir.join('a.scad').write('use <sub/b.scad>\n')
+        tmpdir.join('sub', 'b.scad').write('include <c.scad>\n', ensure=True)
+        tmpdir.join('sub', 'c.scad').write('module c() {}\n')
+        text = 'use <a.scad>\ncube();\n'
+        deps = find_dependencies(text, str(tmpdir))
+        assert [d.name for d in deps] == ['a.scad', 'b.scad', 'c.scad']
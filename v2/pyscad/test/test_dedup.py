@@ -0,0 +1,82 @@
+import solid
+from pyscad.scad import Cube, Cylinder, CustomObject, Union, Preview
+from pyscad.geometry import Point
+from pyscad.dedup import solid_hash, scad_render_dedup
+
+def four_holes():
+    obj = Cube(50, 50, 5)
+    for x, y in [(10, 10), (-10, 10), (-10, -10), (10, -10)]:
+        obj -= Cylinder(d=4.9, h=20).move_to(center=Point(x, y, 0))
+    return obj
+
+class TestDedup:
+
+    def test_solid_hash(self):
+        a = Cylinder(d=4.9, h=20)
+        b = Cylinder(d=4.9, h=20)
+        c = Cylinder(d=5, h=20)
+        assert solid_hash(a.solid) == solid_hash(b.solid)
+        assert solid_hash(a.solid) != solid_hash(c.solid)
+        assert solid_hash(a.solid) != solid_hash(a.mod('#').solid)
+
+    def test_no_duplicates(self):
+        obj = Cube(10) + Cylinder(d=5, h=10)
+        assert scad_render_dedup(obj.solid) == solid.scad_render(obj.solid)
+
+    def test_dedup(self):
+        obj = four_holes()
+        src = scad_render_dedup(obj.solid)
+        # the rotated cylinder is emitted only once
+        assert src.count('cylinder(') == 1
+        assert src.count('module _pyscad_') == 1
+        name = src.split('module ')[1].split('(')[0]
+        assert src.count(f'{name}();') == 4
+
+    def test_nested(self):
+        # the whole plate is a module, and its body calls the module of the
+        # rotated cylinder
+        obj = Union()
+        obj += four_holes().translate(x=100)
+        obj += four_holes().translate(x=-100)
+        src = scad_render_dedup(obj.solid)
+        assert src.count('module _pyscad_') == 2
+        assert src.count('cylinder(') == 1
+        assert src.count('cube(') == 1
+
+    def test_nested_single_use(self):
+        # the cylinder is used only inside the repeated subtree: it should
+        # not become a module on its own, since it is emitted only once
+        obj = Union()
+        obj += (Cube(10) - Cylinder(d=3, h=20)).translate(x=10)
+        obj += (Cube(10) - Cylinder(d=3, h=20)).translate(x=-10)
+        src = scad_render_dedup(obj.solid)
+        assert src.count('module _pyscad_') == 1
+        assert src.count('cylinder(') == 1
+
+    def test_modifier(self):
+        obj = Union()
+        obj += Cube(5).translate(x=1).mod('%')
+        obj += Cube(5).translate(x=1)
+        src = scad_render_dedup(obj.solid)
+        assert src.count('module _pyscad_') == 0
+        #
+        # the modifier is moved from the module body to the call
+        obj = Union()
+        obj += Cube(5).translate(x=1).mod('%')
+        obj += Cube(5).translate(x=1).mod('%')
+        src = scad_render_dedup(obj.solid)
+        assert src.count('module _pyscad_') == 1
+        assert src.count('%_pyscad_') == 2
+        assert src.count('%translate') == 0
+
+    def test_includes_sorted(self, tmpdir):
+        from solid.solidpython import IncludedOpenSCADObject
+        libs = []
+        for name in ('zeta', 'alpha', 'mu'):
+            lib = tmpdir.join(f'{name}.scad')
+            lib.write(f'module {name}() {{ cube(1); }}\n')
+            libs.append(IncludedOpenSCADObject(name, {}, str(lib), use_not_include=True))
+        src = scad_render_dedup(solid.union()(*libs))
+        uses = [line for line in src.splitlines() if line.startswith('use <')]
+        assert len(uses) == 3
+        assert uses == sorted(uses)
@@ -1,4 +1,7 @@
-from pyscad.geometry import Point, Vector, AnchorPoints
+import pytest
+import numpy as np
+from pyscad.geometry import (Point, Vector, AnchorPoints, Affine, Transform,
+                             InvalidAnchorError)
 
 class TestPointVector:
 
@@ -89,6 +92,24 @@ class TestAnchorPoints:
         assert a.p1 == Point(11, 22, 33)
         assert a.p2 == Point(14, 25, 36)
 
+    def test_clone_copy_on_write(self):
+        a = AnchorPoints(p1=Point(1, 2, 3))
+        b = a._clone(None)
+        assert b._coords is a._coords
+        b.translate(Vector(10, 0, 0))
+        b.p2 = Point(0, 0, 0)
+        assert b.p1 == Point(11, 2, 3)
+        assert a.p1 == Point(1, 2, 3)
+        assert not a.has_point('p2')
+        a.p1 = Point(0, 0, 0)
+        assert b.p1 == Point(11, 2, 3)
+
+    def test_None_components(self):
+        a = AnchorPoints(p=Point(1, None, 3))
+        a.translate(Vector(1, 1, 1))
+        assert a.p == Point(2, None, 4)
+        assert type(a.p.x) is float
+
     def test_copy_from(self):
         src = AnchorPoints(p1=Point(1, 2, 3),
                            p2=Point(4, 5, 6))
@@ -96,3 +117,100 @@ class TestAnchorPoints:
         dst.copy_from(src)
         assert dst.p1 == src.p1
         assert dst.p2 == src.p2
+
+
+class TestAffine:
+
+    def test_translation(self):
+        m = Affine.translation(Vector(1, 2, 3))
+        assert m.is_translation()
+        assert m.apply(Point(10, None, 30)) == Point(11, None, 33)
+        assert m.inverse() == Affine.translation(Vector(-1, -2, -3))
+
+    def test_rotation(self):
+        m = Affine.rotation(0, 0, 90)
+        assert m.apply(Point(1, 2, 3)) == Point(-2, 1, 3)
+        assert m.apply(Point(1, None, None)) == Point(None, 1, None)
+        # OpenSCAD rotates around X first, then Y, then Z
+        m = Affine.rotation(90, 0, 90)
+        assert m.apply(Point(1, 2, 3)) == Point(3, 1, 2)
+
+    def test_rotation_partial_point(self):
+        m = Affine.rotation(0, 0, 45)
+        p = m.apply(Point(1, 0, 0))
+        assert p.x == pytest.approx(p.y)
+        with pytest.raises(InvalidAnchorError):
+            m.apply(Point(1, None, None))
+
+    def test_apply_array(self):
+        nan = np.nan
+        coords = np.array([(1, 2, 3), (1, nan, nan)])
+        m = Affine.rotation(0, 0, 90)
+        out = m.apply_array(coords)
+        assert out[0].tolist() == [-2, 1, 3]
+        assert np.isnan(out[1]).tolist() == [True, False, True]
+        assert out[1][1] == 1
+        #
+        m = Affine.rotation(0, 0, 45)
+        with pytest.raises(InvalidAnchorError):
+            m.apply_array(coords)
+
+    def test_compose_inverse(self):
+        m = (Affine.translation(Vector(1, 2, 3)) @
+             Affine.scaling(2, 4, 8) @
+             Affine.rotation(90, 0, 0))
+        p = Point(5, 6, 7)
+        assert m.inverse().apply(m.apply(p)) == p
+
+
+class TestTransform:
+
+    def test_attach(self):
+        parent = Transform()
+        child = Transform()
+        parent.translate(Vector(1, 0, 0))
+        child.attach(parent)
+        assert child.total() == Affine.IDENTITY
+        parent.apply(Affine.rotation(0, 0, 90))
+        assert child.total().apply(Point(1, 0, 0)) == Point(0, 1, 0)
+
+    def test_anchors(self):
+        t = Transform()
+        a = AnchorPoints(t, p=Point(1, 0, 0))
+        t.apply(Affine.rotation(0, 0, 90))
+        assert a.p == Point(0, 1, 0)
+        a.q = Point(5, 5, 5)
+        assert a.q == Point(5, 5, 5)
+        t.translate(Vector(1, 1, 1))
+        assert a.q == Point(6, 6, 6)
+
+    def test_explicit_bbox_anchors(self):
+        t = Transform()
+        a = AnchorPoints(t)
+        a.set_bounding_box(Point(0, 0, 0), Point(10, 20, 30))
+        # e.g. the top of a hole is not the top of the bounding box
+        a.top = Point(None, None, 5)
+        t.apply(Affine.rotation(0, 0, 90))
+        assert a.pmin == Point(-20, 0, 0)
+        assert a.left == Point(-20, None, None)
+        assert a.top == Point(None, None, 5)
+        assert dict(a.items())['top'] == Point(None, None, 5)
+        # copy_from keeps the bounding box derived
+        b = AnchorPoints(Transform())
+        b.copy_from(a)
+        b._transform.apply(Affine.rotation(0, 0, 90))
+        assert b.pmin == Point(-10, -20, 0)
+        assert b.top == Point(None, None, 5)
+
+    def test_singular(self):
+        t = Transform()
+        a = AnchorPoints(t, p=Point(1, 2, 3))
+        t.apply(Affine.scaling(1, 1, 0))
+        assert a.p == Point(1, 2, 0)
+        with pytest.raises(InvalidAnchorError, match='flattened'):
+            a.q = Point(1, 1, 1)
+        child = Transform()
+        child.attach(t)
+        t.translate(Vector(1, 0, 0))
+        with pytest.raises(InvalidAnchorError, match='flattened'):
+            child.total()
@@ -0,0 +1,28 @@
+import sys
+import types
+import subprocess
+import pyscad
+import pyscad.scad
+
+def run(code):
+    res = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         text=True, check=True)
+    return res.stdout.strip()
+
+
+class TestInit:
+
+    def test_all(self):
+        # __all__ is static, check that it's in sync with pyscad.scad
+        names = {name for name, value in vars(pyscad.scad).items()
+                 if not name.startswith('_') and
+                 not isinstance(value, types.ModuleType)}
+        assert sorted(pyscad.__all__) == sorted(names)
+
+    def test_lazy(self):
+        out = run('import sys, pyscad; print("pyscad.scad" in sys.modules)')
+        assert out == 'False'
+
+    def test_star_import(self):
+        out = run('from pyscad import *; print(Cube(2).size.x, set_lod.__name__)')
+        assert out == '2 set_lod'
@@ -0,0 +1,166 @@
+import math
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from solid import scad_render
+from pyscad.lib import involute
+
+SIZE = 800
+
+def rasterize(polygons, scale, holes=()):
+    img = Image.new('1', (SIZE, SIZE))
+    draw = ImageDraw.Draw(img)
+    for poly, fill in [(p, 1) for p in polygons] + [(p, 0) for p in holes]:
+        xy = [(SIZE/2 + x*scale, SIZE/2 - y*scale) for x, y in poly]
+        draw.polygon(xy, fill=fill)
+    return np.array(img)
+
+def circle(r, n=720):
+    return [(r*math.cos(2*math.pi*i/n), r*math.sin(2*math.pi*i/n)) for i in range(n)]
+
+def rotate(poly, angle):
+    c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    return [(x*c - y*s, x*s + y*c) for x, y in poly]
+
+def scad_teeth(teeth, rb, ra, tooth_width, rotation):
+    """
+    The teeth polygons, as computed by spur_gear() and ring_gear() in
+    gears.scad
+    """
+    def ev(rho):
+        r = rb / math.cos(math.radians(rho))
+        return r, math.degrees(math.tan(math.radians(rho))) - rho
+    def polar(r, phi):
+        return r*math.cos(math.radians(phi)), r*math.sin(math.radians(phi))
+    rho_ra = math.degrees(math.acos(rb/ra))
+    rhos = [rho_ra*i/16 for i in range(17)]
+    tooth = ([(0, 0)] +
+             [polar(*ev(rho)) for rho in rhos] +
+             [polar(ev(rho)[0], tooth_width - ev(rho)[1]) for rho in reversed(rhos)])
+    return [rotate(tooth, i*360/teeth + rotation) for i in range(teeth)]
+
+def assert_same(a, b):
+    # less than 0.5% of the pixels are different
+    diff = np.count_nonzero(a != b)
+    assert diff < 0.005 * np.count_nonzero(a)
+
+
+class TestInvolute:
+
+    @pytest.mark.parametrize('teeth, helix_angle', [(10, 0), (24, -10), (70, 30)])
+    def test_spur_profile(self, teeth, helix_angle):
+        module = 1
+        pressure_angle = 28
+        points, twist, rf = involute.spur_profile(module, teeth, pressure_angle,
+                                                  helix_angle)
+        # reference: same formulas as spur_gear()
+        d = module * teeth
+        r = d / 2
+        alpha = math.degrees(math.atan(math.tan(math.radians(pressure_angle)) /
+                                       math.cos(math.radians(helix_angle))))
+        rb = r * math.cos(math.radians(alpha))
+        rho_r = math.degrees(math.acos(rb/r))
+        phi_r = math.degrees(math.tan(math.radians(rho_r))) - rho_r
+        tooth_width = 180*0.95/teeth + 2*phi_r
+        polys = scad_teeth(teeth, rb, r + module, tooth_width,
+                           -phi_r - 90*0.95/teeth)
+        scale = SIZE / (d + 4*module)
+        expected = rasterize(polys + [circle(rf)], scale)
+        assert_same(rasterize([points], scale), expected)
+        assert rf == pytest.approx(r - module*7/6)
+        assert twist*7 == pytest.approx(math.degrees(7/(r*math.tan(math.radians(90-helix_angle)))))
+
+    def test_ring_profile(self):
+        module, teeth, rim_width = 1, 40, 3
+        points, twist, ra = involute.ring_profile(module, teeth, 20, 0)
+        ha = 0.02 * math.degrees(math.atan(teeth/15/math.pi))
+        r = teeth / 2
+        rb = r * math.cos(math.radians(20))
+        rho_r = math.degrees(math.acos(rb/r))
+        phi_r = math.degrees(math.tan(math.radians(rho_r))) - rho_r
+        polys = scad_teeth(teeth, rb, ra, 180*1.05/teeth + 2*phi_r,
+                           -phi_r - 90*1.05/teeth)
+        scale = SIZE / (2*(ra + rim_width) + 2)
+        outer = circle(ra + rim_width)
+        expected = rasterize([outer], scale, holes=polys + [circle(r - module*ha)])
+        assert_same(rasterize([outer], scale, holes=[points]), expected)
+
+    def test_worm_profile(self):
+        module, starts, pressure_angle, lead_angle = 1, 2, 28, 10
+        points, twist = involute.worm_profile(module, starts, pressure_angle, lead_angle)
+        # reference: same formulas as worm()
+        r = module * starts / (2 * math.sin(math.radians(lead_angle)))
+        rf = r - module - module/6
+        a = module * starts / (90 * math.tan(math.radians(pressure_angle)))
+        tau_max = 180 / starts * math.tan(math.radians(pressure_angle))
+        step = tau_max / 16
+        def polar(r, phi):
+            return r*math.cos(math.radians(phi)), r*math.sin(math.radians(phi))
+        taus = np.arange(0, 360/starts + tau_max + step, step)
+        polys = []
+        for i in range(starts):
+            offset = i*360/starts + tau_max
+            poly = [(0, 0)]
+            poly += [polar(a*t + rf, t + offset) for t in taus if t <= tau_max]
+            poly += [polar(a*tau_max + rf, t + offset) for t in taus
+                     if tau_max <= t <= 180/starts]
+            poly += [polar(a*(180/starts + tau_max - t) + rf, t + offset)
+                     for t in np.arange(180/starts, 180/starts + tau_max + step/2, step)]
+            polys.append(poly)
+        scale = SIZE / (2*r + 4)
+        assert_same(rasterize([points], scale), rasterize(polys + [circle(rf)], scale))
+        assert twist * 15 == pytest.approx(-math.degrees(15 / (r * math.tan(math.radians(lead_angle)))))
+
+    def test_cached(self):
+        a = involute.spur_profile(1, 24, 28, -10)
+        b = involute.spur_profile(1, 24, 28, -10)
+        assert a is b
+
+    def test_spur_gear(self):
+        gear = involute.spur_gear(1, 24, 2, 3.2, 28, -10, True)
+        code = scad_render(gear.solid)
+        assert 'linear_extrude' in code
+        assert code.count('polygon') == 1
+        assert 'gears.scad' not in code
+        # the bore
+        assert 'circle(r = 1.6' in code
+        #
+        gear = involute.spur_gear(1, 24, 2, 3.2, 28, -10, False)
+        assert scad_render(gear.solid).count('circle') == 2
+
+    def test_worm(self):
+        worm = involute.worm(1, 2, 15, 0, 28, 10)
+        code = scad_render(worm.solid)
+        assert code.count('polygon') == 1
+        assert 'paths' not in code
+        worm = involute.worm(1, 2, 15, 4, 28, 10)
+        assert 'paths' in scad_render(worm.solid)
+        # the two halves, ready to print
+        halves = scad_render(involute.worm(1, 2, 15, 4, 28, 10, False).solid)
+        assert halves.count('linear_extrude') == 2
+        assert halves.startswith('\n\ndifference')
+        assert 'cube(center = true' in halves
+
+    def test_engine(self):
+        from pyscad.lib.gears import WormFactory, HerringboneRingGear
+        scad = WormFactory.spur(teeth=24, h=2, bore_d=3.2, axis='x')
+        native = WormFactory.spur(teeth=24, h=2, bore_d=3.2, axis='x', engine='native')
+        assert native.pmin == scad.pmin
+        assert native.pmax == scad.pmax
+        assert 'gears.scad' in scad_render(scad.solid)
+        assert 'gears.scad' not in scad_render(native.solid)
+        worm = WormFactory.worm(h=15, bore_d=0, engine='native')
+        assert 'gears.scad' not in scad_render(worm.solid)
+        ring = HerringboneRingGear(module=1, teeth=40, h=5, rim_width=3, pressure_angle=20,
+                                   helix_angle=30, engine='native')
+        assert 'gears.scad' not in scad_render(ring.solid)
+        with pytest.raises(ValueError):
+            WormFactory.spur(teeth=24, h=2, engine='foo')
+
+    def test_engine_default(self, monkeypatch):
+        from pyscad.lib import gears
+        scad = gears.WormFactory.spur(teeth=24, h=2, bore_d=3.2)
+        assert 'gears.scad' in scad_render(scad.solid)
+        monkeypatch.setattr(gears, 'ENGINE', 'native')
+        native = gears.WormFactory.spur(teeth=24, h=2, bore_d=3.2)
+        assert 'gears.scad' not in scad_render(native.solid)
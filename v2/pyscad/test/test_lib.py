@@ -1,4 +1,7 @@
-from pyscad import Cube, Cylinder, ImportScad, bolt_hole, Union, Point, CustomObject, EPS
+import pytest
+from solid import scad_render
+from pyscad import (Cube, Cylinder, ImportScad, bolt_hole, Union, Point, CustomObject, EPS,
+                    PySCADObject)
 from pyscad.lib.bearing import Bearing
 from pyscad.lib.misc import TeflonGlide, RoundHole
 from pyscad.lib.photo import Manfrotto_200PL
@@ -64,3 +67,28 @@ class TestStepper_48BYJ48(OpenSCADTest):
         obj.stepper = Stepper_28BYJ48().tr(x=-20, y=20)
         obj.holes = obj.stepper.make_mounting_holes(h=50).tr(x=20).mod()
         self.check(obj, distance=250)
+
+
+class TestLOD:
+
+    @pytest.mark.parametrize('make', [
+        lambda: Bearing('608', axis='x'),
+        lambda: TeflonGlide(),
+        lambda: Manfrotto_200PL(with_holes=True),
+        lambda: Stepper_28BYJ48(),
+    ])
+    def test_draft(self, monkeypatch, make):
+        obj = make()
+        monkeypatch.setattr(PySCADObject, 'lod', 'draft')
+        proxy = make()
+        # same anchors, but cheaper
+        assert proxy.pmin == obj.pmin
+        assert proxy.pmax == obj.pmax
+        assert proxy.center == obj.center
+        assert 'use <' not in scad_render(proxy.solid)
+
+    def test_RoundHole(self, monkeypatch):
+        assert len(RoundHole(d=10, h=3, extra_walls=3).children) == 4
+        monkeypatch.setattr(PySCADObject, 'lod', 'preview')
+        obj = RoundHole(d=10, h=3, extra_walls=3)
+        assert obj.children == [obj.hole]
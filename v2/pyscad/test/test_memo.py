@@ -0,0 +1,80 @@
+import pytest
+from solid import scad_render
+from pyscad.scad import Cube, Cylinder, CustomObject, PySCADObject
+from pyscad.geometry import Point
+from pyscad.memo import Memoized
+from pyscad import memo
+
+class Part(CustomObject, metaclass=Memoized):
+    count = 0
+
+    def init_custom(self, size, *, axis='z'):
+        Part.count += 1
+        self.size = size
+        self.body = Cylinder(d=size, h=size, axis=axis)
+        self.head = Cube(size).move_to(bottom=self.body.top)
+        self.anchors.copy_from(self.body.anchors)
+
+
+class TestMemoized:
+
+    def setup_method(self, meth):
+        memo.clear()
+        Part.count = 0
+
+    def test_same_args(self):
+        a = Part(10)
+        b = Part(10)
+        c = Part(10, axis='x')
+        d = Part(10.0)
+        assert Part.count == 3
+        assert a is not b
+        assert a.solid is not b.solid
+        # the subtrees of the parts are shared
+        assert a.body.solid.children == b.body.solid.children
+        assert a.head.solid.children == b.head.solid.children
+        assert c.body.axis == 'x'
+        assert d.size == 10.0 and type(d.size) is float
+
+    def test_unhashable_args(self):
+        class Box(CustomObject, metaclass=Memoized):
+            def init_custom(self, size):
+                Part.count += 1
+                self.box = Cube(*size)
+        Box([1, 2, 3])
+        Box([1, 2, 3])
+        assert Part.count == 2
+
+    def test_transform_clone(self):
+        a = Part(10).translate(x=100)
+        b = Part(10)
+        assert a.center == Point(100, 0, 0)
+        assert a.head.bottom == Point(None, None, 5)
+        assert a.head.center == Point(100, 0, 10)
+        assert b.center == Point.O
+        assert b.head.center == Point(0, 0, 10)
+        b.head.translate(z=1)
+        assert Part(10).head.center == Point(0, 0, 10)
+
+    def test_mod_part(self):
+        a = Part(10)
+        a.head.mod('#')
+        b = Part(10)
+        b.body.hide()
+        assert '#' in scad_render(a.solid) and '*' not in scad_render(a.solid)
+        assert '*' in scad_render(b.solid) and '#' not in scad_render(b.solid)
+        assert '#' not in scad_render(Part(10).solid)
+        assert '*' not in scad_render(Part(10).solid)
+
+    def test_mod(self):
+        a = Part(10).mod('%')
+        b = Part(10)
+        assert a.solid.modifier == '%'
+        assert b.solid.modifier == ''
+
+    def test_lod(self, monkeypatch):
+        Part(10)
+        monkeypatch.setattr(PySCADObject, 'lod', 'draft')
+        Part(10)
+        Part(10)
+        assert Part.count == 2
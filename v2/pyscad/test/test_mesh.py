@@ -0,0 +1,114 @@
+import os
+import struct
+import textwrap
+import pytest
+from pyscad import mesh
+from pyscad.mesh import MeshInfo, read_off, read_stl
+from pyscad.openscad import export_cache
+from pyscad.geometry import Point, InvalidAnchorError
+from pyscad.scad import Cube, PySCADObject
+
+CUBE_OFF = """\
+OFF
+8 6 0
+0 0 0
+2 0 0
+2 3 0
+0 3 0
+0 0 4
+2 0 4
+2 3 4
+0 3 4
+4 0 3 2 1
+4 4 5 6 7
+4 0 1 5 4
+4 1 2 6 5
+4 2 3 7 6
+4 3 0 4 7
+"""
+
+class TestMesh:
+
+    def test_read_off(self, tmpdir):
+        off = tmpdir.join('cube.off')
+        off.write(CUBE_OFF)
+        tris = read_off(off)
+        assert tris.shape == (12, 3, 3)
+        info = MeshInfo.from_triangles(tris)
+        assert info.pmin == Point(0, 0, 0)
+        assert info.pmax == Point(2, 3, 4)
+        assert info.volume == pytest.approx(24)
+        assert info.area == pytest.approx(2*(6 + 8 + 12))
+
+    def test_read_off_colors(self, tmpdir):
+        # counts on the first line, comments and per-face colors
+        lines = CUBE_OFF.splitlines()
+        colored = ['OFF ' + lines[1], '# a comment'] + lines[2:10]
+        colored += [f'{face} 249 215 44 255' for face in lines[10:]]
+        off = tmpdir.join('cube.off')
+        off.write('\n'.join(colored) + '\n')
+        tris = read_off(off)
+        assert tris.shape == (12, 3, 3)
+        assert MeshInfo.from_triangles(tris).volume == pytest.approx(24)
+
+    def test_read_stl_ascii(self, tmpdir):
+        stl = tmpdir.join('tri.stl')
+        stl.write(textwrap.dedent("""\
+            solid x
+              facet normal 0 0 1
+                outer loop
+                  vertex 0 0 0
+                  vertex 1 0 0
+                  vertex 0 1 0
+                endloop
+              endfacet
+            endsolid x
+        """))
+        tris = read_stl(stl)
+        assert tris.tolist() == [[[0, 0, 0], [1, 0, 0], [0, 1, 0]]]
+
+    def test_read_stl_binary(self, tmpdir):
+        stl = tmpdir.join('tri.stl')
+        data = b'\0' * 80 + struct.pack('<I', 1)
+        data += struct.pack('<12fH', 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0)
+        stl.write_binary(data)
+        tris = read_stl(stl)
+        assert tris.tolist() == [[[0, 0, 0], [1, 0, 0], [0, 1, 0]]]
+
+    def test_measure(self, tmpdir, monkeypatch):
+        # fake openscad which always exports the same cube
+        script = tmpdir.join('bin', 'openscad')
+        script.write(textwrap.dedent(f"""\
+            #!/bin/sh
+            echo "$@" >> {tmpdir}/calls
+            while [ "$1" != "-o" ]; do shift; done
+            cat > "$2" <<EOF
+            {textwrap.indent(CUBE_OFF, ' '*12).strip()}
+            EOF
+        """), ensure=True)
+        script.chmod(0o755)
+        monkeypatch.setenv('PATH', f'{script.dirname}:{os.environ["PATH"]}')
+        monkeypatch.setattr(export_cache, 'enabled', False)
+        monkeypatch.setattr(mesh, '_cache', {})
+        #
+        obj = Cube(10).rotate(z=30)
+        with pytest.raises(InvalidAnchorError):
+            obj.pmin
+        obj.fit_bounding_box()
+        assert obj.pmax == Point(2, 3, 4)
+        assert obj.measure().volume == pytest.approx(24)
+        # an identical object hits the cache
+        assert Cube(10).rotate(z=30).measure().area == pytest.approx(52)
+        assert len(tmpdir.join('calls').readlines()) == 1
+        # the anchors follow the object
+        obj.translate(x=10)
+        assert obj.pmax == Point(12, 3, 4)
+        # a different level of detail renders again
+        monkeypatch.setattr(PySCADObject, 'lod', 'draft')
+        Cube(10).rotate(z=30).measure()
+        assert len(tmpdir.join('calls').readlines()) == 2
+        # the cache is bounded
+        monkeypatch.setattr(mesh, 'CACHE_SIZE', 2)
+        Cube(11).measure()
+        assert len(mesh._cache) == 2
+
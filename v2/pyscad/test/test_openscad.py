@@ -0,0 +1,106 @@
+import os
+import asyncio
+import time
+import textwrap
+import pytest
+from pyscad import openscad
+from pyscad.openscad import Pool, OpenSCADError
+
+@pytest.fixture
+def fake_openscad(tmpdir, monkeypatch):
+    """
+    Put on the PATH a fake openscad which behaves according to the name of
+    the input file: "fail*" exits with an error, "slow*" and "wait*" sleep.
+    """
+    script = tmpdir.join('bin', 'openscad')
+    script.write(textwrap.dedent("""\
+        #!/bin/sh
+        case "$(basename "$1")" in
+            fail*) echo "ERROR: parser error" >&2; exit 1;;
+            slow*) exec sleep 5;;
+            wait*) sleep 0.3;;
+        esac
+        echo "$@" >> "$(dirname "$0")/calls"
+        echo "done" >&2
+    """), ensure=True)
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{script.dirname}:{os.environ["PATH"]}')
+    return script
+
+class TestPool:
+
+    def test_run(self, fake_openscad):
+        assert openscad.run(['a.scad', '-o', 'a.png']) == 'done\n'
+
+    def test_error(self, fake_openscad):
+        with pytest.raises(OpenSCADError) as exc:
+            openscad.run(['fail.scad'])
+        assert exc.value.returncode == 1
+        assert 'parser error' in exc.value.stderr
+        assert 'parser error' in str(exc.value)
+
+    def test_timeout(self, fake_openscad):
+        pool = Pool(max_workers=2, timeout=0.2)
+        a = pool.submit(['slow.scad'])
+        b = pool.submit(['a.scad'])
+        # the failure of a job does not affect the others
+        assert b.result() == 'done\n'
+        with pytest.raises(OpenSCADError) as exc:
+            a.result()
+        assert exc.value.returncode is None
+        pool.shutdown()
+
+    def test_share_running_jobs(self, fake_openscad):
+        pool = Pool(max_workers=2)
+        a = pool.submit(['wait.scad'])
+        b = pool.submit(['wait.scad'])
+        assert a is b
+        a.result()
+        pool.shutdown()
+        calls = fake_openscad.dirpath('calls').readlines()
+        assert calls == ['wait.scad\n']
+
+    def test_rewritten_while_running(self, fake_openscad, tmpdir):
+        scad = tmpdir.join('wait.scad')
+        scad.write('cube(1);')
+        pool = Pool(max_workers=2)
+        a = pool.submit([scad])
+        scad.write('cube(2);')
+        b = pool.submit([scad])
+        c = pool.submit([scad])
+        # b must not get the result of the stale render
+        assert a is not b
+        assert b is c
+        b.result()
+        assert a.done()
+        pool.shutdown()
+        calls = fake_openscad.dirpath('calls').readlines()
+        assert calls == [f'{scad}\n'] * 2
+
+
+class TestAsync:
+
+    def test_run_async(self, fake_openscad):
+        async def main():
+            return await asyncio.gather(openscad.run_async(['a.scad']),
+                                        openscad.run_async(['fail.scad']),
+                                        return_exceptions=True)
+        ok, err = asyncio.run(main())
+        assert ok == 'done\n'
+        assert isinstance(err, OpenSCADError)
+        assert 'parser error' in err.stderr
+
+    def test_timeout(self, fake_openscad):
+        with pytest.raises(OpenSCADError):
+            asyncio.run(openscad.run_async(['slow.scad'], timeout=0.2))
+
+    def test_concurrency(self, fake_openscad, monkeypatch):
+        monkeypatch.setattr(openscad, 'CONCURRENCY', openscad.CONCURRENCY)
+        openscad.set_concurrency(2)
+        async def main():
+            a = time.time()
+            await asyncio.gather(*[openscad.run_async([f'wait{i}.scad'])
+                                   for i in range(4)])
+            return time.time() - a
+        # 4 jobs of 0.3s each, 2 at a time
+        assert asyncio.run(main()) >= 0.6
@@ -0,0 +1,87 @@
+import pytest
+from PIL import Image
+from pyscad.scad import Cube, Cylinder, Sphere, Union, Text
+from pyscad.camera import Camera
+from pyscad.preview import (render_preview, tessellate_cube, tessellate_cylinder,
+                            tessellate_sphere, get_fragments, UnsupportedSolid,
+                            BACKGROUND)
+
+TOP = Camera.TOP.with_distance(100)
+FRONT = Camera.FRONT.with_distance(100)
+
+def is_red(pixel):
+    r, g, b = pixel
+    return r > 150 and g < 50 and b < 50
+
+class TestTessellation:
+
+    def test_cube(self):
+        tris = tessellate_cube([1, 2, 3], center=True)
+        assert tris.shape == (12, 3, 3)
+        assert tris.reshape(-1, 3).min(axis=0).tolist() == [-0.5, -1, -1.5]
+        assert tris.reshape(-1, 3).max(axis=0).tolist() == [0.5, 1, 1.5]
+
+    def test_cylinder(self):
+        tris = tessellate_cylinder(10, 2, 1, center=False, n=8)
+        # 6+6 for the caps, 16 for the side
+        assert tris.shape == (28, 3, 3)
+        assert tris[..., 2].min() == 0
+        assert tris[..., 2].max() == 10
+
+    def test_sphere(self):
+        tris = tessellate_sphere(5, 10)
+        assert abs(tris).max() <= 5
+
+    def test_fragments(self):
+        assert get_fragments(10, 8, 2, 12) == 8
+        assert get_fragments(10, None, 2, 12) == 30     # limited by $fa
+        assert get_fragments(1, None, 2, 12) == 5       # limited by $fs
+
+
+class TestRender:
+
+    def test_top(self):
+        obj = Cube(10).color('red').translate(x=8)
+        img = render_preview(obj.solid, TOP, size=(100, 100))
+        assert img.size == (100, 100)
+        assert img.getpixel((50, 50)) == BACKGROUND
+        # +x is on the right
+        assert is_red(img.getpixel((70, 50)))
+        assert not is_red(img.getpixel((30, 50)))
+
+    def test_front(self):
+        obj = Cube(10).color('red').translate(z=8)
+        img = render_preview(obj.solid, FRONT, size=(100, 100))
+        # +z is up
+        assert is_red(img.getpixel((50, 30)))
+        assert not is_red(img.getpixel((50, 70)))
+
+    def test_zbuffer(self):
+        # looking from the top, the higher cube hides the lower one
+        a = Cube(10).color('red').translate(z=10)
+        b = Cube(20).color('blue')
+        img = render_preview(Union(a, b).solid, TOP, size=(100, 100))
+        assert is_red(img.getpixel((50, 50)))
+
+    def test_difference_ghost(self):
+        a = Cube(20).color('blue')
+        b = Cube(5).translate(z=20)
+        img = render_preview((a - b).solid, TOP, size=(100, 100))
+        # the subtracted cube is shown as a transparent green ghost
+        r, g, b = img.getpixel((50, 50))
+        assert r < g < b
+        r, g, b = img.getpixel((70, 70))
+        assert r == g == 0
+
+    def test_unsupported(self):
+        obj = Text('hello', h=2)
+        with pytest.raises(UnsupportedSolid):
+            render_preview(obj.solid)
+
+    def test_render_to_collage(self, tmpdir):
+        obj = Union(Cube(10), Cylinder(d=5, h=20), Sphere(d=12).translate(z=10))
+        out = tmpdir.join('collage.png')
+        obj.render_to_collage(out, engine='preview')
+        assert Image.open(out).size == (1026, 1026)
+        with pytest.raises(UnsupportedSolid):
+            Text('hello', h=2).render_to_collage(out, engine='preview')
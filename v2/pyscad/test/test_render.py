@@ -3,7 +3,8 @@ import py
 import pytest
 from pytest_image_diff import image_diff
 from pyscad.scad import (Point, Cube, Cylinder, Sphere, Union, Difference, TCone,
-                         CustomObject, EPS)
+                         CustomObject, EPS, PySCADObject, LOD_CHORD_ERROR)
+from pyscad import memo
 from pyscad.autorender import run_openscad_maybe
 
 ROOT = py.path.local(__file__).dirpath()
@@ -12,9 +13,18 @@ REFDIR = ROOT.join('screenshots').ensure(dir=True)
 class OpenSCADTest:
 
     @pytest.fixture(autouse=True)
-    def init(self, request, tmpdir):
+    def init(self, request, tmpdir, monkeypatch):
         self.request = request
         self.tmpdir = tmpdir
+        # the reference images are rendered at the final level of detail, with
+        # the circles made by $fa/$fs instead of segments_for(): they check
+        # the shape and the placement of the objects, not the faceting. The
+        # memoized parts must be built again with the same settings
+        monkeypatch.setattr(PySCADObject, 'lod', 'final')
+        monkeypatch.setitem(LOD_CHORD_ERROR, 'final', None)
+        memo.clear()
+        yield
+        memo.clear()
 
     def check(self, obj, distance=None, *, THRESHOLD=1e-4):
         name = f'{self.__class__.__name__}.{self.request.node.name}'
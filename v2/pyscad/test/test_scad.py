@@ -1,7 +1,12 @@
+import os
+import math
 import pytest
 import re
 import solid
-from pyscad.scad import Cube, Cylinder, Sphere, CustomObject, Union, Difference
+from solid import scad_render
+from pyscad.scad import (Cube, Cylinder, Sphere, CustomObject, Union, Difference,
+                         Text, PySCADObject, set_lod, TCone, segments_for,
+                         LOD_CHORD_ERROR, MIN_SEGMENTS, MAX_SEGMENTS)
 from pyscad.geometry import Point, Vector
 from pyscad.util import InvalidAnchorError
 
@@ -86,6 +91,91 @@ class TestAnchors:
         assert puppet.body.center == Point(20, 20, 20)
         assert puppet.head.center == Point(20, 20, 27.5)
 
+    def test_translate_after_attach(self):
+        parent = Union()
+        parent.translate(x=10)
+        child = Cube(2)
+        parent += child
+        # the child is not moved by translations which happened before it
+        # was attached
+        assert child.center == Point.O
+        parent.translate(x=5)
+        assert child.center == Point(5, 0, 0)
+
+    def test_translate_nested(self):
+        leaf = Cube(2)
+        mid = Union()
+        mid += leaf
+        root = Union()
+        root.translate(z=100)
+        root += mid
+        mid.translate(y=10)
+        root.translate(x=1)
+        assert leaf.center == Point(1, 10, 0)
+        assert mid.translate(1, 1, 1) is mid
+        assert leaf.center == Point(2, 11, 1)
+
+    def test_set_anchor_after_translate(self):
+        c = Cube(2)
+        c.translate(10, 0, 0)
+        c.anchors.p = Point(1, 2, 3)
+        assert c.p == Point(1, 2, 3)
+        c.translate(10, 0, 0)
+        assert c.p == Point(11, 2, 3)
+        assert c.left == Point(19, None, None)
+
+    def test_rotate_90(self):
+        c = Cube(2, 4, 6)
+        c.rotate(z=90)
+        assert c.pmin == Point(-2, -1, -3)
+        assert c.pmax == Point(2, 1, 3)
+        assert c.left == Point(-2, None, None)
+        c.translate(x=10)
+        assert c.center == Point(10, 0, 0)
+        c.rotate(x=-90)
+        assert c.center == Point(10, 0, 0)
+        assert c.pmin == Point(8, -3, -1)
+        assert c.pmax == Point(12, 3, 1)
+
+    def test_rotate_children(self):
+        class Puppet(CustomObject):
+            def init_custom(self):
+                self.body = Cube(10, 10, 10)
+                self.head = Sphere(d=5).move_to(bottom=self.body.top)
+
+        puppet = Puppet()
+        puppet.rotate(y=90)
+        assert puppet.body.center == Point.O
+        assert puppet.head.center == Point(7.5, 0, 0)
+        assert puppet.head.left == Point(5, None, None)
+
+    def test_rotate_arbitrary(self):
+        c = Cube(2)
+        c.rotate(z=45)
+        with pytest.raises(InvalidAnchorError):
+            c.center
+
+    def test_scale(self):
+        c = Cube(2, 4, 6).translate(z=3)
+        c.scale(2, 0.5, -1)
+        assert c.pmin == Point(-2, -1, -6)
+        assert c.pmax == Point(2, 1, 0)
+        assert c.top == Point(None, None, 0)
+
+    def test_resize(self):
+        c = Cube(2, 4, 6)
+        c.resize(4, 0, 3)
+        assert c.pmin == Point(-2, -2, -1.5)
+        assert c.pmax == Point(2, 2, 1.5)
+
+    def test_Cylinder_axis(self):
+        c = Cylinder(h=10, d=30, axis='x')
+        assert c.pmin == Point(-5, -15, -15)
+        assert c.pmax == Point(5, 15, 15)
+        c = Cylinder(h=10, d=30, axis='y')
+        assert c.pmin == Point(-15, -5, -15)
+        assert c.pmax == Point(15, 5, 15)
+
 
 class TestScad:
 
@@ -98,6 +188,20 @@ class TestScad:
         obj = MyObject()
         assert obj.children == obj.parts
 
+    def test_CustomObject_parts(self):
+        class MyObject(CustomObject):
+            def init_custom(self):
+                self.a = Cube(10)
+                self.b = Cube(20)
+                self._private = Cube(30)
+                self.size = 42
+                self.feet = [Cube(1), 'not a part', Cube(2)]
+                self.children.append(Cube(3))
+        #
+        obj = MyObject()
+        assert obj.parts() == {'a': obj.a, 'b': obj.b,
+                               'feet_0': obj.feet[0], 'feet_2': obj.feet[2]}
+
     def test_Cylinder(self):
         c = Cylinder(h=10, d=30)
         assert c.h == 10
@@ -172,3 +276,153 @@ class TestScad:
         assert isinstance(a.solid, solid.difference)
         assert a.solid.children == [a_solid, b.solid]
 
+
+    def test_render_to_file_unchanged(self, tmpdir):
+        scad = tmpdir.join('a.scad')
+        Cube(10).render_to_file(scad)
+        # pretend that the file is old, to detect rewrites
+        os.utime(scad, ns=(0, 0))
+        Cube(10).render_to_file(scad)
+        assert scad.mtime() == 0
+        Cube(20).render_to_file(scad)
+        assert scad.mtime() != 0
+        assert 'size = [20, 20, 20]' in scad.read()
+        # no temp files left around
+        assert tmpdir.listdir() == [scad]
+
+
+class TestClone:
+
+    def test_clone(self):
+        a = Cylinder(d=10, h=20, axis='x').color('red')
+        b = a.clone()
+        assert type(b) is Cylinder
+        assert b.axis == 'x'
+        assert b.solid is not a.solid
+        assert b.solid.children == a.solid.children
+        assert scad_render(b.solid) == scad_render(a.solid)
+        b.translate(x=10)
+        assert a.center == Point.O
+        assert b.center == Point(10, 0, 0)
+        assert a.left == Point(-10, None, None)
+        assert b.left == Point(0, None, None)
+        assert a.copy().center == Point.O
+
+    def test_clone_anchors(self):
+        a = Cube(2)
+        b = a.clone()
+        a.anchors.p = Point(1, 1, 1)
+        b.anchors.q = Point(2, 2, 2)
+        assert a.anchors.has_point('p') and not a.anchors.has_point('q')
+        assert b.anchors.has_point('q') and not b.anchors.has_point('p')
+
+    def test_clone_parts(self):
+        puppet = CustomObject()
+        puppet.body = Cube(10)
+        puppet.head = Cube(5).move_to(bottom=puppet.body.top)
+        puppet.arms = [Cube(1).move_to(right=puppet.body.left),
+                       Cube(1).move_to(left=puppet.body.right)]
+        puppet.translate(z=10)
+        other = puppet.clone()
+        other.translate(x=100)
+        assert other.children == [other.body, other.head] + other.arms
+        assert other.head is not puppet.head
+        assert other.head.center == Point(100, 0, 17.5)
+        assert other.arms[0].center == Point(94.5, 0, 10)
+        assert puppet.head.center == Point(0, 0, 17.5)
+        assert puppet.arms[0].center == Point(-5.5, 0, 10)
+        # the subtrees of the parts are shared, but mod() is independent
+        assert other.head.solid is not puppet.head.solid
+        assert other.head.solid.children == puppet.head.solid.children
+        other.head.mod('%')
+        puppet.body.mod('#')
+        puppet.arms[0].hide()
+        assert puppet.head.solid.modifier == ''
+        assert other.body.solid.modifier == ''
+        assert other.arms[0].solid.modifier == ''
+        other_code = scad_render(other.solid)
+        puppet_code = scad_render(puppet.solid)
+        assert other_code.count('%') == 1 and '#' not in other_code
+        assert '%' not in puppet_code
+        assert puppet_code.count('#') == 1 and puppet_code.count('*') == 1
+
+    def test_clone_mod(self):
+        a = Cube(2)
+        parent = Union()
+        parent += a
+        b = a.clone().mod('%')
+        assert a.solid.modifier == ''
+        assert b.solid.modifier == '%'
+        # a is still the owner of its solid, and the parent sees the modifier
+        a.mod('#')
+        assert parent.solid.children[0].modifier == '#'
+
+    def test_clone_detached(self):
+        a = Cube(2)
+        parent = Union()
+        parent += a
+        parent.translate(x=10)
+        assert a.center == Point(10, 0, 0)
+        # the clone does not include the translation of the parent
+        assert a.clone().center == Point.O
+
+
+class TestLOD:
+
+    @pytest.fixture(autouse=True)
+    def restore_lod(self, monkeypatch):
+        monkeypatch.setattr(PySCADObject, 'lod', 'final')
+
+    def test_set_lod(self):
+        set_lod('draft')
+        assert Cube(1).lod == 'draft'
+        with pytest.raises(ValueError):
+            set_lod('potato')
+        assert PySCADObject.lod == 'draft'
+
+    def test_render_to_file(self, tmpdir):
+        scad = tmpdir.join('a.scad')
+        Cube(10).render_to_file(scad)
+        assert scad.read().startswith('$fa = 1;\n$fs = 0.4;\n')
+        set_lod('draft')
+        Cube(10).render_to_file(scad)
+        assert scad.read().startswith('$fn = 12;\n$fa = 12;\n$fs = 2;\n')
+        # explicit values win
+        Cube(10).render_to_file(scad, fn=0, fa=3)
+        assert scad.read().startswith('$fa = 3;\n$fs = 2;\n')
+
+    def test_Text(self):
+        assert '$fn' in scad_render(Text('hello', h=1, segments=100).solid)
+        set_lod('preview')
+        assert '$fn' not in scad_render(Text('hello', h=1, segments=100).solid)
+
+
+class TestSegments:
+
+    @pytest.fixture(autouse=True)
+    def restore_lod(self, monkeypatch):
+        monkeypatch.setattr(PySCADObject, 'lod', 'final')
+
+    def test_segments_for(self):
+        # the chord error is at most 0.02mm
+        for r in (1.5, 3, 10, 50):
+            n = segments_for(r)
+            assert n % 4 == 0
+            assert r * (1 - math.cos(math.pi / n)) <= 0.02
+        assert segments_for(1.5) < segments_for(10) < segments_for(50)
+        assert segments_for(0.001) == MIN_SEGMENTS
+        assert segments_for(1e6) == MAX_SEGMENTS
+        assert segments_for(10, 'draft') < segments_for(10, 'preview') < segments_for(10)
+
+    def test_primitives(self, monkeypatch):
+        from pyscad.shapes import DonutSlice
+        n = segments_for(5)
+        assert f'$fn = {n}' in scad_render(Cylinder(r=5, h=1).solid)
+        assert f'$fn = {n}' in scad_render(TCone(r1=5, r2=2, h=1).solid)
+        assert f'$fn = {n}' in scad_render(Sphere(r=5).solid)
+        assert f'$fn = {n}' in scad_render(DonutSlice(r1=2, r2=5, h=1).solid)
+        # explicit segments generate a polygon
+        assert '$fn = 6' in scad_render(Cylinder(r=5, h=1, segments=6).solid)
+        # no chord error: $fn/$fa/$fs are used
+        monkeypatch.setitem(LOD_CHORD_ERROR, 'final', None)
+        assert '$fn' not in scad_render(Cylinder(r=5, h=1).solid)
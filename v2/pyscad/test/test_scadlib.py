@@ -0,0 +1,98 @@
+import os
+import pytest
+from pathlib import Path
+import solid
+from solid import scad_render
+from pyscad import scadlib
+from pyscad.scadlib import SignatureCache
+
+LIB = """
+use <other.scad>
+module box(size, center=false) { cube(size, center=center); }
+function double(x) = 2*x;
+"""
+
+@pytest.fixture
+def cache(tmpdir, monkeypatch):
+    cache = SignatureCache(tmpdir.join('cache', 'scadlib.json'))
+    cache.enabled = True
+    monkeypatch.setattr(scadlib, 'signature_cache', cache)
+    parsed = []
+    orig = scadlib.parse_scad_callables
+    def parse_scad_callables(text):
+        parsed.append(text)
+        return orig(text)
+    monkeypatch.setattr(scadlib, 'parse_scad_callables', parse_scad_callables)
+    cache.parsed = parsed
+    return cache
+
+def new_cache(cache):
+    # simulate a new process
+    new = SignatureCache(cache.filename)
+    new.enabled = True
+    scadlib.signature_cache = new
+    return new
+
+
+class TestImportScad:
+
+    def test_same_as_solid(self, tmpdir, cache):
+        lib = tmpdir.join('lib.scad')
+        lib.write(LIB)
+        tmpdir.join('other.scad').write('')
+        a = solid.import_scad(str(lib))
+        b = scadlib.import_scad(str(lib))
+        for args, kwargs in [((10,), {}), ((), {'size': 3, 'center': True})]:
+            assert scad_render(a.box(*args, **kwargs)) == scad_render(b.box(*args, **kwargs))
+        assert scad_render(b.double(3)) == scad_render(a.double(3))
+        with pytest.raises(TypeError):
+            b.box(1, 2, 3)
+        with pytest.raises(TypeError):
+            b.box(1, size=2)
+        assert Path(tmpdir.join('other.scad')) in scadlib.loaded_files
+
+    def test_cache(self, tmpdir, cache):
+        lib = tmpdir.join('lib.scad')
+        lib.write(LIB)
+        scadlib.import_scad(str(lib))
+        assert len(cache.parsed) == 1
+        assert cache.filename.exists()
+        #
+        cache = new_cache(cache)
+        cache.parsed = []
+        ns = scadlib.import_scad(str(lib))
+        assert cache.parsed == []
+        assert hasattr(ns, 'box')
+        assert not cache.dirty
+
+    def test_touch_and_modify(self, tmpdir, cache):
+        lib = tmpdir.join('lib.scad')
+        lib.write(LIB)
+        scadlib.import_scad(str(lib))
+        # same content, different mtime: the hash is checked
+        os.utime(lib, ns=(0, 0))
+        scadlib.import_scad(str(lib))
+        assert len(cache.parsed) == 1
+        lib.write(LIB + 'module ball(r) { sphere(r); }\n')
+        ns = scadlib.import_scad(str(lib))
+        assert len(cache.parsed) == 2
+        assert hasattr(ns, 'ball')
+
+    def test_dependencies(self, tmpdir, cache):
+        lib = tmpdir.join('lib.scad')
+        lib.write(LIB)
+        other = tmpdir.join('other.scad')
+        other.write('')
+        scadlib.import_scad(str(lib))
+        entry = cache.entries[str(lib)]
+        assert list(entry['deps']) == [str(other)]
+        # other.scad starts to use a third file
+        tmpdir.join('third.scad').write('')
+        other.write('include <third.scad>\n')
+        scadlib.import_scad(str(lib))
+        assert sorted(entry['deps']) == [str(other), str(tmpdir.join('third.scad'))]
+        assert len(cache.parsed) == 1
+
+    def test_not_found(self, cache):
+        with pytest.raises(ValueError):
+            scadlib.import_scad('/does/not/exist.scad')
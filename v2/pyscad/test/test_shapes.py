@@ -1,6 +1,12 @@
-from pyscad import Union, Cylinder
-from pyscad.shapes import DonutSlice
+from solid import scad_render
+from pyscad import Union, Cylinder, Cube
+from pyscad.geometry import Point
+from pyscad.camera import Camera
+from pyscad.preview import render_preview
+from pyscad.dedup import scad_render_dedup
+from pyscad.shapes import DonutSlice, LinearArray, PolarArray, GridArray
 from .test_render import OpenSCADTest
+from .test_preview import is_red
 
 
 class TestShapes(OpenSCADTest):
@@ -14,3 +20,59 @@ class TestShapes(OpenSCADTest):
         obj += donut_x.tr(x=15)
         obj += donut_y.tr(x=-25)
         self.check(obj, distance=200)
+
+
+class TestArrays:
+
+    def test_LinearArray(self):
+        arr = LinearArray(Cube(2), 100, x=10)
+        code = scad_render(arr.solid)
+        assert code.count('cube(') == 1
+        assert 'for (i = [0:99]) translate(i * [10, 0, 0])' in code
+        assert arr.pmin == Point(-1, -1, -1)
+        assert arr.pmax == Point(991, 1, 1)
+        assert arr.item42 == Point(420, 0, 0)
+        arr.translate(z=5)
+        assert arr.item42 == Point(420, 0, 5)
+        assert arr.instance(42).top == Point(None, None, 6)
+
+    def test_PolarArray(self):
+        cyl = Cylinder(d=2, h=10).tr(x=20)
+        arr = PolarArray(cyl, 4, start=90)
+        code = scad_render(arr.solid)
+        assert 'for (i = [0:3]) rotate(a = 90 + i * 90.0000000000, v = [0, 0, 1])' in code
+        assert arr.item0 == Point(0, 20, 0)
+        assert arr.item1 == Point(-20, 0, 0)
+        assert arr.pmin == Point(-21, -21, -5)
+        assert arr.pmax == Point(21, 21, 5)
+        assert arr.instance(1).left == Point(-21, None, None)
+
+    def test_GridArray(self):
+        arr = GridArray(Cube(1), nx=3, ny=2, dx=10, dy=5)
+        code = scad_render(arr.solid)
+        assert 'for (i = [0:2], j = [0:1]) translate([i * 10, j * 5, 0])' in code
+        assert arr.item2_1 == Point(20, 5, 0)
+        assert arr.pmax == Point(20.5, 5.5, 0.5)
+        assert arr.instance(2, 1).center == Point(20, 5, 0)
+        arr3 = GridArray(Cube(1), nx=2, ny=2, nz=2, dx=10, dy=10, dz=10)
+        assert arr3.item1_1_1 == Point(10, 10, 10)
+
+    def test_dedup(self):
+        a = LinearArray(Cube(2), 3, x=10)
+        b = LinearArray(Cube(2), 3, y=10)
+        obj = Union()
+        obj += a
+        obj += b
+        obj += LinearArray(Cube(2), 3, x=10)
+        code = scad_render_dedup(obj.solid)
+        assert 'translate(i * [0, 10, 0])' in code
+        assert code.count('module ') == 1
+
+    def test_preview(self):
+        arr = LinearArray(Cube(8).color('red'), 3, x=-20)
+        img = render_preview(arr.solid, Camera.TOP.with_distance(150), size=(100, 100))
+        xs = [x for x in range(100) if is_red(img.getpixel((x, 50)))]
+        # three separate cubes on the left of the origin
+        assert max(xs) < 60
+        assert min(xs) < 25
+        assert not all(is_red(img.getpixel((x, 50))) for x in range(min(xs), max(xs)))
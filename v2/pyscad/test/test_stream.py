@@ -0,0 +1,41 @@
+import io
+import solid
+from pyscad.stream import scad_render_stream
+from pyscad.scad import Cube, Cylinder, Union, Preview, ImportScad
+
+def render_stream(obj, header=''):
+    f = io.StringIO()
+    scad_render_stream(obj.solid, f, file_header=header)
+    return f.getvalue()
+
+class TestStream:
+
+    def test_same_as_solid(self):
+        a = Cube(10).color('red')
+        b = Cylinder(d=5, h=20).translate(x=3)
+        obj = Union(a, b) - Cube(2).mod('#')
+        obj.rotate(x=90)
+        expected = solid.scad_render(obj.solid, file_header='$fn = 10;')
+        assert render_stream(obj, '$fn = 10;') == expected
+
+    def test_preview(self):
+        class CubeOrCylinder(Preview):
+            def preview(self):
+                return Union(Cube(10))
+            def render(self):
+                return Union(Cylinder(d=10, h=10))
+        obj = CubeOrCylinder()
+        assert render_stream(obj) == solid.scad_render(obj.solid)
+
+    def test_holes(self):
+        obj = Union(Cube(10))
+        obj.solid.add(solid.hole()(solid.cube(2)))
+        assert render_stream(obj) == solid.scad_render(obj.solid)
+
+    def test_deep_tree(self):
+        obj = Cube(1)
+        for i in range(5000):
+            obj.translate(x=1)
+        text = render_stream(obj)
+        assert text.count('translate') == 5000
+        assert text.endswith('\n}')
@@ -2,24 +2,41 @@ import sys
 import os
 import textwrap
 import traceback
-from PIL import Image
+import tempfile
+import filecmp
+import contextlib
+from pathlib import Path
 from .camera import Camera
+from .geometry import InvalidAnchorError
+from . import openscad
 
 def in2mm(inches):
     return inches * 25.4
 
-class InvalidAnchorError(Exception):
-    pass
-
 class InvalidAnchorPoints:
 
     def __init__(self, old_anchors):
-        # format the traceback but ignore the __init__ and the call to
-        # format_stack itself
+        # record where the anchors have been invalidated, ignoring the
+        # __init__ and the call to invalidate_anchors(). Formatting the
+        # traceback is expensive and it's needed only if an anchor is
+        # actually used, so here we record just the filename, line number and
+        # function name of each frame
         frame = sys._getframe(2)
-        tb = traceback.format_stack(frame)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        stack.reverse()
         self._old_anchors = old_anchors
-        self._traceback = ''.join(tb)
+        self._stack = stack
+
+    @property
+    def _traceback(self):
+        # the source lines are loaded lazily by FrameSummary
+        summary = traceback.StackSummary.from_list(
+            [traceback.FrameSummary(*entry) for entry in self._stack])
+        return ''.join(summary.format())
 
     def has_point(self, name):
         return self._old_anchors.has_point(name)
@@ -35,30 +52,111 @@ class InvalidAnchorPoints:
         pass
 
 
-def render_to_PIL(obj, **kwargs):
-    png = '/tmp/autorender.png'
-    obj.render_to_image(png, **kwargs)
+@contextlib.contextmanager
+def open_if_changed(filename):
+    """
+    Open a temporary file for writing in text mode: when the block exits, it
+    replaces filename, unless filename already contains exactly the same
+    data, in which case it is left untouched.
+
+    The replacement is atomic (rename), so that a concurrent reader
+    (e.g. openscad with auto-reload) never sees a partial file. Leaving
+    unchanged files untouched avoids useless re-previews by openscad.
+    """
+    path = Path(filename)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    try:
+        os.fchmod(fd, 0o644) # mkstemp creates files which only we can read
+        with os.fdopen(fd, 'w') as f:
+            yield f
+        if path.exists() and filecmp.cmp(tmp, path, shallow=False):
+            os.unlink(tmp)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def load_PIL(png):
+    from PIL import Image
     img = Image.open(png)
     img.load()
     return img
 
-def render_to_collage(obj, filename, distance=None):
+def render_to_PIL(obj, **kwargs):
+    png = '/tmp/autorender.png'
+    obj.render_to_image(png, **kwargs)
+    return load_PIL(png)
+
+_COLLAGE_SIZE = 512, 512  # size of each frame
+
+def _collage_cameras(distance):
     cameras = [Camera.DEFAULT, Camera.TOP, Camera.FRONT, Camera.RIGHT]
     if distance is not None:
         cameras = [cam.with_distance(distance) for cam in cameras]
+    return cameras
 
-    filename = os.fspath(filename)
-    size = 512, 512  # size of each frame
-    a = render_to_PIL(obj, size=size, camera=cameras[0])
-    b = render_to_PIL(obj, size=size, camera=cameras[1])
-    c = render_to_PIL(obj, size=size, camera=cameras[2])
-    d = render_to_PIL(obj, size=size, camera=cameras[3])
+def render_to_collage(obj, filename, distance=None, *, engine='openscad'):
+    """
+    Render 4 views of the object and paste them together.
+
+    engine can be 'openscad', 'preview' to use the pure-python renderer
+    (see pyscad.preview) or 'auto' to use the preview whenever the object
+    supports it.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from .preview import render_preview, UnsupportedSolid
+    cameras = _collage_cameras(distance)
+    size = _COLLAGE_SIZE
+    if engine in ('preview', 'auto'):
+        try:
+            images = [render_preview(obj.solid, cam, size) for cam in cameras]
+        except UnsupportedSolid:
+            if engine == 'preview':
+                raise
+        else:
+            _save_collage(images, filename)
+            return
     #
-    w, h = size
+    # write the .scad only once, then render all the views in parallel: the
+    # expensive part is done by the openscad processes, so a thread pool is
+    # enough to keep all of them running at the same time
+    scad = '/tmp/autorender.scad'
+    obj.render_to_file(scad)
+    pngs = [f'/tmp/autorender-{i}.png' for i in range(len(cameras))]
+    with ThreadPoolExecutor(max_workers=len(cameras)) as pool:
+        jobs = [pool.submit(openscad.render_png, scad, png, camera=cam, size=size)
+                for png, cam in zip(pngs, cameras)]
+        for job in jobs:
+            job.result()
+    _save_collage([load_PIL(png) for png in pngs], filename)
+
+async def render_to_collage_async(obj, filename, distance=None):
+    import asyncio
+    cameras = _collage_cameras(distance)
+    size = _COLLAGE_SIZE
+    # use a different scad for each filename, so that many collages can be
+    # rendered at the same time
+    filename = os.fspath(filename)
+    base = os.path.splitext(filename)[0]
+    scad = f'{base}.scad'
+    await obj.render_to_file_async(scad)
+    pngs = [f'{base}-{i}.png' for i in range(len(cameras))]
+    await asyncio.gather(*[
+        openscad.render_png_async(scad, png, camera=cam, size=size)
+        for png, cam in zip(pngs, cameras)])
+    _save_collage([load_PIL(png) for png in pngs], filename)
+    for png in pngs:
+        os.remove(png)
+
+def _save_collage(images, filename):
+    from PIL import Image
+    a, b, c, d = images
+    w, h = _COLLAGE_SIZE
     final_size = (w*2 + 2, h*2 + 2)
     res = Image.new("RGBA", final_size, color='black')
     res.paste(a, (0,   0))     # upper left
     res.paste(b, (w+2, 0))     # upper right
     res.paste(c, (0,   h+2))   # lower left
     res.paste(d, (w+2, h+2))   # lower right
-    res.save(filename)
+    res.save(os.fspath(filename))